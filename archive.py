@@ -0,0 +1,68 @@
+"""
+Compact closed months into the columnar archive, and query it.
+
+Usage:
+    python archive.py compact                  # archive every closed month not archived yet
+    python archive.py months
+    python archive.py query --countries USA Brazil --columns today_cases --start 2021-01-01 --end 2022-01-01
+
+The collector's retention job compacts automatically when ARCHIVE_ENABLED is on;
+query reads archived months from memory-mapped column files and only the
+newer rows from SQLite.
+"""
+import argparse
+from datetime import datetime
+from src.archive import ColumnarArchive, ARCHIVE_COLUMNS
+from src.database import HealthDatabase
+from src.logger import setup_logger
+from config import DB_PATH, ARCHIVE_DIR, ARCHIVE_GRACE_DAYS
+
+logger = setup_logger(__name__)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dir', default=ARCHIVE_DIR, help='archive directory')
+    commands = parser.add_subparsers(dest='command', required=True)
+    compact = commands.add_parser('compact', help='archive closed months')
+    compact.add_argument('--grace-days', type=int, default=ARCHIVE_GRACE_DAYS,
+                         help='days after a month ends before it is archived')
+    commands.add_parser('months', help='list archived months')
+    query = commands.add_parser('query', help='summarise raw history for some countries')
+    query.add_argument('--countries', nargs='+', required=True)
+    query.add_argument('--columns', nargs='+', default=['total_cases', 'today_cases'],
+                       choices=ARCHIVE_COLUMNS['country_stats'][1:])
+    query.add_argument('--start', type=datetime.fromisoformat, help='ISO date or datetime')
+    query.add_argument('--end', type=datetime.fromisoformat, help='ISO date or datetime (exclusive)')
+    args = parser.parse_args()
+    
+    archive = ColumnarArchive(args.dir)
+    if args.command == 'months':
+        for table in ARCHIVE_COLUMNS:
+            months = archive.months(table)
+            print(f"{table}: {', '.join(months) if months else '(none)'}")
+        return
+    
+    database = HealthDatabase(DB_PATH, archive=archive)
+    try:
+        if args.command == 'compact':
+            written = archive.compact(database, grace_days=args.grace_days)
+            for table, months in written.items():
+                logger.info("%s: archived %d months (%s)", table, len(months), ', '.join(months) or 'none')
+            return
+        
+        history = database.get_country_history(args.countries, args.start, args.end, args.columns)
+        for country, columns in history.items():
+            timestamps = columns['timestamp']
+            if not len(timestamps):
+                print(f"{country}: no rows")
+                continue
+            print(f"{country}: {len(timestamps):,} rows, {timestamps[0]} .. {timestamps[-1]}")
+            for column in args.columns:
+                values = columns[column]
+                print(f"  {column:<20} min {values.min():>14,.0f}  max {values.max():>14,.0f}  "
+                      f"mean {values.mean():>16,.1f}")
+    finally:
+        database.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Seed the database with historical data from disease.sh's /historical endpoint.
+
+Usage:
+    python backfill.py                         # configured COUNTRIES, full history
+    python backfill.py --all-countries
+    python backfill.py --countries USA Brazil --days 365
+
+Interrupted runs resume from the per-country checkpoints in the database.
+"""
+import argparse
+from src.api_client import HealthDataAPIClient
+from src.backfill import run_backfill
+from src.database import HealthDatabase
+from src.logger import setup_logger
+from config import (DB_PATH, COUNTRIES, BACKFILL_DAYS, BACKFILL_BATCH_ROWS,
+                    MAX_CONCURRENT_REQUESTS, REQUESTS_PER_SECOND)
+
+logger = setup_logger(__name__)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--countries', nargs='+', default=COUNTRIES, help='countries to backfill')
+    parser.add_argument('--all-countries', action='store_true',
+                        help='backfill every country disease.sh reports on')
+    parser.add_argument('--days', default=str(BACKFILL_DAYS), help="days of history, or 'all'")
+    parser.add_argument('--workers', type=int, default=MAX_CONCURRENT_REQUESTS, help='concurrent requests')
+    parser.add_argument('--rps', type=float, default=REQUESTS_PER_SECOND, help='request rate limit')
+    parser.add_argument('--batch-rows', type=int, default=BACKFILL_BATCH_ROWS, help='rows per transaction')
+    args = parser.parse_args()
+    days = int(args.days) if args.days.isdigit() else args.days
+    
+    # Historical timelines are fetched once, so don't keep them around for conditional requests
+    client = HealthDataAPIClient(max_workers=args.workers, requests_per_second=args.rps,
+                                 conditional_requests=False)
+    database = HealthDatabase(DB_PATH)
+    try:
+        countries = args.countries
+        if args.all_countries:
+            countries = client.fetch_country_names()
+            if countries is None:
+                logger.error("Could not fetch the country list")
+                return
+        
+        logger.info("Backfilling %d countries (lastdays=%s)", len(countries), days)
+        result = run_backfill(client, database, countries, days, args.batch_rows, progress=logger.info)
+        
+        if result['skipped']:
+            logger.info("Skipped %d countries already backfilled", len(result['skipped']))
+        if result['failed']:
+            logger.error("Failed to fetch history for: %s (re-run to retry)", ', '.join(sorted(result['failed'])))
+        logger.info("Backfill complete: %d rows for %d countries", sum(result['inserted'].values()),
+                    len(result['inserted']))
+    finally:
+        client.close()
+        database.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Load test for a running health API: closed-loop clients hammer its routes
+and report latency percentiles and throughput.
+
+Each of --concurrency threads sends requests back to back over its own
+keep-alive session for --duration seconds, cycling through the routes.
+Reports p50 / p99 latency and requests per second per route and overall,
+plus any non-2xx/304 responses and connection errors.
+
+Usage:
+    python serve.py &                       # or python health_check.py for the dev server
+    python benchmarks/load_test.py --url http://127.0.0.1:5001 --concurrency 32 --duration 30
+    python benchmarks/load_test.py --routes /health /summary --json load.json
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List
+
+import numpy as np
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from config import COUNTRIES
+
+ROUTES = ['/health', '/alerts', '/summary', '/metrics',
+          f"/history?countries={','.join(COUNTRIES)}&bucket=1h"]
+
+def run_client(url: str, routes: List[str], deadline: float, offset: int,
+               latencies: Dict[str, List[float]], statuses: Counter, lock: threading.Lock):
+    """One closed-loop client: request, wait for the full body, repeat until the deadline"""
+    session = requests.Session()
+    mine = defaultdict(list)
+    seen = Counter()
+    for route in itertools.islice(itertools.cycle(routes), offset, None):
+        if time.perf_counter() >= deadline:
+            break
+        start = time.perf_counter()
+        try:
+            status = session.get(url + route, timeout=30).status_code
+        except requests.RequestException as e:
+            status = type(e).__name__
+        mine[route].append(time.perf_counter() - start)
+        seen[(route, status)] += 1
+    session.close()
+    with lock:
+        for route, values in mine.items():
+            latencies[route].extend(values)
+        statuses.update(seen)
+
+def summarize(latencies: List[float], elapsed: float) -> Dict:
+    values = np.array(latencies) * 1000
+    return {
+        'requests': len(values),
+        'rps': round(len(values) / elapsed, 1),
+        'p50_ms': round(float(np.percentile(values, 50)), 3),
+        'p99_ms': round(float(np.percentile(values, 99)), 3),
+        'max_ms': round(float(values.max()), 3),
+    }
+
+def run_load_test(url: str, routes: List[str], concurrency: int, duration: float) -> Dict:
+    latencies = defaultdict(list)
+    statuses = Counter()
+    lock = threading.Lock()
+    start = time.perf_counter()
+    deadline = start + duration
+    clients = [threading.Thread(target=run_client, args=(url, routes, deadline, i, latencies, statuses, lock))
+               for i in range(concurrency)]
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    elapsed = time.perf_counter() - start
+    
+    results = {
+        'url': url,
+        'concurrency': concurrency,
+        'duration_seconds': round(elapsed, 2),
+        'routes': {route: summarize(values, elapsed) for route, values in latencies.items()},
+        'total': summarize([value for values in latencies.values() for value in values], elapsed),
+        'failures': {f'{route} {status}': count for (route, status), count in statuses.items()
+                     if not (isinstance(status, int) and (200 <= status < 300 or status == 304))},
+    }
+    return results
+
+def print_results(results: Dict):
+    print(f"{results['url']}: {results['concurrency']} clients for {results['duration_seconds']}s")
+    rows = list(results['routes'].items()) + [('total', results['total'])]
+    for route, stats in rows:
+        print(f"  {route[:40]:<40} {stats['requests']:>8} req  {stats['rps']:>9.1f} req/s  "
+              f"p50 {stats['p50_ms']:>8.2f} ms  p99 {stats['p99_ms']:>8.2f} ms")
+    for name, count in results['failures'].items():
+        print(f"  FAILED {name}: {count}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:5001', help='base URL of the running API')
+    parser.add_argument('--routes', nargs='+', default=ROUTES)
+    parser.add_argument('--concurrency', type=int, default=16, help='concurrent clients')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds to run')
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+    
+    results = run_load_test(args.url.rstrip('/'), args.routes, args.concurrency, args.duration)
+    print_results(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.json}")
+    if not results['total']['requests'] or results['failures']:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+"""
+Query-plan checks and timings for the hot HealthDatabase queries.
+
+Builds a synthetic database with N country_stats rows (plus matching
+global_stats and error_log rows at 10-minute resolution), then for each
+analytic query:
+  - captures the SQL it actually runs and checks EXPLAIN QUERY PLAN for
+    full table scans
+  - times repeated calls and reports median / p95 latency
+
+Usage:
+    python benchmarks/query_benchmark.py                      # 1M, 10M, 50M rows
+    python benchmarks/query_benchmark.py --rows 100000 --check
+    python benchmarks/query_benchmark.py --rows 1000000 --json results.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from config import COUNTRIES
+from src.database import HealthDatabase
+from benchmarks.synthetic import (SyntheticWorld, COUNTRY_COUNT, INTERVAL, floor_time,
+                                  load_history, reset_database)
+
+DEFAULT_ROW_COUNTS = [1_000_000, 10_000_000, 50_000_000]
+
+def build_database(path: str, rows: int, countries: int = COUNTRY_COUNT) -> HealthDatabase:
+    """
+    Create a database with `rows` country_stats rows ending now
+    Args:
+        path: Database file (replaced if it exists)
+        rows: Total country_stats rows
+        countries: Rows are spread evenly over this many countries
+    Returns: HealthDatabase using a single reader connection
+    """
+    reset_database(path)
+    db = HealthDatabase(path, pool_size=1)
+    ticks = max(1, rows // countries)
+    start = floor_time(datetime.now()) - INTERVAL * (ticks - 1)
+    load_history(db, SyntheticWorld(countries), start, ticks)
+    return db
+
+def hot_queries(db: HealthDatabase, country: str = COUNTRIES[0]) -> Dict[str, Callable]:
+    """The read paths behind /health, /alerts, /summary and /history"""
+    return {
+        'get_recent_global_data(24h)': lambda: db.get_recent_global_data(hours=24),
+        'get_country_trend(1d, raw)': lambda: db.get_country_trend(country, days=1),
+        'get_country_trend(7d, hourly)': lambda: db.get_country_trend(country, days=7),
+        'get_country_trend(90d, daily)': lambda: db.get_country_trend(country, days=90),
+        'detect_case_surge': lambda: db.detect_case_surge(country, 5.0),
+        'get_top_countries_by_today_cases': lambda: db.get_top_countries_by_today_cases(limit=10),
+        'get_data_quality_metrics(1h)': lambda: db.get_data_quality_metrics(hours=1),
+        'get_data_quality_metrics(24h)': lambda: db.get_data_quality_metrics(hours=24),
+        'get_latest_updated': lambda: db.get_latest_updated(),
+        'iter_country_history(7d, 10m)': lambda: list(db.iter_country_history([country], bucket='10m')),
+        'iter_country_history(5x 1y, 1d)': lambda: list(db.iter_country_history(
+            COUNTRIES, start=datetime.now() - timedelta(days=365), bucket='1d')),
+    }
+
+def capture_sql(db: HealthDatabase, query: Callable) -> List[str]:
+    """Run a query method and return the SELECT statements it executed"""
+    statements = []
+    with db.pool.reader() as conn:
+        conn.set_trace_callback(statements.append)
+    try:
+        query()
+    finally:
+        with db.pool.reader() as conn:
+            conn.set_trace_callback(None)
+    return [sql for sql in statements if sql.lstrip().upper().startswith('SELECT')]
+
+def explain(db: HealthDatabase, sql: str) -> List[str]:
+    """EXPLAIN QUERY PLAN detail lines for a statement"""
+    with db.pool.reader() as conn:
+        return [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}')]
+
+# One row per country - scanning these is expected and doesn't grow with history
+SMALL_TABLES = {'country_latest', 'detector_state'}
+
+def is_full_scan(plan_line: str) -> bool:
+    """A SCAN without an index is a full table scan (ignoring per-country tables)"""
+    if not plan_line.startswith('SCAN') or 'INDEX' in plan_line:
+        return False
+    return plan_line.split()[1] not in SMALL_TABLES
+
+def time_query(query: Callable, repeat: int) -> Dict:
+    query()  # warm the page cache and statement cache
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        query()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        'median_ms': round(statistics.median(samples), 3),
+        'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+        'max_ms': round(samples[-1], 3),
+    }
+
+def run(rows: int, repeat: int, db_path: str) -> Dict:
+    print(f"\n=== {rows:,} country_stats rows ===")
+    load_start = time.perf_counter()
+    db = build_database(db_path, rows)
+    print(f"Built {db_path} in {time.perf_counter() - load_start:.1f}s "
+          f"(schema v{db.get_schema_version()}, {os.path.getsize(db_path) / 1e6:,.0f} MB)")
+    
+    results = {}
+    for name, query in hot_queries(db).items():
+        plans = [explain(db, sql) for sql in capture_sql(db, query)]
+        full_scans = [line for plan in plans for line in plan if is_full_scan(line)]
+        timing = time_query(query, repeat)
+        results[name] = {'plan': plans, 'full_scans': full_scans, **timing}
+        
+        flag = 'FULL SCAN' if full_scans else 'indexed'
+        print(f"  {name:<36} median {timing['median_ms']:>9.3f} ms   "
+              f"p95 {timing['p95_ms']:>9.3f} ms   [{flag}]")
+        for line in full_scans:
+            print(f"      {line}")
+    
+    db.close()
+    return {'rows': rows, 'queries': results}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROW_COUNTS,
+                        help='country_stats row counts to benchmark')
+    parser.add_argument('--repeat', type=int, default=50, help='timed calls per query')
+    parser.add_argument('--db', default='benchmark_queries.db', help='scratch database path')
+    parser.add_argument('--json', help='write results to this file')
+    parser.add_argument('--check', action='store_true',
+                        help='exit non-zero if any hot query does a full table scan')
+    parser.add_argument('--keep', action='store_true', help='keep the scratch database')
+    args = parser.parse_args()
+    
+    all_results = [run(rows, args.repeat, args.db) for rows in args.rows]
+    
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(all_results, f, indent=2)
+        print(f"\nResults written to {args.json}")
+    
+    if not args.keep:
+        reset_database(args.db)
+    
+    if args.check and any(q['full_scans'] for r in all_results for q in r['queries'].values()):
+        print("\nFull table scans found in hot queries")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
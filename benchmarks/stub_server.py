@@ -0,0 +1,199 @@
+"""
+Local stand-in for the disease.sh API, serving a SyntheticWorld.
+
+Implements the endpoints the collector and backfill use:
+  GET /v3/covid-19/all
+  GET /v3/covid-19/countries
+  GET /v3/covid-19/countries/{country}
+  GET /v3/covid-19/historical?lastdays=N
+  GET /v3/covid-19/historical/{country}?lastdays=N|all
+
+Every response is delayed by `latency` (plus up to `jitter`) seconds and
+fails with a 500 with probability `error_rate`. The stub has its own clock,
+starting at the current 10-minute mark; it only moves when advance() is
+called, so a benchmark decides exactly when the data "refreshes".
+
+Usage:
+    python benchmarks/stub_server.py --port 8080 --countries 200 --latency 0.05
+    # then point BASE_URL at http://127.0.0.1:8080/v3/covid-19
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from benchmarks.synthetic import SyntheticWorld, INTERVAL, floor_time
+
+API_PREFIX = '/v3/covid-19'
+NOT_FOUND = {'message': "Country not found or doesn't have any cases"}
+
+class DiseaseShStub:
+    """disease.sh look-alike on a background thread; use as a context manager"""
+    
+    def __init__(self, world: SyntheticWorld, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, seed: int = 0, host: str = '127.0.0.1', port: int = 0):
+        """
+        Args:
+            world: Source of the payloads
+            latency: Seconds added to every response
+            jitter: Up to this many extra seconds, uniformly distributed
+            error_rate: Probability (0-1) of answering 500 instead
+            seed: Seeds the jitter and error draws
+            host, port: Address to listen on (port 0 picks a free port)
+        """
+        self.world = world
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.requests = Counter()  # endpoint -> requests served
+        self.errors = Counter()  # endpoint -> injected errors
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._now = floor_time(datetime.now())
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+    
+    @property
+    def url(self) -> str:
+        """Base URL to use in place of config.BASE_URL"""
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}{API_PREFIX}'
+    
+    @property
+    def now(self) -> datetime:
+        """The stub's clock: the moment the served data describes"""
+        with self._lock:
+            return self._now
+    
+    def advance(self, interval: timedelta = INTERVAL):
+        """Move the clock on, so the next responses carry fresh data"""
+        with self._lock:
+            self._now += interval
+    
+    def start(self) -> 'DiseaseShStub':
+        self._thread = threading.Thread(target=self._server.serve_forever, name='disease-sh-stub',
+                                        daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+    
+    def __enter__(self):
+        return self.start()
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+    
+    def _draw(self) -> Tuple[float, bool]:
+        """(delay in seconds, whether to fail) for one response"""
+        with self._lock:
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+            return delay, self._random.random() < self.error_rate
+    
+    def respond(self, path: str) -> Tuple[int, str, object]:
+        """
+        Route one GET request
+        Returns: (status code, endpoint label, JSON-serialisable body)
+        """
+        url = urlsplit(path)
+        if not url.path.startswith(API_PREFIX):
+            return 404, 'other', {'message': 'Not found'}
+        parts = [unquote(part) for part in url.path[len(API_PREFIX):].strip('/').split('/') if part]
+        lastdays = parse_qs(url.query).get('lastdays', ['30'])[0]
+        now = self.now
+        world = self.world
+        
+        if parts == ['all']:
+            return 200, '/all', world.global_payload(now)
+        if parts == ['countries']:
+            return 200, '/countries', world.country_payloads(now)
+        if parts == ['historical']:
+            return 200, '/historical', [world.historical(i, lastdays, now) for i in range(len(world.names))]
+        if len(parts) == 2 and parts[0] in ('countries', 'historical'):
+            endpoint = f'/{parts[0]}/{{country}}'
+            index = world.find(parts[1])
+            if index is None:
+                return 404, endpoint, NOT_FOUND
+            if parts[0] == 'historical':
+                return 200, endpoint, world.historical(index, lastdays, now)
+            return 200, endpoint, world.country_payload(index, now)
+        return 404, 'other', {'message': 'Not found'}
+    
+    def _handler_class(self):
+        stub = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive, like the real API behind its CDN
+            # Without this, Nagle and the client's delayed ACK stall every
+            # keep-alive request after the first by ~40 ms
+            disable_nagle_algorithm = True
+            
+            def do_GET(self):
+                status, endpoint, body = stub.respond(self.path)
+                delay, fail = stub._draw()
+                if delay:
+                    time.sleep(delay)
+                with stub._lock:
+                    stub.requests[endpoint] += 1
+                    if fail:
+                        stub.errors[endpoint] += 1
+                if fail:
+                    status, body = 500, {'message': 'Injected error'}
+                
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            
+            def log_message(self, format, *args):
+                pass  # the benchmarks make thousands of requests
+        
+        return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--countries', type=int, default=200, help='countries in the synthetic world')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='up to this many extra seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='probability of a 500 response')
+    parser.add_argument('--tick', type=float, default=0.0,
+                        help='advance the data every N real seconds (0 = never)')
+    args = parser.parse_args()
+    
+    stub = DiseaseShStub(SyntheticWorld(args.countries, seed=args.seed), latency=args.latency,
+                         jitter=args.jitter, error_rate=args.error_rate, seed=args.seed,
+                         host=args.host, port=args.port)
+    with stub:
+        print(f"Serving {args.countries} synthetic countries at {stub.url} (Ctrl+C to stop)")
+        try:
+            while True:
+                time.sleep(args.tick or 3600)
+                if args.tick:
+                    stub.advance()
+        except KeyboardInterrupt:
+            pass
+    print(f"Requests served: {dict(stub.requests)}; injected errors: {dict(stub.errors)}")
+
+if __name__ == '__main__':
+    main()
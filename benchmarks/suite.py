@@ -0,0 +1,271 @@
+"""
+End-to-end benchmark suite with machine-readable results.
+
+In a scratch directory it:
+  1. loads a synthetic country_stats/global_stats history (countries x years
+     at 10-minute resolution) into a fresh database
+  2. starts the disease.sh stub (benchmarks/stub_server.py) with the given
+     latency and error rate, and times full collection cycles from main.py
+     against it - bulk and per-country mode, fresh and unchanged data - plus
+     a historical backfill
+  3. times every hot HealthDatabase query on the loaded data
+  4. times every Flask endpoint through the test client: cold (empty cache),
+     cached, and revalidated with If-None-Match (304)
+
+Results are written as JSON (--json). --compare prints each median against
+an earlier results file and exits non-zero if any got slower than
+--threshold times the baseline.
+
+Usage:
+    python benchmarks/suite.py
+    python benchmarks/suite.py --countries 200 --years 1 --latency 0.05 --error-rate 0.01 --json v2.json
+    python benchmarks/suite.py --json v3.json --compare v2.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from config import DB_PATH, COUNTRIES
+from src.database import HealthDatabase
+from benchmarks.synthetic import SyntheticWorld, INTERVAL, load_history
+from benchmarks.stub_server import DiseaseShStub
+from benchmarks.query_benchmark import hot_queries, time_query
+
+ENDPOINTS = ['/health', '/alerts', '/summary', '/metrics',
+             f"/history?countries={','.join(COUNTRIES)}&bucket=1h"]
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def build_dataset(world: SyntheticWorld, years: float, end: datetime) -> Dict:
+    """Load `years` of history ending at `end` into DB_PATH (in the current directory)"""
+    ticks = max(1, int(years * 365 * 24 * 60 / (INTERVAL.total_seconds() / 60)))
+    start = end - INTERVAL * (ticks - 1)
+    load_start = time.perf_counter()
+    db = HealthDatabase(DB_PATH, pool_size=1)
+    counts = load_history(db, world, start, ticks)
+    db.close()
+    return {
+        'countries': len(world.names),
+        'years': years,
+        'first_snapshot': start.isoformat(),
+        'rows': counts,
+        'load_seconds': round(time.perf_counter() - load_start, 2),
+        'db_mb': round(os.path.getsize(DB_PATH) / 1e6, 1),
+    }
+
+def bench_ingest(stub: DiseaseShStub, world: SyntheticWorld, cycles: int, rps: float) -> Dict:
+    """Time main.fetch_and_store_data against the stub"""
+    import main as collector
+    from src.api_client import HealthDataAPIClient
+    
+    client = HealthDataAPIClient(requests_per_second=rps)
+    client.base_url = stub.url
+    client.countries = world.names
+    collector.api_client = client
+    collector.COUNTRIES = world.names
+    
+    # What main() does before its first cycle
+    latest = collector.database.get_latest_updated()
+    collector.change_tracker.seed(latest['global'], latest['countries'])
+    collector.surge_detector.load_states(collector.database.load_detector_state())
+    
+    def fresh_cycle():
+        stub.advance()
+        collector.fetch_and_store_data()
+    
+    results = {}
+    for mode in ('bulk', 'per_country'):
+        collector.FETCH_MODE = mode
+        results[f'cycle {mode}'] = time_query(fresh_cycle, cycles)
+        # disease.sh hasn't refreshed yet: everything is skipped by change detection
+        results[f'cycle {mode} unchanged'] = time_query(collector.fetch_and_store_data, cycles)
+    
+    # Full history for every country into a separate database
+    from src.backfill import run_backfill
+    backfill_db = HealthDatabase('backfill.db')
+    start = time.perf_counter()
+    backfill = run_backfill(client, backfill_db, world.names, days='all')
+    results['backfill all'] = {
+        'seconds': round(time.perf_counter() - start, 3),
+        'rows': sum(backfill['inserted'].values()),
+        'failed': len(backfill['failed']),
+    }
+    backfill_db.close()
+    client.close()
+    
+    results['stub'] = {'requests': dict(stub.requests), 'injected_errors': dict(stub.errors)}
+    return results
+
+def bench_queries(repeat: int) -> Dict:
+    """Time each hot HealthDatabase query on the loaded (and ingested) data"""
+    import main as collector
+    return {name: time_query(query, repeat) for name, query in hot_queries(collector.database).items()}
+
+def bench_endpoints(repeat: int) -> Dict:
+    """Time each Flask endpoint: cache cleared, cache warm, and If-None-Match revalidation"""
+    import health_check
+    client = health_check.app.test_client()
+    results = {}
+    
+    def request(path: str, headers: Dict = None) -> Callable:
+        def call():
+            response = client.get(path, headers=headers)
+            response.get_data()  # drain streamed bodies
+            assert response.status_code in (200, 304, 503), f'{path}: {response.status_code}'
+        return call
+    
+    def cold(path: str) -> Callable:
+        call = request(path)
+        def uncached():
+            health_check.db.cache.clear()
+            call()
+        return uncached
+    
+    for path in ENDPOINTS:
+        results[f'{path} cold'] = time_query(cold(path), repeat)
+        if path == '/metrics' or path.startswith('/history'):
+            continue  # rendered per request, not cached
+        results[f'{path} cached'] = time_query(request(path), repeat)
+        etag = client.get(path).headers.get('ETag')
+        results[f'{path} 304'] = time_query(request(path, {'If-None-Match': etag}), repeat)
+    return results
+
+def run_suite(args) -> Dict:
+    world = SyntheticWorld(args.countries, seed=args.seed)
+    results = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'git_commit': git_commit(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'params': {key: value for key, value in vars(args).items()
+                       if key not in ('json', 'compare', 'keep', 'verbose')},
+        }
+    }
+    
+    with DiseaseShStub(world, latency=args.latency, jitter=args.jitter,
+                       error_rate=args.error_rate, seed=args.seed) as stub:
+        print(f"Loading {args.countries} countries x {args.years} years of history...")
+        results['dataset'] = build_dataset(world, args.years, stub.now)
+        print(f"  {results['dataset']['rows']['country_stats']:,} country_stats rows "
+              f"in {results['dataset']['load_seconds']}s ({results['dataset']['db_mb']} MB)")
+        
+        # main and health_check open DB_PATH at import, so import them only now
+        import main as collector
+        if collector.database.recent is not None:
+            results['dataset']['recent_store_mb'] = round(collector.database.recent.nbytes / 1e6, 2)
+        if not args.verbose:
+            for name in ('main', 'src'):
+                logging.getLogger(name).setLevel(logging.ERROR)
+        
+        print(f"Timing {args.cycles} collection cycles per mode against {stub.url}...")
+        results['ingest'] = bench_ingest(stub, world, args.cycles, args.rps)
+    
+    print(f"Timing queries and endpoints ({args.repeat} calls each)...")
+    results['queries'] = bench_queries(args.repeat)
+    results['endpoints'] = bench_endpoints(args.repeat)
+    collector.database.close()
+    return results
+
+def medians(results: Dict) -> Dict[str, float]:
+    """Flatten a results document to {'section/name': median_ms}"""
+    flat = {}
+    for section in ('ingest', 'queries', 'endpoints'):
+        for name, timing in results.get(section, {}).items():
+            if 'median_ms' in timing:
+                flat[f'{section}/{name}'] = timing['median_ms']
+            elif 'seconds' in timing:
+                flat[f'{section}/{name}'] = timing['seconds'] * 1000
+    return flat
+
+def print_results(results: Dict):
+    for section in ('ingest', 'queries', 'endpoints'):
+        print(f"\n{section}")
+        for name, timing in results[section].items():
+            if 'median_ms' in timing:
+                print(f"  {name:<36} median {timing['median_ms']:>10.3f} ms   p95 {timing['p95_ms']:>10.3f} ms")
+            elif 'seconds' in timing:
+                print(f"  {name:<36} {timing['seconds']:>10.3f} s    {timing['rows']:,} rows")
+            else:
+                print(f"  {name:<36} {timing}")
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> bool:
+    """Print current vs baseline medians; returns True if anything regressed past threshold"""
+    now, before = medians(current), medians(baseline)
+    print(f"\nvs {baseline['meta'].get('git_commit')} ({baseline['meta'].get('timestamp')})")
+    regressed = False
+    for name in sorted(now.keys() & before.keys()):
+        ratio = now[name] / before[name] if before[name] else float('inf')
+        flag = ''
+        if ratio > threshold:
+            flag = '  REGRESSION'
+            regressed = True
+        print(f"  {name:<48} {before[name]:>10.3f} -> {now[name]:>10.3f} ms  {ratio:>6.2f}x{flag}")
+    return regressed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--countries', type=int, default=50, help='countries in the synthetic world')
+    parser.add_argument('--years', type=float, default=0.1, help='history to load, at 10-minute resolution')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--cycles', type=int, default=5, help='timed collection cycles per mode')
+    parser.add_argument('--repeat', type=int, default=50, help='timed calls per query and endpoint')
+    parser.add_argument('--latency', type=float, default=0.02, help='stub seconds per response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='stub extra random seconds per response')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='stub probability of a 500')
+    parser.add_argument('--rps', type=float, default=1000.0,
+                        help='client rate limit (the real API gets config.REQUESTS_PER_SECOND)')
+    parser.add_argument('--json', help='write results to this file')
+    parser.add_argument('--compare', help='earlier results file to compare against')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='with --compare, exit non-zero if a median is this many times slower')
+    parser.add_argument('--keep', action='store_true', help='keep the scratch directory')
+    parser.add_argument('--verbose', action='store_true', help="show the collector's log output")
+    args = parser.parse_args()
+    
+    json_path = os.path.abspath(args.json) if args.json else None
+    compare_path = os.path.abspath(args.compare) if args.compare else None
+    original_dir = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix='health-bench-')
+    os.chdir(workdir)  # DB_PATH and the log directory are relative
+    try:
+        results = run_suite(args)
+    finally:
+        os.chdir(original_dir)
+        if args.keep:
+            print(f"Scratch directory kept: {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+    
+    print_results(results)
+    if json_path:
+        with open(json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.json}")
+    
+    if compare_path:
+        with open(compare_path) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
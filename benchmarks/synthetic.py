@@ -0,0 +1,284 @@
+"""
+Synthetic public health data for the benchmarks.
+
+SyntheticWorld models a set of countries from the first disease.sh day to
+about a year from now: seasonal waves, a weekly reporting cycle and noise
+on top of a per-country baseline. Cumulative figures are precomputed per
+day, so the state at any moment (todayCases grows through the day, as it
+does in disease.sh) is a few array lookups. The same world feeds:
+  - load_history(): country_stats/global_stats rows at 10-minute resolution
+  - the stub API server: /all, /countries and /historical payloads that
+    pass the validators
+"""
+import math
+import os
+import sys
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from config import COUNTRIES
+from src.database import (HealthDatabase, ROLLUP_TABLES, COUNTRY_LATEST_BACKFILL_SQL,
+                          _rollup_backfill_sql)
+
+EPOCH = date(2020, 1, 22)  # first day of the disease.sh timelines
+INTERVAL = timedelta(minutes=10)
+COUNTRY_COUNT = 200
+LOAD_BATCH_SIZE = 50_000
+RECOVERY_DAYS = 14
+
+# ISO codes for the configured countries, so bulk fetches match them the way they match disease.sh
+_ISO_CODES = {'USA': ('US', 'USA'), 'UK': ('GB', 'GBR'), 'Canada': ('CA', 'CAN'),
+              'Germany': ('DE', 'DEU'), 'Japan': ('JP', 'JPN')}
+
+INSERT_COUNTRY_SQL = '''
+    INSERT INTO country_stats
+    (timestamp, country, total_cases, total_deaths, total_recovered, active_cases,
+     critical_cases, today_cases, today_deaths, population, tests,
+     cases_per_million, deaths_per_million)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+INSERT_GLOBAL_SQL = '''
+    INSERT INTO global_stats
+    (timestamp, total_cases, total_deaths, total_recovered, active_cases,
+     critical_cases, today_cases, today_deaths)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+INSERT_ERROR_SQL = '''
+    INSERT INTO error_log (timestamp, error_type, error_message, raw_response)
+    VALUES (?, ?, ?, ?)
+'''
+
+def country_names(count: int) -> List[str]:
+    """The configured COUNTRIES first, then Country005, Country006, ..."""
+    names = list(COUNTRIES[:count])
+    names += [f'Country{index:03d}' for index in range(len(names), count)]
+    return names
+
+def floor_time(when: datetime, interval: timedelta = INTERVAL) -> datetime:
+    """Round down to the start of the interval (disease.sh refreshes every 10 minutes)"""
+    seconds = interval.total_seconds()
+    return datetime.fromtimestamp(math.floor(when.timestamp() / seconds) * seconds)
+
+def _day_key(day: date) -> str:
+    return f'{day.month}/{day.day}/{day.year % 100}'
+
+class SyntheticWorld:
+    """Deterministic (per seed) case, death and recovery curves for `countries` countries"""
+    
+    def __init__(self, countries: int = COUNTRY_COUNT, seed: int = 0, future_days: int = 400):
+        rng = np.random.default_rng(seed)
+        self.names = country_names(countries)
+        self.index = {name.lower(): i for i, name in enumerate(self.names)}
+        for i, name in enumerate(self.names):
+            for code in _ISO_CODES.get(name, ()):
+                self.index[code.lower()] = i
+        
+        self.days = (date.today() - EPOCH).days + future_days
+        self.population = rng.integers(1_000_000, 330_000_000, countries)
+        self.fatality = rng.uniform(0.005, 0.02, countries)
+        self.tests_per_case = rng.uniform(5.0, 30.0, countries)
+        
+        # Daily new cases: baseline share of the population, seasonal waves
+        # with a random period and phase, fewer reports at weekends, noise
+        t = np.arange(self.days)
+        baseline = rng.uniform(0.00002, 0.0003, countries)[:, None] * self.population[:, None]
+        period = rng.uniform(90, 240, countries)[:, None]
+        phase = rng.uniform(0, 2 * np.pi, countries)[:, None]
+        waves = 1 + 0.9 * np.sin(2 * np.pi * t / period + phase)
+        weekly = np.where(np.array([(EPOCH + timedelta(days=int(d))).weekday() for d in t]) >= 5, 0.6, 1.0)
+        noise = rng.lognormal(0.0, 0.15, (countries, self.days))
+        self.daily = np.rint(baseline * waves * weekly * noise).astype(np.int64)
+        # cumulative[:, d] = cases reported before day d
+        self.cumulative = np.concatenate(
+            [np.zeros((countries, 1), dtype=np.int64), np.cumsum(self.daily, axis=1)], axis=1)
+    
+    def _day_index(self, day: date) -> int:
+        return min(max((day - EPOCH).days, 0), self.days - 1)
+    
+    def state(self, when: datetime) -> Dict[str, np.ndarray]:
+        """Every country's figures at `when`, one array per field"""
+        day = self._day_index(when.date())
+        fraction = (when - datetime.combine(when.date(), datetime.min.time())).total_seconds() / 86400
+        before_today = self.cumulative[:, day]
+        
+        today = np.rint(self.daily[:, day] * fraction).astype(np.int64)
+        cases = before_today + today
+        deaths = np.floor(cases * self.fatality).astype(np.int64)
+        today_deaths = deaths - np.floor(before_today * self.fatality).astype(np.int64)
+        recovered = np.floor(self.cumulative[:, max(day - RECOVERY_DAYS, 0)] * 0.97).astype(np.int64)
+        active = cases - deaths - recovered
+        return {
+            'cases': cases,
+            'deaths': deaths,
+            'recovered': recovered,
+            'active': active,
+            'critical': active // 200,
+            'today_cases': today,
+            'today_deaths': today_deaths,
+            'tests': np.rint(cases * self.tests_per_case).astype(np.int64),
+            'cases_per_million': np.rint(cases / self.population * 1_000_000),
+            'deaths_per_million': np.round(deaths / self.population * 1_000_000, 2),
+        }
+    
+    def find(self, country: str) -> Optional[int]:
+        """Index of a country by name or ISO code (case-insensitive), like disease.sh"""
+        return self.index.get(country.lower())
+    
+    def _country_payload(self, i: int, columns: Dict[str, List], updated: int) -> Dict:
+        name = self.names[i]
+        iso2, iso3 = _ISO_CODES.get(name, (None, None))
+        return {
+            'updated': updated,
+            'country': name,
+            'countryInfo': {'_id': i + 1, 'iso2': iso2, 'iso3': iso3},
+            'cases': columns['cases'][i],
+            'todayCases': columns['today_cases'][i],
+            'deaths': columns['deaths'][i],
+            'todayDeaths': columns['today_deaths'][i],
+            'recovered': columns['recovered'][i],
+            'active': columns['active'][i],
+            'critical': columns['critical'][i],
+            'casesPerOneMillion': columns['cases_per_million'][i],
+            'deathsPerOneMillion': columns['deaths_per_million'][i],
+            'tests': columns['tests'][i],
+            'population': int(self.population[i]),
+        }
+    
+    def country_payloads(self, when: datetime) -> List[Dict]:
+        """/countries response at `when`"""
+        columns = {key: values.tolist() for key, values in self.state(when).items()}
+        updated = int(when.timestamp() * 1000)
+        return [self._country_payload(i, columns, updated) for i in range(len(self.names))]
+    
+    def country_payload(self, index: int, when: datetime) -> Dict:
+        """/countries/{country} response at `when`"""
+        columns = {key: values.tolist() for key, values in self.state(when).items()}
+        return self._country_payload(index, columns, int(when.timestamp() * 1000))
+    
+    def global_payload(self, when: datetime) -> Dict:
+        """/all response at `when` (the sum over every country)"""
+        state = self.state(when)
+        totals = {key: int(state[key].sum()) for key in
+                  ('cases', 'deaths', 'recovered', 'active', 'critical', 'today_cases', 'today_deaths')}
+        return {
+            'updated': int(when.timestamp() * 1000),
+            'cases': totals['cases'],
+            'todayCases': totals['today_cases'],
+            'deaths': totals['deaths'],
+            'todayDeaths': totals['today_deaths'],
+            'recovered': totals['recovered'],
+            'active': totals['active'],
+            'critical': totals['critical'],
+            'population': int(self.population.sum()),
+            'affectedCountries': len(self.names),
+        }
+    
+    def historical(self, index: int, lastdays: Union[int, str], when: datetime) -> Dict:
+        """/historical/{country} response: end-of-day totals for complete days before `when`"""
+        last = self._day_index(when.date()) - 1
+        first = 0 if str(lastdays) == 'all' else max(last - int(lastdays) + 1, 0)
+        cases, deaths, recovered = {}, {}, {}
+        for day in range(first, last + 1):
+            key = _day_key(EPOCH + timedelta(days=day))
+            total = int(self.cumulative[index, day + 1])
+            cases[key] = total
+            deaths[key] = int(total * self.fatality[index])
+            recovered[key] = int(self.cumulative[index, max(day + 1 - RECOVERY_DAYS, 0)] * 0.97)
+        return {'country': self.names[index], 'province': ['mainland'],
+                'timeline': {'cases': cases, 'deaths': deaths, 'recovered': recovered}}
+
+def reset_database(path: str):
+    """Remove a database file and its WAL/shared-memory files"""
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+def history_rows(world: SyntheticWorld, start: datetime,
+                 ticks: int) -> Tuple[Iterator[Tuple], Iterator[Tuple]]:
+    """
+    country_stats and global_stats rows for `ticks` snapshots from `start`
+    Returns: (country row iterator, global row iterator) of INSERT parameter tuples
+    """
+    population = world.population.tolist()
+    
+    def country_rows():
+        for tick in range(ticks):
+            when = start + INTERVAL * tick
+            timestamp = when.isoformat(sep=' ')
+            state = world.state(when)
+            yield from zip(
+                [timestamp] * len(world.names), world.names,
+                state['cases'].tolist(), state['deaths'].tolist(), state['recovered'].tolist(),
+                state['active'].tolist(), state['critical'].tolist(), state['today_cases'].tolist(),
+                state['today_deaths'].tolist(), population, state['tests'].tolist(),
+                state['cases_per_million'].tolist(), state['deaths_per_million'].tolist())
+    
+    def global_rows():
+        for tick in range(ticks):
+            when = start + INTERVAL * tick
+            payload = world.global_payload(when)
+            yield (when.isoformat(sep=' '), payload['cases'], payload['deaths'], payload['recovered'],
+                   payload['active'], payload['critical'], payload['todayCases'], payload['todayDeaths'])
+    
+    return country_rows(), global_rows()
+
+def load_history(db: HealthDatabase, world: SyntheticWorld, start: datetime, ticks: int,
+                 error_rate: float = 0.01) -> Dict[str, int]:
+    """
+    Bulk-load a 10-minute history, then derive the rollups and latest snapshots
+    Args:
+        db: Freshly created HealthDatabase
+        world: Source of the figures
+        start: First snapshot time
+        ticks: Snapshots per country
+        error_rate: error_log rows per country fetch
+    Returns: Rows loaded per table
+    """
+    def load(sql: str, rows) -> int:
+        count = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= LOAD_BATCH_SIZE:
+                with db.pool.writer() as conn:
+                    conn.executemany(sql, batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            with db.pool.writer() as conn:
+                conn.executemany(sql, batch)
+            count += len(batch)
+        return count
+    
+    def error_rows():
+        if error_rate <= 0:
+            return
+        fetches = ticks * len(world.names)
+        for fetch in range(0, fetches, max(1, round(1 / error_rate))):
+            timestamp = (start + INTERVAL * (fetch // len(world.names))).isoformat(sep=' ')
+            yield (timestamp, 'VALIDATION_FAILED', 'Country data invalid', None)
+    
+    with db.pool.writer() as conn:
+        conn.execute('PRAGMA synchronous=OFF')
+    
+    country_rows, global_rows = history_rows(world, start, ticks)
+    counts = {
+        'country_stats': load(INSERT_COUNTRY_SQL, country_rows),
+        'global_stats': load(INSERT_GLOBAL_SQL, global_rows),
+        'error_log': load(INSERT_ERROR_SQL, error_rows()),
+    }
+    
+    # Rows were loaded directly, so derive the rollups and latest snapshots
+    # the way migrations 3 and 4 do
+    with db.pool.writer() as conn:
+        for table, bucket_format in ROLLUP_TABLES.items():
+            conn.execute(_rollup_backfill_sql(table, bucket_format))
+        conn.execute(COUNTRY_LATEST_BACKFILL_SQL)
+    
+    with db.pool.writer() as conn:
+        conn.execute('ANALYZE')
+    return counts
@@ -0,0 +1,175 @@
+"""
+Validation throughput: pydantic 1.x models vs the pydantic 2 models in
+src/validator.py.
+
+The 1.x models are the pre-migration definitions, run through the
+`pydantic.v1` compatibility package that ships with pydantic 2. For each
+model set it measures validations per second for:
+  - single payloads (one model call per payload, as validate_country_data does)
+  - large batches (a whole list per call; a TypeAdapter over List[...] for
+    pydantic 2, plus the column-wise validate_country_batch fast path)
+
+Usage:
+    python benchmarks/validation_benchmark.py
+    python benchmarks/validation_benchmark.py --batch-size 100000 --json results.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pydantic import TypeAdapter
+from pydantic import v1 as pydantic_v1
+from src.validator import GlobalHealthData, CountryHealthData, validate_country_batch
+
+class LegacyGlobalHealthData(pydantic_v1.BaseModel):
+    """GlobalHealthData as it was under pydantic 1.10"""
+    
+    updated: int = pydantic_v1.Field(..., description="Unix timestamp in milliseconds")
+    cases: int = pydantic_v1.Field(..., ge=0, description="Total cases")
+    deaths: int = pydantic_v1.Field(..., ge=0, description="Total deaths")
+    recovered: int = pydantic_v1.Field(..., ge=0, description="Total recovered")
+    active: int = pydantic_v1.Field(..., ge=0, description="Active cases")
+    critical: Optional[int] = pydantic_v1.Field(None, ge=0)
+    todayCases: Optional[int] = pydantic_v1.Field(None, ge=0)
+    todayDeaths: Optional[int] = pydantic_v1.Field(None, ge=0)
+    
+    @pydantic_v1.validator('deaths')
+    def deaths_not_greater_than_cases(cls, v, values):
+        if 'cases' in values and v > values['cases']:
+            raise ValueError(f'Deaths ({v}) cannot exceed cases ({values["cases"]})')
+        return v
+    
+    @pydantic_v1.validator('recovered')
+    def recovered_reasonable(cls, v, values):
+        if 'cases' in values and v > values['cases']:
+            raise ValueError(f'Recovered ({v}) cannot exceed cases ({values["cases"]})')
+        return v
+    
+    @pydantic_v1.validator('active')
+    def active_cases_reasonable(cls, v, values):
+        if 'cases' in values and 'deaths' in values and 'recovered' in values:
+            expected_active = values['cases'] - values['deaths'] - values['recovered']
+            if abs(v - expected_active) > values['cases'] * 0.1:
+                raise ValueError(f'Active cases ({v}) inconsistent with totals')
+        return v
+
+class LegacyCountryHealthData(pydantic_v1.BaseModel):
+    """CountryHealthData as it was under pydantic 1.10"""
+    
+    updated: int
+    country: str = pydantic_v1.Field(..., min_length=2)
+    cases: int = pydantic_v1.Field(..., ge=0)
+    deaths: int = pydantic_v1.Field(..., ge=0)
+    recovered: int = pydantic_v1.Field(..., ge=0)
+    active: int = pydantic_v1.Field(..., ge=0)
+    critical: Optional[int] = pydantic_v1.Field(None, ge=0)
+    todayCases: Optional[int] = pydantic_v1.Field(None, ge=0)
+    todayDeaths: Optional[int] = pydantic_v1.Field(None, ge=0)
+    population: Optional[int] = pydantic_v1.Field(None, ge=0)
+    tests: Optional[int] = pydantic_v1.Field(None, ge=0)
+    casesPerOneMillion: Optional[float] = pydantic_v1.Field(None, ge=0)
+    deathsPerOneMillion: Optional[float] = pydantic_v1.Field(None, ge=0)
+    
+    @pydantic_v1.validator('todayCases')
+    def today_cases_reasonable(cls, v, values):
+        if v is not None and 'population' in values and values['population']:
+            if v > values['population'] * 0.01:
+                raise ValueError(f'Today\'s cases ({v}) seems unreasonably high')
+        return v
+    
+    @pydantic_v1.validator('casesPerOneMillion')
+    def cases_per_million_matches(cls, v, values):
+        if v is not None and 'cases' in values and 'population' in values:
+            if values['population'] > 0:
+                expected = (values['cases'] / values['population']) * 1000000
+                if abs(v - expected) > expected * 0.05:
+                    raise ValueError(f'Cases per million ({v}) doesn\'t match calculation')
+        return v
+
+def global_payloads(count: int) -> List[Dict]:
+    updated = int(datetime.now().timestamp() * 1000)
+    payloads = []
+    for i in range(count):
+        cases = 700_000_000 + i
+        payloads.append({
+            'updated': updated, 'cases': cases, 'deaths': cases // 100, 'recovered': cases // 2,
+            'active': cases - cases // 100 - cases // 2, 'critical': 50_000,
+            'todayCases': 50_000 + i % 1000, 'todayDeaths': 500,
+        })
+    return payloads
+
+def country_payloads(count: int) -> List[Dict]:
+    updated = int(datetime.now().timestamp() * 1000)
+    payloads = []
+    for i in range(count):
+        cases = 1_000_000 + i * 37
+        population = 50_000_000 + i
+        payloads.append({
+            'updated': updated, 'country': f'Country{i % 200:03d}', 'cases': cases,
+            'deaths': cases // 100, 'recovered': cases // 2, 'active': cases - cases // 100 - cases // 2,
+            'critical': 10, 'todayCases': i % 5000, 'todayDeaths': i % 20, 'population': population,
+            'tests': cases * 3, 'casesPerOneMillion': round(cases / population * 1_000_000),
+            'deathsPerOneMillion': round(cases // 100 / population * 1_000_000, 2),
+        })
+    return payloads
+
+def rate(run: Callable, count: int, repeat: int) -> float:
+    """Best-of-`repeat` validations per second"""
+    run()  # warm up
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return count / best
+
+def benchmark(single_count: int, batch_size: int, repeat: int) -> Dict:
+    results = {}
+    for name, legacy, model, make_payloads in [
+        ('GlobalHealthData', LegacyGlobalHealthData, GlobalHealthData, global_payloads),
+        ('CountryHealthData', LegacyCountryHealthData, CountryHealthData, country_payloads),
+    ]:
+        singles = make_payloads(single_count)
+        batch = make_payloads(batch_size)
+        adapter = TypeAdapter(List[model])
+        
+        measured = {
+            'single pydantic 1.x': rate(lambda: [legacy(**p) for p in singles], single_count, repeat),
+            'single pydantic 2': rate(lambda: [model(**p) for p in singles], single_count, repeat),
+            'batch pydantic 1.x': rate(lambda: [legacy(**p) for p in batch], batch_size, repeat),
+            'batch pydantic 2 (TypeAdapter)': rate(lambda: adapter.validate_python(batch), batch_size, repeat),
+        }
+        if model is CountryHealthData:
+            measured['batch validate_country_batch'] = rate(lambda: validate_country_batch(batch),
+                                                            batch_size, repeat)
+        
+        print(f"\n{name}")
+        baseline = measured['single pydantic 1.x']
+        for label, per_second in measured.items():
+            print(f"  {label:<32} {per_second:>12,.0f} /s   {per_second / baseline:>6.1f}x")
+        results[name] = {label: round(per_second) for label, per_second in measured.items()}
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--single', type=int, default=1000, help='payloads validated one at a time')
+    parser.add_argument('--batch-size', type=int, default=50_000, help='payloads per batch')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs (best is reported)')
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+    
+    results = benchmark(args.single, args.batch_size, args.repeat)
+    
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+if __name__ == '__main__':
+    main()
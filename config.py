@@ -6,9 +6,104 @@ COUNTRIES = ['USA', 'UK', 'Canada', 'Germany', 'Japan']
 
 # Database Configuration
 DB_PATH = 'public_health_data.db'
+DB_READER_POOL_SIZE = 4  # Concurrent reader connections (the writer is always one)
+DB_SYNCHRONOUS = 'NORMAL'  # With WAL, NORMAL only risks the last commit on power loss
+DB_MMAP_SIZE = 256 * 1024 * 1024  # Bytes of the database file to memory-map
+DB_CACHE_SIZE_KB = 64 * 1024  # Page cache per connection
+DB_BUSY_TIMEOUT_SECONDS = 5  # Wait this long for a lock before failing
+DB_STATEMENT_CACHE_SIZE = 256  # Prepared statements cached per connection
 
 # Scheduling Configuration
 FETCH_INTERVAL_MINUTES = 10  # disease.sh updates every 10 minutes
 
+# Rollups and retention
+RAW_TREND_MAX_DAYS = 2  # Trends up to this long read raw rows...
+HOURLY_TREND_MAX_DAYS = 31  # ...up to this long hourly rollups, longer ones daily rollups
+RAW_RETENTION_DAYS = 30  # Prune raw country_stats rows and alerts older than this
+HOURLY_RETENTION_DAYS = 400  # Prune hourly rollups older than this (daily rollups are kept)
+RETENTION_BATCH_SIZE = 10000  # Rows deleted per transaction, so readers and the collector aren't starved
+
+# Columnar archive of closed months (compacted by the retention job, read by archive.py)
+ARCHIVE_ENABLED = True  # Raw rows are only pruned once archived while this is on
+ARCHIVE_DIR = 'archive'
+ARCHIVE_GRACE_DAYS = 1  # Archive a month once it ended this many days ago, so late rows land first
+
+# In-memory window of recent rows, for trend, surge and summary reads
+RECENT_STORE_ENABLED = True
+RECENT_STORE_DAYS = 3  # Covers RAW_TREND_MAX_DAYS trends and 24h of global data
+RECENT_STORE_SLACK = 1.25  # Ring capacity over one row per fetch interval
+RECENT_STORE_SYNC_SECONDS = 1  # The health API picks up the collector's rows at most this often
+
 # Alert thresholds
-CASE_INCREASE_THRESHOLD_PERCENT = 5  # Alert if daily cases increase >5%
\ No newline at end of file
+CASE_INCREASE_THRESHOLD_PERCENT = 5  # Alert if daily cases increase >5%
+SURGE_LOOKBACK_DAYS = 14  # Batch surge detection only scans this much recent history first
+ALERT_LOOKBACK_HOURS = 1  # /alerts reports alerts raised within this window
+
+# Streaming anomaly detection (runs in the collector as data arrives)
+EWMA_ALPHA = 0.3  # Weight of the newest point in the moving average
+ANOMALY_WINDOW_POINTS = 144  # Rolling mean/std window (one day of 10-minute polls)
+ANOMALY_MIN_POINTS = 12  # Don't flag anomalies until the window has this many points
+ANOMALY_ZSCORE_THRESHOLD = 3.0  # Alert when today_cases is this many std devs above the mean
+WOW_INCREASE_THRESHOLD_PERCENT = 25  # Alert if the last 7 days exceed the previous 7 by >25%
+
+# Fetch mode: 'bulk' downloads every country in one /countries request,
+# 'per_country' requests /countries/{country} for each entry in COUNTRIES
+FETCH_MODE = 'bulk'
+
+# Concurrency Configuration
+MAX_CONCURRENT_REQUESTS = 10  # Parallel country fetches per cycle
+REQUESTS_PER_SECOND = 5  # Shared rate limit across all fetch threads
+
+
+# HTTP Connection Pooling
+HTTP_POOL_CONNECTIONS = 4  # Host pools to keep (disease.sh is a single host)
+HTTP_POOL_MAXSIZE = MAX_CONCURRENT_REQUESTS  # Open connections kept per host
+HTTP_POOL_BLOCK = True  # Wait for a free connection instead of exceeding the per-host limit
+HTTP_KEEP_ALIVE = True  # Reuse TCP/TLS connections between requests
+
+
+# Health API caching
+CACHE_MAX_ENTRIES = 256  # LRU bound on cached query results
+CACHE_DEFAULT_TTL_SECONDS = 30
+CACHE_TTL_SECONDS = {  # Per-query TTLs; only these HealthDatabase methods are cached
+    'get_recent_global_data': 30,
+    'get_data_quality_metrics': 30,
+    'get_recent_alerts': 60,
+    'get_top_countries_by_today_cases': 60,
+    'get_latest_country_stats': 60,
+    'get_country_trend': 300,
+    'detect_case_surges': 60,
+    'get_error_fingerprints': 30,
+}
+CACHE_GENERATION_CHECK_SECONDS = 1  # How often to ask SQLite whether the collector committed
+
+# /history endpoint
+HISTORY_DEFAULT_DAYS = 7  # Range when the request gives no start
+HISTORY_MAX_COUNTRIES = 50
+HISTORY_WINDOW_BUCKETS = 1000  # Buckets read per query while streaming, bounding memory per request
+
+# Health API server (python serve.py)
+API_READ_ONLY = True  # The API only reads; it opens the database read-only and leaves writes to the collector
+SERVER_BIND = '127.0.0.1:5001'  # Same port as the dev server; use --bind 0.0.0.0:5001 to serve other hosts
+SERVER_WORKERS = 4  # Processes, each with its own read-only connections, recent store and cache
+SERVER_THREADS = DB_READER_POOL_SIZE  # Requests in flight per worker (one reader connection each)
+SERVER_TIMEOUT_SECONDS = 30  # Restart a worker whose request takes longer than this
+
+# Historical backfill (python backfill.py)
+BACKFILL_DAYS = 'all'  # lastdays for /historical; an int limits history to that many days
+BACKFILL_BATCH_ROWS = 50000  # Rows per bulk-load transaction
+
+# Ingest pipeline (fetch -> validate -> write, connected by bounded queues)
+PIPELINE_FETCH_WORKERS = MAX_CONCURRENT_REQUESTS
+PIPELINE_VALIDATE_WORKERS = 2
+PIPELINE_QUEUE_SIZE = 1000  # Max payloads waiting between stages (backpressure)
+PIPELINE_VALIDATE_BATCH_SIZE = 500
+PIPELINE_WRITE_BATCH_SIZE = 1000  # Max rows per writer transaction
+
+# Logging
+LOG_DIR = 'logs'
+LOG_QUEUED = True  # Format and write log records on a background thread
+LOG_JSON = True  # JSON lines in the log file (the console stays plain text)
+LOG_ROTATION = 'time'  # 'time' rolls over at midnight, 'size' at LOG_MAX_BYTES
+LOG_MAX_BYTES = 50 * 1024 * 1024
+LOG_BACKUP_COUNT = 14
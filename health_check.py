@@ -1,10 +1,51 @@
-from flask import Flask, jsonify
-from src.database import HealthDatabase
-from config import DB_PATH, COUNTRIES, CASE_INCREASE_THRESHOLD_PERCENT
+import hashlib
+import json
+import time
+from flask import Flask, g, jsonify, request
+from src.cache import CachedHealthDatabase
+from src.database import HealthDatabase, HISTORY_BUCKETS, HISTORY_METRICS, ensure_schema, naive_local
+from src.archive import ColumnarArchive
+from src.recent_store import RecentStore
+from src.metrics import REGISTRY, API_REQUEST_SECONDS, render_prometheus
+from config import (DB_PATH, COUNTRIES, ALERT_LOOKBACK_HOURS, ARCHIVE_ENABLED, HISTORY_MAX_COUNTRIES,
+                    RECENT_STORE_ENABLED, API_READ_ONLY)
 from datetime import datetime
 
 app = Flask(__name__)
-db = HealthDatabase(DB_PATH)
+if API_READ_ONLY:
+    ensure_schema(DB_PATH)  # a no-op once the collector or serve.py has set the database up
+db = CachedHealthDatabase(HealthDatabase(DB_PATH, archive=ColumnarArchive() if ARCHIVE_ENABLED else None,
+                                         recent=RecentStore() if RECENT_STORE_ENABLED else None,
+                                         read_only=API_READ_ONLY))
+
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_latency(response):
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    API_REQUEST_SECONDS.observe(time.perf_counter() - g.request_start,
+                                route=route, status=response.status_code)
+    return response
+
+def etag_for(payload: dict) -> str:
+    """ETag for a response body, ignoring its 'timestamp' (which changes on every request)"""
+    content = {key: value for key, value in payload.items() if key != 'timestamp'}
+    encoded = json.dumps(content, sort_keys=True, default=str).encode()
+    return hashlib.sha1(encoded).hexdigest()
+
+def conditional_response(payload: dict, status: int):
+    """JSON response with an ETag, or an empty 304 if the client already has it"""
+    etag = etag_for(payload)
+    if status == 200 and request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        response = jsonify(payload)
+        response.status_code = status
+    response.set_etag(etag)
+    return response
+
 @app.route('/')
 def hello():
     return "Flask is working!"
@@ -17,30 +58,32 @@ def health_check():
         recent_data = db.get_recent_global_data(hours=24)
         
         if not recent_data:
-            return jsonify({
+            return conditional_response({
                 'status': 'unhealthy',
                 'message': 'No data in last hour',
                 'timestamp': datetime.now().isoformat()
-            }), 503
+            }, 503)
         
         # Check data quality
-        metrics = db.get_data_quality_metrics(hours=1)
+        # A copy: the cached result is shared with other requests
+        metrics = dict(db.get_data_quality_metrics(hours=1))
+        metrics['errors'] = db.get_error_fingerprints(hours=1, limit=10)
         
         if metrics['success_rate_percent'] < 80:
-            return jsonify({
+            return conditional_response({
                 'status': 'degraded',
                 'message': f"Success rate below 80%: {metrics['success_rate_percent']}%",
                 'metrics': metrics,
                 'timestamp': datetime.now().isoformat()
-            }), 200
+            }, 200)
         
-        return jsonify({
+        return conditional_response({
             'status': 'healthy',
             'message': 'System operating normally',
             'metrics': metrics,
             'timestamp': datetime.now().isoformat()
-        }), 200
-        
+        }, 200)
+    
     except Exception as e:
         return jsonify({
             'status': 'error',
@@ -50,35 +93,103 @@ def health_check():
 
 @app.route('/alerts', methods=['GET'])
 def check_alerts():
-    """Check for any case surges"""
-    alerts = []
-    
-    for country in COUNTRIES:
-        surge_info = db.detect_case_surge(country, CASE_INCREASE_THRESHOLD_PERCENT)
-        if surge_info.get('surge_detected'):
-            alerts.append({
-                'country': country,
-                'alert_type': 'case_surge',
-                'severity': 'warning',
-                'details': surge_info
-            })
+    """Report surge and anomaly alerts raised by the collector"""
+    # Alerts are computed at ingest time (see StreamingSurgeDetector)
+    alerts = db.get_recent_alerts(hours=ALERT_LOOKBACK_HOURS)
     
-    return jsonify({
+    return conditional_response({
         'alert_count': len(alerts),
         'alerts': alerts,
         'timestamp': datetime.now().isoformat()
-    }), 200
+    }, 200)
 
 @app.route('/summary', methods=['GET'])
 def get_summary():
     """Get current summary of all monitored countries"""
     top_countries = db.get_top_countries_by_today_cases(limit=10)
     
-    return jsonify({
+    return conditional_response({
         'top_countries_today': top_countries,
         'monitored_countries': COUNTRIES,
         'timestamp': datetime.now().isoformat()
-    }), 200
+    }, 200)
+
+def history_params() -> dict:
+    """Validate /history's query string; raises ValueError with a message for the client"""
+    countries = [name for name in request.args.get('countries', '').split(',') if name]
+    if not countries:
+        raise ValueError("'countries' is required (comma-separated)")
+    if len(countries) > HISTORY_MAX_COUNTRIES:
+        raise ValueError(f"At most {HISTORY_MAX_COUNTRIES} countries per request")
+    metrics = [name for name in request.args.get('metrics', '').split(',') if name] or list(HISTORY_METRICS)
+    unknown = [name for name in metrics if name not in HISTORY_METRICS]
+    if unknown:
+        raise ValueError(f"Unknown metrics {unknown}; choose from {list(HISTORY_METRICS)}")
+    bucket = request.args.get('bucket', '1h')
+    if bucket not in HISTORY_BUCKETS:
+        raise ValueError(f"'bucket' must be one of {list(HISTORY_BUCKETS)}")
+    output = request.args.get('format', 'ndjson')
+    if output not in ('ndjson', 'json'):
+        raise ValueError("'format' must be 'ndjson' or 'json'")
+    start = request.args.get('start')
+    end = request.args.get('end')
+    # ValueError on a bad date; dates with an offset (or Z) are converted to local time like the stored ones
+    start = naive_local(datetime.fromisoformat(start)) if start else None
+    end = naive_local(datetime.fromisoformat(end)) if end else None
+    if start and end and start >= end:
+        raise ValueError("'start' must be before 'end'")
+    return {'countries': countries, 'metrics': metrics, 'bucket': bucket, 'start': start, 'end': end,
+            'format': output}
+
+@app.route('/history', methods=['GET'])
+def get_history():
+    """
+    Downsampled history for several countries, streamed as it is read
+    Query: countries=USA,UK  metrics=total_cases,today_cases  bucket=10m|1h|1d|1w
+           start, end (ISO dates)  format=ndjson (one point per line) | json
+    """
+    try:
+        params = history_params()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        # Checks its arguments before anything is streamed
+        points = db.iter_country_history(params['countries'], params['metrics'], params['start'],
+                                         params['end'], params['bucket'])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if params['format'] == 'ndjson':
+        def generate():
+            for point in points:
+                yield json.dumps(point) + '\n'
+        return app.response_class(generate(), mimetype='application/x-ndjson')
+    
+    def generate_json():
+        yield json.dumps({'bucket': params['bucket'], 'metrics': params['metrics']})[:-1] + ', "points": ['
+        separator = ''
+        for point in points:
+            yield separator + json.dumps(point)
+            separator = ', '
+        yield ']}'
+    return app.response_class(generate_json(), mimetype='application/json')
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics for this API process and the collector"""
+    snapshots = [({'process': 'api'}, REGISTRY.snapshot())]
+    now = datetime.now()
+    ages = []
+    for process, published in sorted(db.load_metrics_snapshots().items()):
+        snapshots.append(({'process': process}, published['snapshot']))
+        ages.append(({'process': process}, (now - published['updated_at']).total_seconds()))
+    
+    body = render_prometheus(snapshots, gauges={
+        'metrics_snapshot_age_seconds': ('Seconds since the process last published its metrics', ages)
+    })
+    return app.response_class(body, mimetype='text/plain; version=0.0.4')
 
 if __name__ == '__main__':
+    # Development server; run python serve.py in production
     app.run(debug=True, port=5001)
\ No newline at end of file
@@ -1,66 +1,185 @@
 from src.api_client import HealthDataAPIClient
-from src.validator import validate_global_data, validate_country_data
+from src.validator import validate_global_data, validate_country_batch
 from src.database import HealthDatabase
 from src.logger import setup_logger
-from config import DB_PATH, FETCH_INTERVAL_MINUTES, COUNTRIES
+from src.change_detection import ChangeTracker, GLOBAL_ENTITY, country_entity
+from src.surge_detector import StreamingSurgeDetector
+from src.pipeline import IngestPipeline
+from src.metrics import REGISTRY, PIPELINE_STAGE_SECONDS, CYCLE_SECONDS
+from src.archive import ColumnarArchive
+from src.recent_store import RecentStore
+from config import (DB_PATH, FETCH_INTERVAL_MINUTES, COUNTRIES, FETCH_MODE,
+                    RAW_RETENTION_DAYS, HOURLY_RETENTION_DAYS, ARCHIVE_ENABLED, RECENT_STORE_ENABLED)
 from apscheduler.schedulers.blocking import BlockingScheduler
+import json
+import time
 from datetime import datetime
+from functools import partial
+from typing import Dict, List, Tuple
 
 # Setup logger
 logger = setup_logger(__name__)
 
 # Initialize components
 api_client = HealthDataAPIClient()
-database = HealthDatabase(DB_PATH)
+archive = ColumnarArchive() if ARCHIVE_ENABLED else None
+database = HealthDatabase(DB_PATH, archive=archive,
+                          recent=RecentStore() if RECENT_STORE_ENABLED else None)
+change_tracker = ChangeTracker()
+surge_detector = StreamingSurgeDetector()
+pipeline = IngestPipeline()
 
 def fetch_and_store_data():
     """Main function that runs every 10 minutes"""
     logger.info("=" * 60)
     logger.info("Starting public health data collection")
+    cycle_start = time.perf_counter()
     
     # Fetch and store global data
     logger.info("Fetching global statistics...")
     global_data = api_client.fetch_global_data()
     
-    if global_data:
+    if global_data and not change_tracker.is_changed(GLOBAL_ENTITY, global_data):
+        logger.info("Global data unchanged since last poll, skipping")
+    elif global_data:
         validated = validate_global_data(global_data)
         if validated:
             success = database.insert_global_stats(global_data)
             if success:
-                logger.info(f"Global: {validated.cases:,} cases, {validated.todayCases:,} today")
+                change_tracker.mark_processed(GLOBAL_ENTITY, global_data)
+                logger.info("Global: %d cases, %d today", validated.cases, validated.todayCases)
             else:
                 logger.error("Failed to store global data")
         else:
             logger.error("Global data validation failed")
-            database.log_error('VALIDATION_FAILED', 'Global data invalid', str(global_data))
+            change_tracker.mark_processed(GLOBAL_ENTITY, global_data)
+            database.log_error('VALIDATION_FAILED', 'Global data invalid', json.dumps(global_data, default=str))
     else:
         logger.error("Failed to fetch global data")
         database.log_error('API_FETCH_FAILED', 'Could not retrieve global data')
     
-    # Fetch and store country data
-    logger.info(f"Fetching data for {len(COUNTRIES)} countries...")
-    country_data = api_client.fetch_all_countries()
+    # Fetch, validate and store country data as a pipeline, so a slow API
+    # response doesn't hold up storing the countries that already arrived
+    logger.info("Fetching data for %d countries (%s mode)...", len(COUNTRIES), FETCH_MODE)
+    if FETCH_MODE == 'bulk':
+        fetch_tasks = [fetch_countries_bulk]
+    else:
+        fetch_tasks = [partial(fetch_country, country) for country in COUNTRIES]
     
-    successful = 0
-    for data in country_data:
-        validated = validate_country_data(data)
-        if validated:
-            success = database.insert_country_stats(data)
-            if success:
-                logger.info(f"{data['country']}: {validated.todayCases:,} cases today")
-                successful += 1
-        else:
-            logger.error(f"Validation failed for {data.get('country', 'unknown')}")
-            database.log_error('VALIDATION_FAILED', f'Country data invalid', str(data))
+    cycle = {'stored': 0, 'alerts': []}
+    stats = pipeline.run(fetch_tasks, validate_countries,
+                         partial(store_countries, cycle))
+    
+    for alert in cycle['alerts']:
+        logger.warning("ALERT %s for %s: %s", alert['alert_type'], alert['country'], alert['details'])
     
-    logger.info(f"Successfully stored data for {successful}/{len(country_data)} countries")
+    # Tell the health API's caches that new data is available
+    database.bump_data_generation()
+    
+    skipped = stats['validate']['items_in'] - stats['validate']['items_out'] - stats['validate']['errors']
+    if skipped:
+        logger.info("%d/%d countries unchanged since last poll, skipping", skipped, stats['validate']['items_in'])
+    logger.info("Successfully stored data for %d/%d countries", cycle['stored'],
+                stats['validate']['items_in'] - skipped)
+    logger.info("Pipeline: fetch %d in / %.3fs busy, validate %d in / %.3fs busy, "
+                "write %d in / %.3fs busy, %.3fs total",
+                *(value for stage in ('fetch', 'validate', 'write')
+                  for value in (stats[stage]['items_in'], stats[stage]['busy_seconds'])),
+                stats['total_seconds'])
+    
+    for stage in ('fetch', 'validate', 'write'):
+        PIPELINE_STAGE_SECONDS.observe(stats[stage]['busy_seconds'], stage=stage)
+    CYCLE_SECONDS.observe(time.perf_counter() - cycle_start)
+    # The health API runs in another process; publish our metrics for its /metrics
+    database.save_metrics_snapshot('collector', REGISTRY.snapshot())
     logger.info("Data collection cycle complete")
 
+def fetch_countries_bulk() -> List[Dict]:
+    """Fetch every monitored country in one request, falling back to per-country requests"""
+    country_data = api_client.fetch_all_countries_bulk()
+    if country_data is None:
+        logger.warning("Bulk fetch failed, falling back to per-country requests")
+        country_data = api_client.fetch_all_countries()
+    # Count countries that didn't come back as fetch failures, as per_country mode does
+    database.log_errors_batch([('API_FETCH_FAILED', f'Could not retrieve data for {country}', None, country)
+                               for country in api_client.missing_countries(country_data)])
+    return country_data
+
+def fetch_country(country: str) -> List[Dict]:
+    """Fetch one monitored country (per_country mode)"""
+    data = api_client.fetch_country_data(country)
+    if not data:
+        database.log_error('API_FETCH_FAILED', f'Could not retrieve data for {country}', country=country)
+        return []
+    return [data]
+
+def validate_countries(payloads: List[Dict]) -> Tuple[List[Dict], List[Tuple]]:
+    """
+    Pipeline validation stage: drop unchanged snapshots, validate the rest column-wise
+    Returns: (valid payloads, error_log entries for the invalid ones)
+    """
+    # Skip snapshots we already stored (disease.sh often hasn't refreshed yet)
+    changed = [data for data in payloads
+               if change_tracker.is_changed(country_entity(data.get('country')), data)]
+    
+    validation = validate_country_batch(changed)
+    validation_errors = []
+    for error in validation['errors']:
+        data = changed[error['index']]
+        logger.error("Validation failed for %s: %s", error['country'] or 'unknown', error['error'])
+        change_tracker.mark_processed(country_entity(data.get('country')), data)
+        validation_errors.append(('VALIDATION_FAILED', 'Country data invalid', json.dumps(data, default=str),
+                                  data.get('country')))
+    return validation['valid'], validation_errors
+
+def store_countries(cycle: Dict, valid_rows: List[Dict], validation_errors: List[Tuple]):
+    """Pipeline writer stage: store a batch in one transaction and update the detectors"""
+    result = database.insert_country_stats_batch(valid_rows)
+    failed = {error['index']: error['error'] for error in result['errors']}
+    
+    alerts = []
+    updated_countries = []
+    for index, data in enumerate(valid_rows):
+        if index in failed:
+            logger.error("Failed to store %s: %s", data['country'], failed[index])
+            continue
+        change_tracker.mark_processed(country_entity(data['country']), data)
+        logger.info("%s: %d cases today", data['country'], data.get('todayCases') or 0)
+        cycle['stored'] += 1
+        
+        # Update rolling statistics as the data arrives, so /alerts only reads results
+        alerts.extend(surge_detector.update(data['country'],
+                                            datetime.fromtimestamp(data['updated'] / 1000),
+                                            data.get('todayCases')))
+        updated_countries.append(data['country'])
+    
+    database.log_errors_batch(validation_errors)
+    if updated_countries:
+        database.save_alerts(alerts, surge_detector.dump_states(updated_countries))
+    cycle['alerts'].extend(alerts)
+
+def apply_retention():
+    """Archive closed months and late rows, then prune raw history that the rollups (and archive) already hold"""
+    if archive is not None:
+        written = archive.compact(database)
+        for table, months in written.items():
+            if months:
+                logger.info("Archived %s: %s", table, ', '.join(months))
+    deleted = database.prune_raw_data(RAW_RETENTION_DAYS, HOURLY_RETENTION_DAYS)
+    database.bump_data_generation()
+    logger.info("Retention: pruned %s", ', '.join(f'{count} {table}' for table, count in deleted.items()))
+
 def main():
     """Setup scheduler and run indefinitely"""
     logger.info("Public Health Monitor starting up")
-    logger.info(f"Monitoring countries: {', '.join(COUNTRIES)}")
-    logger.info(f"Will fetch data every {FETCH_INTERVAL_MINUTES} minutes")
+    logger.info("Monitoring countries: %s", ', '.join(COUNTRIES))
+    logger.info("Will fetch data every %d minutes", FETCH_INTERVAL_MINUTES)
+    
+    # Don't re-store snapshots that were already saved before a restart
+    latest = database.get_latest_updated()
+    change_tracker.seed(latest['global'], latest['countries'])
+    # Resume rolling statistics where the last run left off
+    surge_detector.load_states(database.load_detector_state())
     
     # Run once immediately
     fetch_and_store_data()
@@ -71,7 +190,17 @@ def main():
         fetch_and_store_data,
         'interval',
         minutes=FETCH_INTERVAL_MINUTES,
-        id='health_data_fetch_job'
+        id='health_data_fetch_job',
+        # A cycle that overruns the interval delays the next one instead of
+        # running alongside it, and missed runs collapse into one
+        max_instances=1,
+        coalesce=True
+    )
+    scheduler.add_job(
+        apply_retention,
+        'interval',
+        days=1,
+        id='retention_job'
     )
     
     try:
@@ -79,6 +208,9 @@ def main():
         scheduler.start()
     except (KeyboardInterrupt, SystemExit):
         logger.info("Scheduler stopped by user")
+    finally:
+        api_client.close()
+        database.close()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
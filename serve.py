@@ -0,0 +1,62 @@
+"""
+Run the health API in production under gunicorn: several worker processes,
+each handling a few requests at once on threads.
+
+Usage:
+    python serve.py
+    python serve.py --workers 8 --threads 4 --bind 0.0.0.0:8000
+
+The schema is created or migrated once here, before any worker starts.
+Each worker then imports health_check itself, so it opens its own
+read-only connections, recent store and cache; no SQLite connection is
+shared across the fork. Workers log to logs/health_monitor.<pid>.jsonl
+(the master keeps health_monitor.jsonl), so no two processes rotate the
+same file. python health_check.py is the development server.
+"""
+import argparse
+from gunicorn.app.base import BaseApplication
+from src.database import ensure_schema
+from src.logger import setup_logger
+from config import DB_PATH, SERVER_BIND, SERVER_WORKERS, SERVER_THREADS, SERVER_TIMEOUT_SECONDS
+
+logger = setup_logger(__name__)
+
+class HealthAPIServer(BaseApplication):
+    """gunicorn application that loads health_check.app in each worker"""
+    
+    def __init__(self, options: dict):
+        self.options = options
+        super().__init__()
+    
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+    
+    def load(self):
+        # Runs in the worker after the fork (preload_app is off)
+        from health_check import app
+        return app
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bind', default=SERVER_BIND, help='host:port to listen on')
+    parser.add_argument('--workers', type=int, default=SERVER_WORKERS, help='worker processes')
+    parser.add_argument('--threads', type=int, default=SERVER_THREADS, help='request threads per worker')
+    parser.add_argument('--timeout', type=int, default=SERVER_TIMEOUT_SECONDS,
+                        help='seconds before a stuck worker is restarted')
+    args = parser.parse_args()
+    
+    version = ensure_schema(DB_PATH)
+    logger.info("Serving the health API on %s: %d workers x %d threads (schema version %d)",
+                args.bind, args.workers, args.threads, version)
+    HealthAPIServer({
+        'bind': args.bind,
+        'workers': args.workers,
+        'threads': args.threads,
+        'worker_class': 'gthread',
+        'timeout': args.timeout,
+        'preload_app': False,
+    }).run()
+
+if __name__ == '__main__':
+    main()
@@ -1,65 +1,253 @@
+import codecs
+import json
+import logging
 import requests
+import threading
 import time
-from typing import Optional, Dict, List
-from config import BASE_URL, COUNTRIES
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional, Dict, List, Iterable, Iterator, Callable, Any, Tuple, Union
+from config import (BASE_URL, COUNTRIES, MAX_CONCURRENT_REQUESTS, REQUESTS_PER_SECOND,
+                    HTTP_POOL_CONNECTIONS, HTTP_POOL_MAXSIZE, HTTP_POOL_BLOCK, HTTP_KEEP_ALIVE)
+from src.rate_limiter import RateLimiter
+from src.metrics import HTTP_REQUEST_SECONDS, HTTP_RESPONSES, HTTP_RETRIES
+
+logger = logging.getLogger(__name__)
+
+def iter_json_array(chunks: Iterable[bytes]) -> Iterator[Dict]:
+    """
+    Incrementally parse a top-level JSON array of objects
+    Args:
+        chunks: Raw UTF-8 byte chunks, e.g. from response.iter_content()
+    Returns: Iterator yielding one decoded object at a time, so only the
+             element being parsed is ever held in memory
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    chunks = iter(chunks)
+    buffer = ''
+    pos = 0
+    started = False
+    exhausted = False
+    
+    while True:
+        # Skip whitespace and element separators
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+            pos += 1
+        
+        if pos < len(buffer):
+            char = buffer[pos]
+            if not started:
+                if char != '[':
+                    raise ValueError(f'Expected JSON array, found {char!r}')
+                started = True
+                pos += 1
+                continue
+            if char == ']':
+                return
+            if char != '{':
+                raise ValueError(f'Expected JSON object in array, found {char!r}')
+            try:
+                item, pos = decoder.raw_decode(buffer, pos)
+                yield item
+                continue
+            except json.JSONDecodeError:
+                # Object is split across chunks - read more below
+                if exhausted:
+                    raise
+        
+        if exhausted:
+            raise ValueError('Unexpected end of JSON array')
+        
+        chunk = next(chunks, None)
+        if chunk is None:
+            exhausted = True
+            buffer = buffer[pos:] + text_decoder.decode(b'', final=True)
+        else:
+            buffer = buffer[pos:] + text_decoder.decode(chunk)
+        pos = 0
 
 class HealthDataAPIClient:
     """Handles all interactions with disease.sh API"""
     
-    def __init__(self, max_retries: int = 3):
+    def __init__(self, max_retries: int = 3,
+                 max_workers: int = MAX_CONCURRENT_REQUESTS,
+                 requests_per_second: float = REQUESTS_PER_SECOND,
+                 pool_connections: int = HTTP_POOL_CONNECTIONS,
+                 pool_maxsize: int = HTTP_POOL_MAXSIZE,
+                 pool_block: bool = HTTP_POOL_BLOCK,
+                 keep_alive: bool = HTTP_KEEP_ALIVE,
+                 conditional_requests: bool = True):
         self.base_url = BASE_URL
         self.countries = COUNTRIES
         self.max_retries = max_retries
-
-    def _make_request(self, endpoint: str) -> Optional[Dict]:
+        self.max_workers = max_workers
+        self.rate_limiter = RateLimiter(requests_per_second)
+        self.session = self._create_session(pool_connections, pool_maxsize, pool_block, keep_alive)
+        # endpoint -> {'etag', 'last_modified', 'value'} for conditional requests
+        self.conditional_requests = conditional_requests
+        self._validator_cache: Dict[str, Dict] = {}
+        self._validator_lock = threading.Lock()
+    
+    @staticmethod
+    def _create_session(pool_connections: int, pool_maxsize: int,
+                        pool_block: bool, keep_alive: bool) -> requests.Session:
+        """
+        Build the long-lived session shared by every request (and thread)
+        Args:
+            pool_connections: Number of per-host pools to cache
+            pool_maxsize: Connections kept open per host
+            pool_block: Block when the per-host limit is reached
+            keep_alive: Keep connections open between requests
+        Returns: Configured requests.Session
+        """
+        session = requests.Session()
+        # Retries are handled in _make_request, so the adapter never retries itself
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                              pool_block=pool_block, max_retries=0)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update({
+            'Accept': 'application/json',
+            'Accept-Encoding': 'gzip, deflate',
+            'Connection': 'keep-alive' if keep_alive else 'close',
+        })
+        return session
+    
+    def close(self):
+        """Close pooled connections"""
+        self.session.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def _make_request(self, endpoint: str, stream: bool = False,
+                      parse: Callable[[requests.Response], Any] = None) -> Optional[Any]:
         """
         Make API request with retry logic
         Args:
             endpoint: Full URL to request
-        Returns: JSON response or None
+            stream: Don't read the body up front (for incremental parsing)
+            parse: Turns the response into the return value (default: .json())
+        Returns: Parsed response or None
         """
+        headers, cached = self._conditional_headers(endpoint)
+        label = self._endpoint_label(endpoint)
+        retry_reason = None
+        
         for attempt in range(self.max_retries):
+            if retry_reason:
+                HTTP_RETRIES.inc(endpoint=label, reason=retry_reason)
+            self.rate_limiter.acquire()
+            wait_time = 0
+            start = time.perf_counter()
             try:
-                response = requests.get(endpoint, timeout=10)
+                response = self.session.get(endpoint, timeout=10, stream=stream, headers=headers)
+                HTTP_RESPONSES.inc(endpoint=label, status=response.status_code)
+                
+                # Unchanged since our last fetch - reuse the previous result
+                if response.status_code == 304 and cached is not None:
+                    response.close()
+                    return cached['value']
                 
                 # Check for rate limiting (though disease.sh is very generous)
                 if response.status_code == 429:
+                    response.close()  # return the connection to the pool before backing off
                     wait_time = 2 ** attempt  # Exponential backoff
-                    print(f"Rate limited. Waiting {wait_time} seconds...")
-                    time.sleep(wait_time)
-                    continue
-                
-                response.raise_for_status()
-                return response.json()
-                
+                    retry_reason = 'rate_limited'
+                    logger.warning("Rate limited. Waiting %s seconds...", wait_time)
+                else:
+                    response.raise_for_status()
+                    value = parse(response) if parse is not None else response.json()
+                    self._remember_validators(endpoint, response, value)
+                    return value
+            
             except requests.exceptions.Timeout:
-                print(f"Timeout on attempt {attempt + 1}/{self.max_retries}")
+                HTTP_RESPONSES.inc(endpoint=label, status='timeout')
+                retry_reason = 'timeout'
+                logger.warning("Timeout on attempt %d/%d: %s", attempt + 1, self.max_retries, endpoint)
                 if attempt < self.max_retries - 1:
-                    time.sleep(2 ** attempt)
-                    
+                    wait_time = 2 ** attempt
+            
             except requests.exceptions.HTTPError as e:
+                # The body is never read; release the (possibly streamed) connection
+                response.close()
                 # Don't retry on client errors (4xx)
                 if 400 <= response.status_code < 500:
-                    print(f"Client error: {e}")
+                    logger.error("Client error: %s", e)
                     return None
                 # Retry on server errors (5xx)
-                print(f"Server error on attempt {attempt + 1}: {e}")
+                retry_reason = 'server_error'
+                logger.warning("Server error on attempt %d: %s", attempt + 1, e)
                 if attempt < self.max_retries - 1:
-                    time.sleep(2 ** attempt)
-                    
+                    wait_time = 2 ** attempt
+            
             except requests.exceptions.RequestException as e:
-                print(f"Request failed on attempt {attempt + 1}: {e}")
+                retry_reason = 'request_error'
+                logger.warning("Request failed on attempt %d: %s", attempt + 1, e)
                 if attempt < self.max_retries - 1:
-                    time.sleep(2 ** attempt)
+                    wait_time = 2 ** attempt
+            
+            finally:
+                # Latency of the attempt itself; backoff sleeps aren't included
+                HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=label)
+            
+            if wait_time:
+                time.sleep(wait_time)
         
-        print(f"All {self.max_retries} attempts failed")
+        logger.error("All %d attempts failed: %s", self.max_retries, endpoint)
         return None
-
+    
+    def _endpoint_label(self, endpoint: str) -> str:
+        """Metrics label for a URL, with the country name replaced ('/countries/{country}')"""
+        path = endpoint[len(self.base_url):] if endpoint.startswith(self.base_url) else endpoint
+        parts = path.split('?', 1)[0].strip('/').split('/')
+        if len(parts) > 1:
+            return f"/{parts[0]}/{{country}}"
+        return f"/{parts[0]}"
+    
+    def _conditional_headers(self, endpoint: str):
+        """
+        Build If-None-Match/If-Modified-Since headers from the last response
+        Returns: (headers dict, cached entry or None)
+        """
+        if not self.conditional_requests:
+            return {}, None
+        with self._validator_lock:
+            cached = self._validator_cache.get(endpoint)
+        if cached is None:
+            return {}, None
+        
+        headers = {}
+        if cached['etag']:
+            headers['If-None-Match'] = cached['etag']
+        if cached['last_modified']:
+            headers['If-Modified-Since'] = cached['last_modified']
+        return headers, cached
+    
+    def _remember_validators(self, endpoint: str, response: requests.Response, value: Any):
+        """Store ETag/Last-Modified so the next request can be conditional"""
+        if not self.conditional_requests:
+            return
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if not etag and not last_modified:
+            return
+        with self._validator_lock:
+            self._validator_cache[endpoint] = {
+                'etag': etag,
+                'last_modified': last_modified,
+                'value': value
+            }
+    
     def fetch_global_data(self) -> Optional[Dict]:
         """Fetch global COVID-19 statistics with retry"""
         endpoint = f"{self.base_url}/all"
         return self._make_request(endpoint)
-
+    
     def fetch_country_data(self, country: str) -> Optional[Dict]:
         """Fetch data for a specific country with retry"""
         endpoint = f"{self.base_url}/countries/{country}"
@@ -67,35 +255,104 @@ class HealthDataAPIClient:
     
     def fetch_all_countries(self) -> List[Dict]:
         """
-        Fetch data for all monitored countries
-        Returns: List of dictionaries with country data
+        Fetch data for all monitored countries concurrently.
+        Requests share the client's rate limiter, so the API sees at most
+        requests_per_second regardless of how many workers are running.
+        Returns: List of dictionaries with country data, in COUNTRIES order
+        """
+        workers = max(1, min(self.max_workers, len(self.countries)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            responses = executor.map(self.fetch_country_data, self.countries)
+            return [data for data in responses if data]
+    
+    def fetch_all_countries_bulk(self) -> Optional[List[Dict]]:
+        """
+        Fetch all monitored countries with a single /countries request.
+        The response array is parsed one element at a time and filtered to
+        the configured countries, so the full list never exists as dicts.
+        Returns: List of country data in response order, or None on failure
         """
-        results = []
-        for country in self.countries:
-            data = self.fetch_country_data(country)
-            if data:
-                results.append(data)
-            time.sleep(0.5)  # Be nice to the API
+        endpoint = f"{self.base_url}/countries"
+        wanted = {country.lower() for country in self.countries}
+        
+        def parse(response: requests.Response) -> List[Dict]:
+            try:
+                rows = iter_json_array(response.iter_content(chunk_size=64 * 1024))
+                return [row for row in rows if self._matches_country(row, wanted)]
+            except ValueError as e:
+                raise requests.exceptions.InvalidJSONError(f"Malformed /countries response: {e}")
+            finally:
+                response.close()
+        
+        results = self._make_request(endpoint, stream=True, parse=parse)
+        if results is None:
+            return None
+        
+        if len(results) < len(self.countries):
+            logger.warning("Bulk response matched %d/%d configured countries", len(results), len(self.countries))
         return results
     
-    def fetch_historical_data(self, country: str, days: int = 30) -> Optional[Dict]:
+    def missing_countries(self, rows: List[Dict]) -> List[str]:
+        """Configured countries that no row matches (by name or ISO code), in COUNTRIES order"""
+        return [country for country in self.countries
+                if not any(self._matches_country(row, {country.lower()}) for row in rows)]
+    
+    @staticmethod
+    def _matches_country(row: Dict, wanted: set) -> bool:
+        """Match a /countries row by name or ISO code (as the per-country endpoint does)"""
+        info = row.get('countryInfo') or {}
+        keys = (row.get('country'), info.get('iso2'), info.get('iso3'))
+        return any(isinstance(key, str) and key.lower() in wanted for key in keys)
+    
+    def fetch_country_names(self) -> Optional[List[str]]:
         """
-        Fetch historical data for a country
+        Fetch the name of every country disease.sh reports on (streamed from /countries)
+        Returns: List of country names, or None on failure
+        """
+        endpoint = f"{self.base_url}/countries"
+        
+        def parse(response: requests.Response) -> List[str]:
+            try:
+                rows = iter_json_array(response.iter_content(chunk_size=64 * 1024))
+                return [row['country'] for row in rows if isinstance(row.get('country'), str)]
+            except ValueError as e:
+                raise requests.exceptions.InvalidJSONError(f"Malformed /countries response: {e}")
+            finally:
+                response.close()
+        
+        return self._make_request(endpoint, stream=True, parse=parse)
+    
+    def fetch_historical_data(self, country: str, days: Union[int, str] = 30) -> Optional[Dict]:
+        """
+        Fetch historical data for a country with retry
         Args:
             country: Country name
-            days: Number of days of history (max 30 for free tier)
-        Returns: Dictionary with historical data
+            days: Number of days of history, or 'all'
+        Returns: Dictionary with 'country' and a 'timeline' of
+                 {'cases'|'deaths'|'recovered': {'M/D/YY': cumulative count}}
         """
         endpoint = f"{self.base_url}/historical/{country}?lastdays={days}"
-        
-        try:
-            response = requests.get(endpoint, timeout=10)
-            response.raise_for_status()
-            return response.json()
-            
-        except requests.exceptions.RequestException as e:
-            print(f"ERROR: Failed to fetch historical data: {e}")
-            return None
+        return self._make_request(endpoint)
+    
+    def fetch_historical_many(self, countries: List[str],
+                              days: Union[int, str] = 30) -> Iterator[Tuple[str, Optional[Dict]]]:
+        """
+        Fetch historical data for many countries concurrently
+        Requests share the client's rate limiter, like fetch_all_countries.
+        Args:
+            countries: Country names
+            days: Number of days of history, or 'all'
+        Returns: Iterator of (country, data or None) in completion order, so
+                 callers can store each timeline while the rest download
+        """
+        if not countries:
+            return
+        workers = max(1, min(self.max_workers, len(countries)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(self.fetch_historical_data, country, days): country
+                       for country in countries}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
 
 # Test it works
 if __name__ == '__main__':
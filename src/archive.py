@@ -0,0 +1,315 @@
+import json
+import logging
+import os
+import shutil
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import quote
+import numpy as np
+from config import ARCHIVE_DIR, ARCHIVE_GRACE_DAYS
+
+logger = logging.getLogger(__name__)
+
+# Archived columns per table, in SELECT order; timestamp always comes first
+ARCHIVE_COLUMNS = {
+    'country_stats': ['timestamp', 'total_cases', 'total_deaths', 'total_recovered', 'active_cases',
+                      'critical_cases', 'today_cases', 'today_deaths', 'population', 'tests',
+                      'cases_per_million', 'deaths_per_million'],
+    'global_stats': ['timestamp', 'total_cases', 'total_deaths', 'total_recovered', 'active_cases',
+                     'critical_cases', 'today_cases', 'today_deaths'],
+}
+FLOAT_COLUMNS = {'cases_per_million', 'deaths_per_million'}
+GLOBAL_PARTITION = '_global'  # global_stats has no country; its month holds one partition
+MANIFEST = '_manifest.json'
+STATE = '_state.json'  # per table: the highest SQLite id every archived month is complete up to
+
+def month_start(when: datetime) -> datetime:
+    return when.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+def next_month(when: datetime) -> datetime:
+    return month_start(month_start(when) + timedelta(days=32))
+
+def _narrowest_int(values: np.ndarray) -> np.ndarray:
+    """Store integers in the smallest signed type that holds them"""
+    if not len(values):
+        return values.astype(np.int32)
+    low, high = values.min(), values.max()
+    for dtype in (np.int8, np.int16, np.int32):
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return values.astype(dtype)
+    return values.astype(np.int64)
+
+def _narrow(values: np.ndarray) -> np.ndarray:
+    """Re-narrow an integer column after concatenation widened it"""
+    return _narrowest_int(values) if values.dtype.kind == 'i' else values
+
+def rows_to_columns(rows: List[Tuple], columns: Sequence[str]) -> Dict[str, np.ndarray]:
+    """
+    Turn SQLite rows into one NumPy array per column
+    Timestamps become datetime64[ms]; integer columns use the narrowest type
+    that fits, or float64 with NaN for NULLs when the column has any
+    Args:
+        rows: Tuples in `columns` order
+        columns: Column names, timestamp first
+    """
+    result = {}
+    for index, name in enumerate(columns):
+        values = [row[index] for row in rows]
+        if name == 'timestamp':
+            result[name] = np.array(values, dtype='datetime64[ms]')
+        elif name in FLOAT_COLUMNS or any(value is None for value in values):
+            result[name] = np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+        else:
+            result[name] = _narrowest_int(np.array(values, dtype=np.int64))
+    return result
+
+class ColumnarArchive:
+    """
+    Month-partitioned, column-per-file copies of country_stats and global_stats
+    
+    Layout: <base_dir>/<table>/<YYYY-MM>/<country>/<column>.npy plus a
+    _manifest.json per month. Each column is a plain .npy file, so reads
+    memory-map it and slice just the requested columns and time range
+    without copying or touching SQLite. Months are only written once they
+    are closed. Rows inserted later below the horizon (a backfill, a late
+    snapshot) are found by their SQLite id and merged into their month on
+    the next compaction, since the month's older raw rows may be pruned.
+    """
+    
+    def __init__(self, base_dir: str = ARCHIVE_DIR):
+        self.base_dir = base_dir
+    
+    def months(self, table: str) -> List[str]:
+        """Archived months of a table ('YYYY-MM'), oldest first"""
+        table_dir = os.path.join(self.base_dir, table)
+        if not os.path.isdir(table_dir):
+            return []
+        # Skip unfinished '<month>.tmp' directories
+        return sorted(month for month in os.listdir(table_dir)
+                      if len(month) == 7 and os.path.exists(os.path.join(table_dir, month, MANIFEST)))
+    
+    def horizon(self, table: str) -> Optional[datetime]:
+        """Start of the first month not archived (rows before it are in the archive), or None"""
+        months = self.months(table)
+        if not months:
+            return None
+        return next_month(datetime.strptime(months[-1], '%Y-%m'))
+    
+    def archived_through_id(self, table: str) -> Optional[int]:
+        """
+        SQLite id up to which every row before the horizon is archived, or None
+        if nothing is archived yet (or the archive predates this record)
+        """
+        try:
+            with open(os.path.join(self.base_dir, table, STATE)) as f:
+                return json.load(f)['max_id']
+        except FileNotFoundError:
+            return None
+    
+    def coverage(self, table: str) -> Optional[Tuple[datetime, int]]:
+        """
+        What the archive confirms it holds: rows before the horizon with an id up
+        to archived_through_id. Returns (horizon, max id), or None for nothing
+        """
+        horizon = self.horizon(table)
+        max_id = self.archived_through_id(table)
+        if horizon is None or max_id is None:
+            return None
+        return horizon, max_id
+    
+    def _save_state(self, table: str, max_id: int):
+        path = os.path.join(self.base_dir, table, STATE)
+        with open(path + '.tmp', 'w') as f:
+            json.dump({'max_id': max_id, 'updated_at': datetime.now().isoformat(timespec='seconds')}, f)
+        os.replace(path + '.tmp', path)
+    
+    def manifest(self, table: str, month: str) -> Dict:
+        with open(os.path.join(self.base_dir, table, month, MANIFEST)) as f:
+            return json.load(f)
+    
+    def compact(self, database, now: Optional[datetime] = None,
+                grace_days: int = ARCHIVE_GRACE_DAYS) -> Dict[str, List[str]]:
+        """
+        Archive every closed month that isn't archived yet, and merge rows
+        inserted below the horizon since the last run into their months
+        Reads go through the database's reader pool (WAL, so the collector isn't blocked).
+        Only rows up to the table's current max id are archived; rows committed
+        meanwhile are picked up by the next run.
+        Args:
+            database: HealthDatabase to read rows from
+            now: Current time (for tests)
+            grace_days: Days after a month ends before it counts as closed
+        Returns: table -> months written
+        """
+        now = now or datetime.now()
+        closed_before = month_start(now - timedelta(days=grace_days))
+        written = {}
+        for table, columns in ARCHIVE_COLUMNS.items():
+            written[table] = []
+            with database.pool.reader() as conn:
+                max_id = conn.execute(f'SELECT COALESCE(MAX(id), 0) FROM {table}').fetchone()[0]
+            start = self.horizon(table)
+            if start is not None:
+                # An archive from before ids were recorded is checked in full once
+                after_id = self.archived_through_id(table) or 0
+                with database.pool.reader() as conn:
+                    late_months = [row[0] for row in conn.execute(f'''
+                        SELECT DISTINCT substr(timestamp, 1, 7) FROM {table}
+                        WHERE id > ? AND id <= ? AND timestamp < ?
+                    ''', (after_id, max_id, start))]
+                for month in sorted(late_months):
+                    month_begin = datetime.strptime(month, '%Y-%m')
+                    late = self._read_partitions(database, table, columns, month_begin, next_month(month_begin),
+                                                 after_id, max_id)
+                    if self._merge_month(table, columns, month_begin, late):
+                        written[table].append(month)
+            else:
+                with database.pool.reader() as conn:
+                    first = conn.execute(f'SELECT MIN(timestamp) FROM {table} WHERE id <= ?',
+                                         (max_id,)).fetchone()[0]
+                if first is None:
+                    continue
+                start = month_start(datetime.fromisoformat(first))
+            while start < closed_before:
+                end = next_month(start)
+                self._write_month(table, start, self._read_partitions(database, table, columns, start, end,
+                                                                      0, max_id))
+                written[table].append(start.strftime('%Y-%m'))
+                start = end
+            if self.months(table):
+                self._save_state(table, max_id)
+        return written
+    
+    def _read_partitions(self, database, table: str, columns: List[str], start: datetime, end: datetime,
+                         after_id: int, max_id: int) -> Dict[str, Dict[str, np.ndarray]]:
+        """Rows in [start, end) with after_id < id <= max_id, as columns per partition"""
+        select = ', '.join(columns)
+        key = 'country, ' if table == 'country_stats' else ''
+        with database.pool.reader() as conn:
+            rows = conn.execute(f'''
+                SELECT {key}{select} FROM {table}
+                WHERE timestamp >= ? AND timestamp < ? AND id > ? AND id <= ?
+                ORDER BY {key}timestamp
+            ''', (start, end, after_id, max_id)).fetchall()
+        
+        partitions: Dict[str, List[Tuple]] = {}
+        for row in rows:
+            if key:
+                partitions.setdefault(row[0], []).append(row[1:])
+            else:
+                partitions.setdefault(GLOBAL_PARTITION, []).append(row)
+        return {name: rows_to_columns(partition_rows, columns) for name, partition_rows in partitions.items()}
+    
+    def _merge_month(self, table: str, columns: List[str], start: datetime,
+                     late: Dict[str, Dict[str, np.ndarray]]) -> bool:
+        """
+        Add late rows to a month, archived or not, and rewrite it
+        Rows whose timestamp the month already holds for that partition are
+        skipped, so a merge interrupted before the state was saved can rerun.
+        Returns: Whether the month changed
+        """
+        month = start.strftime('%Y-%m')
+        archived = month in self.months(table)
+        partitions = {}
+        added = 0
+        for name in set(late) | (set(self.manifest(table, month)['partitions']) if archived else set()):
+            # Copies: the month's files are replaced below
+            current = ({column: np.array(values) for column, values in
+                        self.read(table, name, columns, start, next_month(start)).items()}
+                       if archived else None)
+            new = late.get(name)
+            if new is not None and current is not None and len(current['timestamp']):
+                keep = ~np.isin(new['timestamp'], current['timestamp'])
+                new = {column: values[keep] for column, values in new.items()}
+            if new is None or not len(new['timestamp']):
+                partitions[name] = current
+                continue
+            added += len(new['timestamp'])
+            if current is None or not len(current['timestamp']):
+                partitions[name] = new
+                continue
+            merged = {column: np.concatenate([current[column], new[column]]) for column in columns}
+            order = np.argsort(merged['timestamp'], kind='stable')
+            partitions[name] = {column: _narrow(values[order]) for column, values in merged.items()}
+        if not added:
+            return False
+        self._write_month(table, start, partitions)
+        return True
+    
+    def _write_month(self, table: str, start: datetime, partitions: Dict[str, Dict[str, np.ndarray]]):
+        """Write one month to a temporary directory, then move it into place"""
+        month = start.strftime('%Y-%m')
+        month_dir = os.path.join(self.base_dir, table, month)
+        temp_dir = month_dir + '.tmp'
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        os.makedirs(temp_dir)
+        
+        rows = sum(len(arrays['timestamp']) for arrays in partitions.values())
+        manifest = {'table': table, 'month': month, 'rows': rows, 'partitions': {},
+                    'created_at': datetime.now().isoformat(timespec='seconds')}
+        for name, arrays in sorted(partitions.items()):
+            partition_dir = os.path.join(temp_dir, quote(name, safe=''))
+            os.makedirs(partition_dir)
+            for column, values in arrays.items():
+                np.save(os.path.join(partition_dir, f'{column}.npy'), values)
+            manifest['partitions'][name] = {
+                'rows': len(arrays['timestamp']),
+                'first': str(arrays['timestamp'][0]),
+                'last': str(arrays['timestamp'][-1]),
+                'dtypes': {column: str(values.dtype) for column, values in arrays.items()},
+            }
+        with open(os.path.join(temp_dir, MANIFEST), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        
+        # The manifest is what marks a month as archived, so readers never see half a month
+        shutil.rmtree(month_dir, ignore_errors=True)
+        os.replace(temp_dir, month_dir)
+        logger.info("Archived %s %s: %d rows in %d partitions", table, month, rows, len(partitions))
+    
+    def _partition_slices(self, table: str, partition: str, columns: Sequence[str],
+                          start: Optional[datetime], end: Optional[datetime]) -> Iterator[Dict[str, np.ndarray]]:
+        """Memory-mapped column views of one partition, month by month, trimmed to [start, end)"""
+        low = np.datetime64(start, 'ms') if start else None
+        high = np.datetime64(end, 'ms') if end else None
+        for month in self.months(table):
+            month_begin = datetime.strptime(month, '%Y-%m')
+            if (end and month_begin >= end) or (start and next_month(month_begin) <= start):
+                continue
+            partition_dir = os.path.join(self.base_dir, table, month, quote(partition, safe=''))
+            if not os.path.isdir(partition_dir):
+                continue
+            timestamps = np.load(os.path.join(partition_dir, 'timestamp.npy'), mmap_mode='r')
+            first = np.searchsorted(timestamps, low) if low is not None else 0
+            last = np.searchsorted(timestamps, high) if high is not None else len(timestamps)
+            if first >= last:
+                continue
+            yield {column: np.load(os.path.join(partition_dir, f'{column}.npy'), mmap_mode='r')[first:last]
+                   for column in columns}
+    
+    def read(self, table: str, partition: str, columns: Sequence[str] = ('timestamp',),
+             start: Optional[datetime] = None, end: Optional[datetime] = None) -> Dict[str, np.ndarray]:
+        """
+        Read columns of one partition over a time range
+        Args:
+            table: 'country_stats' or 'global_stats'
+            partition: Country name (GLOBAL_PARTITION for global_stats)
+            columns: Columns to load; other columns' files are never opened
+            start, end: Half-open time range (None = unbounded)
+        Returns: column -> array. A range inside one month is a read-only view
+                 of the memory-mapped file; longer ranges are concatenated
+        """
+        pieces = list(self._partition_slices(table, partition, columns, start, end))
+        if len(pieces) == 1:
+            return pieces[0]
+        if not pieces:
+            return {column: np.array([], dtype='datetime64[ms]' if column == 'timestamp' else np.float64)
+                    for column in columns}
+        return {column: np.concatenate([piece[column] for piece in pieces]) for column in columns}
+    
+    def partitions(self, table: str) -> List[str]:
+        """Every partition (country) present in any archived month"""
+        names = set()
+        for month in self.months(table):
+            names.update(self.manifest(table, month)['partitions'])
+        return sorted(names)
@@ -0,0 +1,96 @@
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple, Union
+from config import BACKFILL_BATCH_ROWS
+
+def flatten_timeline(country: str, historical: Dict) -> List[Tuple]:
+    """
+    Turn a /historical response into country_stats rows, one per day
+    Args:
+        country: Name to store the rows under
+        historical: Response with a 'timeline' of {'cases'|'deaths'|'recovered': {'M/D/YY': count}}
+    Returns: INSERT_COUNTRY_STATS_SQL parameter tuples, oldest first. Each row is
+             stamped at the end of its day; today_cases/today_deaths are the
+             day-over-day change (None on the first day or after a downward revision)
+    """
+    timeline = historical.get('timeline') or {}
+    cases = timeline.get('cases') or {}
+    deaths = timeline.get('deaths') or {}
+    recovered = timeline.get('recovered') or {}
+    
+    def daily_change(current: int, previous: Optional[int]) -> Optional[int]:
+        if previous is None or current < previous:
+            return None
+        return current - previous
+    
+    rows = []
+    previous_cases = previous_deaths = None
+    for day in sorted(cases, key=lambda d: datetime.strptime(d, '%m/%d/%y')):
+        timestamp = datetime.strptime(day, '%m/%d/%y').replace(hour=23, minute=59, second=59)
+        total_cases = cases[day]
+        total_deaths = deaths.get(day, 0)
+        total_recovered = recovered.get(day, 0)
+        rows.append((
+            timestamp,
+            country,
+            total_cases,
+            total_deaths,
+            total_recovered,
+            max(total_cases - total_deaths - total_recovered, 0),
+            None,  # critical
+            daily_change(total_cases, previous_cases),
+            daily_change(total_deaths, previous_deaths),
+            None, None, None, None  # population, tests, per-million figures
+        ))
+        previous_cases, previous_deaths = total_cases, total_deaths
+    return rows
+
+def run_backfill(client, database, countries: List[str], days: Union[int, str] = 'all',
+                 batch_rows: int = BACKFILL_BATCH_ROWS,
+                 progress: Optional[Callable[[str], None]] = None) -> Dict:
+    """
+    Seed country_stats with historical timelines
+    Timelines are downloaded concurrently (bounded by the client's workers and
+    rate limiter) while this thread flattens them and bulk-loads them in
+    transactions of about batch_rows rows. Each country is checkpointed in the
+    same transaction as its rows, so an interrupted run resumes where it
+    stopped and countries that failed to download are retried next time.
+    Args:
+        client: HealthDataAPIClient
+        database: HealthDatabase
+        countries: Country names to backfill
+        days: Days of history per country, or 'all'
+        batch_rows: Rows per transaction
+        progress: Called with a status line after each transaction
+    Returns: {'inserted': {country: rows}, 'skipped': [already done], 'failed': [countries]}
+    """
+    lastdays = str(days)
+    done = database.get_backfill_checkpoints(lastdays)
+    pending = [country for country in countries if country not in done]
+    result = {'inserted': {}, 'skipped': [c for c in countries if c in done], 'failed': []}
+    
+    batch: Dict[str, List[Tuple]] = {}
+    batch_size = 0
+    
+    def flush():
+        nonlocal batch, batch_size
+        if batch:
+            result['inserted'].update(database.insert_backfill_rows(batch, lastdays))
+            if progress:
+                progress(f"Backfilled {len(result['inserted'])}/{len(pending)} countries, "
+                         f"{sum(result['inserted'].values()):,} rows")
+        batch, batch_size = {}, 0
+    
+    for country, historical in client.fetch_historical_many(pending, days):
+        if not historical:
+            result['failed'].append(country)
+            continue
+        rows = flatten_timeline(country, historical)
+        batch[country] = rows
+        batch_size += len(rows)
+        if batch_size >= batch_rows:
+            flush()
+    flush()
+    
+    if result['inserted']:
+        database.bump_data_generation()
+    return result
@@ -0,0 +1,115 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+from config import (CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS, CACHE_DEFAULT_TTL_SECONDS,
+                    CACHE_GENERATION_CHECK_SECONDS)
+
+_MISSING = object()
+
+def _hashable(value: Any) -> Any:
+    """Cache-key form of an argument: lists, tuples and sets (e.g. of countries) become tuples"""
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted((_hashable(item) for item in value), key=repr))
+    if isinstance(value, (list, tuple)):
+        return tuple(_hashable(item) for item in value)
+    return value
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after a per-entry TTL"""
+    
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key: Any, default: Any = None) -> Any:
+        """Get a live entry (refreshing its LRU position), or default"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+    
+    def set(self, key: Any, value: Any, ttl: float):
+        """Store a value for ttl seconds, evicting the least recently used entry if full"""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class CachedHealthDatabase:
+    """
+    Read-through cache in front of HealthDatabase for the health API.
+    Cached read methods are served from memory until their TTL expires or the
+    collector bumps the data generation after a commit, whichever comes
+    first. The generation is polled at most once per check interval, so most
+    requests never touch SQLite. Anything not listed in ttls passes through.
+    Cached results are shared between callers and must not be mutated.
+    """
+    
+    def __init__(self, database, ttls: Optional[Dict[str, float]] = None,
+                 default_ttl: float = CACHE_DEFAULT_TTL_SECONDS,
+                 max_entries: int = CACHE_MAX_ENTRIES,
+                 generation_check_interval: float = CACHE_GENERATION_CHECK_SECONDS):
+        self.database = database
+        self.ttls = dict(CACHE_TTL_SECONDS if ttls is None else ttls)
+        self.default_ttl = default_ttl
+        self.generation_check_interval = generation_check_interval
+        self.cache = TTLCache(max_entries)
+        self._generation: Optional[int] = None
+        self._generation_checked_at = 0.0
+        self._generation_lock = threading.Lock()
+    
+    @property
+    def generation(self) -> int:
+        """Current data generation (checked against SQLite at most once per interval)"""
+        self._refresh_generation()
+        return self._generation
+    
+    def _refresh_generation(self):
+        now = time.monotonic()
+        if now - self._generation_checked_at < self.generation_check_interval:
+            return
+        with self._generation_lock:
+            if now - self._generation_checked_at < self.generation_check_interval:
+                return
+            generation = self.database.get_data_generation()
+            if generation != self._generation:
+                # New data was committed - everything cached is stale
+                self.cache.clear()
+                self._generation = generation
+            self._generation_checked_at = now
+    
+    def _cached_call(self, name: str, method: Callable, args: tuple, kwargs: dict) -> Any:
+        self._refresh_generation()
+        key = (name, _hashable(args), tuple(sorted((key, _hashable(value)) for key, value in kwargs.items())))
+        value = self.cache.get(key, _MISSING)
+        if value is _MISSING:
+            value = method(*args, **kwargs)
+            self.cache.set(key, value, self.ttls.get(name, self.default_ttl))
+        return value
+    
+    def __getattr__(self, name: str) -> Any:
+        attribute = getattr(self.database, name)
+        if name not in self.ttls or not callable(attribute):
+            return attribute
+        
+        def cached(*args, **kwargs):
+            return self._cached_call(name, attribute, args, kwargs)
+        return cached
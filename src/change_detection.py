@@ -0,0 +1,81 @@
+import hashlib
+import json
+import threading
+from typing import Dict, Optional
+
+GLOBAL_ENTITY = 'global'
+
+class ChangeTracker:
+    """
+    Remembers the last stored snapshot of each entity (global, or one country)
+    so identical payloads can be skipped before validation and storage
+    """
+    
+    def __init__(self):
+        self._watermarks: Dict[str, int] = {}  # entity -> last stored 'updated' (ms)
+        self._hashes: Dict[str, str] = {}  # entity -> content hash of last stored payload
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def content_hash(data: Dict) -> str:
+        """Stable hash of a payload, independent of key order"""
+        encoded = json.dumps(data, sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+    
+    def seed(self, global_updated: Optional[int], country_updated: Dict[str, int]):
+        """
+        Load 'updated' watermarks for already-stored data (e.g. after a restart)
+        Args:
+            global_updated: Latest stored global snapshot in milliseconds
+            country_updated: Country name -> latest stored snapshot in milliseconds
+        """
+        watermarks = {country_entity(country): updated for country, updated in country_updated.items()}
+        if global_updated is not None:
+            watermarks[GLOBAL_ENTITY] = global_updated
+        
+        with self._lock:
+            for entity, updated in watermarks.items():
+                if updated > self._watermarks.get(entity, -1):
+                    self._watermarks[entity] = updated
+    
+    def is_changed(self, entity: str, data: Dict) -> bool:
+        """
+        Check whether a payload differs from the last stored one
+        Args:
+            entity: GLOBAL_ENTITY or country_entity(name)
+            data: Raw API payload
+        Returns: False for duplicates and for snapshots older than the watermark
+        """
+        updated = data.get('updated')
+        digest = self.content_hash(data)
+        
+        with self._lock:
+            watermark = self._watermarks.get(entity)
+            known_hash = self._hashes.get(entity)
+        
+        if watermark is not None and isinstance(updated, int):
+            if updated < watermark:
+                return False
+            if updated == watermark:
+                # Same snapshot time: only a corrected payload counts as new
+                return known_hash is not None and known_hash != digest
+            return True
+        
+        return known_hash != digest
+    
+    def mark_processed(self, entity: str, data: Dict):
+        """
+        Record a payload as handled: after a successful insert, or after a
+        validation failure (re-validating the same payload can't succeed).
+        Don't call it when storage failed, so the next poll retries.
+        """
+        updated = data.get('updated')
+        digest = self.content_hash(data)
+        with self._lock:
+            if isinstance(updated, int):
+                self._watermarks[entity] = max(updated, self._watermarks.get(entity, updated))
+            self._hashes[entity] = digest
+
+def country_entity(country: Optional[str]) -> str:
+    """Change-tracking key for a country payload"""
+    return f"country:{country}"
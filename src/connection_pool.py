@@ -0,0 +1,146 @@
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import quote
+from typing import Iterator
+from config import (DB_READER_POOL_SIZE, DB_SYNCHRONOUS, DB_MMAP_SIZE, DB_CACHE_SIZE_KB,
+                    DB_BUSY_TIMEOUT_SECONDS, DB_STATEMENT_CACHE_SIZE)
+from src.metrics import DB_COMMIT_SECONDS, DB_WRITER_WAIT_SECONDS
+
+SYNCHRONOUS_LEVELS = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+
+class SQLiteConnectionPool:
+    """
+    Thread-safe SQLite connections: one shared writer and up to N readers.
+    The database runs in WAL mode, so readers never block on the writer's
+    commits and the writer never waits for readers.
+    """
+    
+    def __init__(self, db_path: str,
+                 readers: int = DB_READER_POOL_SIZE,
+                 synchronous: str = DB_SYNCHRONOUS,
+                 mmap_size: int = DB_MMAP_SIZE,
+                 cache_size_kb: int = DB_CACHE_SIZE_KB,
+                 busy_timeout: float = DB_BUSY_TIMEOUT_SECONDS,
+                 cached_statements: int = DB_STATEMENT_CACHE_SIZE,
+                 read_only: bool = False):
+        """
+        Args:
+            db_path: SQLite database file
+            readers: Maximum number of reader connections
+            synchronous: PRAGMA synchronous level (OFF, NORMAL, FULL, EXTRA)
+            mmap_size: Bytes of the file to memory-map (0 disables)
+            cache_size_kb: Page cache size per connection in KiB
+            busy_timeout: Seconds to wait on a locked database
+            cached_statements: Prepared statements kept per connection
+            read_only: Open no writer, and readers with mode=ro and query_only,
+                       for processes that only serve reads (the health API)
+        """
+        if synchronous.upper() not in SYNCHRONOUS_LEVELS:
+            raise ValueError(f'synchronous must be one of {SYNCHRONOUS_LEVELS}, got {synchronous!r}')
+        if readers < 1:
+            raise ValueError(f'Need at least one reader connection, got {readers}')
+        
+        self.db_path = db_path
+        self.max_readers = readers
+        self.synchronous = synchronous.upper()
+        self.mmap_size = mmap_size
+        self.cache_size_kb = cache_size_kb
+        self.busy_timeout = busy_timeout
+        self.cached_statements = cached_statements
+        self.read_only = read_only
+        
+        self._writer = None
+        if not read_only:
+            self._writer = self._connect()
+            # WAL is persistent in the file, so setting it once on the writer is enough
+            self._writer.execute('PRAGMA journal_mode=WAL')
+        self._writer_lock = threading.Lock()
+        
+        self._readers: queue.LifoQueue = queue.LifoQueue()
+        self._all_readers = []
+        self._readers_lock = threading.Lock()
+        self._closed = False
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection with the pool's PRAGMAs applied"""
+        target, uri = self.db_path, False
+        if self.read_only:
+            target, uri = f'file:{quote(self.db_path)}?mode=ro', True
+        conn = sqlite3.connect(target, timeout=self.busy_timeout, uri=uri,
+                               check_same_thread=False,
+                               cached_statements=self.cached_statements)
+        if self.read_only:
+            conn.execute('PRAGMA query_only=ON')
+        conn.execute(f'PRAGMA synchronous={self.synchronous}')
+        conn.execute(f'PRAGMA mmap_size={int(self.mmap_size)}')
+        # Negative cache_size is in KiB rather than pages
+        conn.execute(f'PRAGMA cache_size=-{int(self.cache_size_kb)}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        return conn
+    
+    @contextmanager
+    def writer(self) -> Iterator[sqlite3.Connection]:
+        """
+        Exclusive access to the writer connection.
+        Commits when the block finishes, rolls back if it raises.
+        """
+        if self._closed:
+            raise sqlite3.ProgrammingError('Connection pool is closed')
+        if self._writer is None:
+            raise sqlite3.OperationalError('Connection pool is read-only')
+        wait_start = time.perf_counter()
+        with self._writer_lock:
+            DB_WRITER_WAIT_SECONDS.observe(time.perf_counter() - wait_start)
+            try:
+                yield self._writer
+                with DB_COMMIT_SECONDS.time():
+                    self._writer.commit()
+            except BaseException:
+                self._writer.rollback()
+                raise
+    
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a reader connection, opening one if the pool isn't full yet"""
+        conn = self._acquire_reader()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            if self._closed:
+                conn.close()
+            else:
+                self._readers.put(conn)
+    
+    def _acquire_reader(self) -> sqlite3.Connection:
+        if self._closed:
+            raise sqlite3.ProgrammingError('Connection pool is closed')
+        try:
+            return self._readers.get_nowait()
+        except queue.Empty:
+            pass
+        
+        with self._readers_lock:
+            if len(self._all_readers) < self.max_readers:
+                conn = self._connect()
+                self._all_readers.append(conn)
+                return conn
+        
+        # Pool is at capacity - wait for another thread to return a connection
+        return self._readers.get()
+    
+    def close(self):
+        """Close every connection (readers still borrowed close on return)"""
+        self._closed = True
+        with self._writer_lock:
+            if self._writer is not None:
+                self._writer.close()
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
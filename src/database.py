@@ -1,171 +1,993 @@
+import json
+import logging
+import os
 import sqlite3
-from datetime import datetime
-from typing import Optional, List, Dict
+import numpy as np
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Optional, Iterator, List, Dict, Sequence, Tuple
+from urllib.parse import quote
+from config import (DB_READER_POOL_SIZE, SURGE_LOOKBACK_DAYS, RAW_TREND_MAX_DAYS,
+                    HOURLY_TREND_MAX_DAYS, RETENTION_BATCH_SIZE, FETCH_INTERVAL_MINUTES,
+                    HISTORY_DEFAULT_DAYS, HISTORY_WINDOW_BUCKETS)
+from src.archive import ColumnarArchive, FLOAT_COLUMNS, GLOBAL_PARTITION, rows_to_columns
+from src.connection_pool import SQLiteConnectionPool
+from src.recent_store import RecentStore
+from src.error_fingerprints import fingerprint_error, compress_payload, decompress_payload
+from src.metrics import DB_METHOD_SECONDS, timed
+from src.quality import (INSERTED, STORAGE_FAILED, MISSED_INTERVAL, FAILURE_EVENTS, GLOBAL, COUNTRY,
+                         ERROR_TYPE_EVENTS, OTHER_ERROR, BUCKET_FORMAT, event_for_error,
+                         missed_intervals, counter_rows, window_start, summarize)
+
+logger = logging.getLogger(__name__)
+
+INSERT_COUNTRY_STATS_SQL = '''
+    INSERT INTO country_stats 
+    (timestamp, country, total_cases, total_deaths, total_recovered,
+     active_cases, critical_cases, today_cases, today_deaths,
+     population, tests, cases_per_million, deaths_per_million)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+# One row per country holding its newest snapshot; same parameters as INSERT_COUNTRY_STATS_SQL
+UPSERT_COUNTRY_LATEST_SQL = '''
+    INSERT INTO country_latest
+    (timestamp, country, total_cases, total_deaths, total_recovered,
+     active_cases, critical_cases, today_cases, today_deaths,
+     population, tests, cases_per_million, deaths_per_million)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(country) DO UPDATE SET
+        timestamp = excluded.timestamp,
+        total_cases = excluded.total_cases,
+        total_deaths = excluded.total_deaths,
+        total_recovered = excluded.total_recovered,
+        active_cases = excluded.active_cases,
+        critical_cases = excluded.critical_cases,
+        today_cases = excluded.today_cases,
+        today_deaths = excluded.today_deaths,
+        population = excluded.population,
+        tests = excluded.tests,
+        cases_per_million = excluded.cases_per_million,
+        deaths_per_million = excluded.deaths_per_million
+    WHERE excluded.timestamp >= country_latest.timestamp
+'''
+
+COUNTRY_COLUMNS = '''timestamp, country, total_cases, total_deaths, total_recovered,
+    active_cases, critical_cases, today_cases, today_deaths,
+    population, tests, cases_per_million, deaths_per_million'''
+
+# Rebuild country_latest from raw rows (ties on timestamp go to the last inserted row)
+COUNTRY_LATEST_BACKFILL_SQL = f'''
+    INSERT OR REPLACE INTO country_latest ({COUNTRY_COLUMNS})
+    SELECT {COUNTRY_COLUMNS} FROM country_stats
+    WHERE (country, timestamp) IN (
+        SELECT country, MAX(timestamp) FROM country_stats GROUP BY country
+    )
+    ORDER BY id
+'''
+
+# Rollup tables maintained on every country_stats insert: name -> bucket format
+ROLLUP_TABLES = {
+    'country_stats_hourly': '%Y-%m-%d %H:00:00',
+    'country_stats_daily': '%Y-%m-%d 00:00:00',
+}
+
+def _rollup_table_sql(table: str) -> str:
+    return f'''
+        CREATE TABLE IF NOT EXISTS {table} (
+            country TEXT NOT NULL,
+            bucket DATETIME NOT NULL,
+            first_timestamp DATETIME NOT NULL,
+            last_timestamp DATETIME NOT NULL,
+            first_total_cases INTEGER NOT NULL,
+            first_total_deaths INTEGER NOT NULL,
+            total_cases INTEGER NOT NULL,
+            total_deaths INTEGER NOT NULL,
+            today_cases INTEGER,
+            today_deaths INTEGER,
+            min_today_cases INTEGER,
+            max_today_cases INTEGER,
+            sample_count INTEGER NOT NULL,
+            PRIMARY KEY (country, bucket)
+        ) WITHOUT ROWID
+    '''
+
+def _rollup_backfill_sql(table: str, bucket_format: str) -> str:
+    """Aggregate existing raw rows into a rollup table (first/last via window functions)"""
+    bucket = f"strftime('{bucket_format}', timestamp)"
+    return f'''
+        INSERT OR REPLACE INTO {table}
+        (country, bucket, first_timestamp, last_timestamp, first_total_cases, first_total_deaths,
+         total_cases, total_deaths, today_cases, today_deaths,
+         min_today_cases, max_today_cases, sample_count)
+        SELECT country, bucket, MIN(timestamp), MAX(timestamp),
+               MAX(CASE WHEN rn_first = 1 THEN total_cases END),
+               MAX(CASE WHEN rn_first = 1 THEN total_deaths END),
+               MAX(CASE WHEN rn_last = 1 THEN total_cases END),
+               MAX(CASE WHEN rn_last = 1 THEN total_deaths END),
+               MAX(CASE WHEN rn_last = 1 THEN today_cases END),
+               MAX(CASE WHEN rn_last = 1 THEN today_deaths END),
+               MIN(today_cases), MAX(today_cases), COUNT(*)
+        FROM (
+            SELECT country, {bucket} AS bucket, timestamp, total_cases, total_deaths,
+                   today_cases, today_deaths,
+                   ROW_NUMBER() OVER (PARTITION BY country, {bucket} ORDER BY timestamp) AS rn_first,
+                   ROW_NUMBER() OVER (PARTITION BY country, {bucket} ORDER BY timestamp DESC) AS rn_last
+            FROM country_stats
+        )
+        GROUP BY country, bucket
+    '''
+
+def _rollup_upsert_sql(table: str, bucket_format: str) -> str:
+    """Fold one raw row into its bucket (old column values are used on the right-hand side)"""
+    return f'''
+        INSERT INTO {table}
+        (country, bucket, first_timestamp, last_timestamp, first_total_cases, first_total_deaths,
+         total_cases, total_deaths, today_cases, today_deaths,
+         min_today_cases, max_today_cases, sample_count)
+        VALUES (:country, strftime('{bucket_format}', :timestamp), :timestamp, :timestamp,
+                :total_cases, :total_deaths, :total_cases, :total_deaths,
+                :today_cases, :today_deaths, :today_cases, :today_cases, 1)
+        ON CONFLICT(country, bucket) DO UPDATE SET
+            first_total_cases = CASE WHEN excluded.first_timestamp < first_timestamp
+                                     THEN excluded.first_total_cases ELSE first_total_cases END,
+            first_total_deaths = CASE WHEN excluded.first_timestamp < first_timestamp
+                                      THEN excluded.first_total_deaths ELSE first_total_deaths END,
+            first_timestamp = MIN(first_timestamp, excluded.first_timestamp),
+            total_cases = CASE WHEN excluded.last_timestamp >= last_timestamp
+                               THEN excluded.total_cases ELSE total_cases END,
+            total_deaths = CASE WHEN excluded.last_timestamp >= last_timestamp
+                                THEN excluded.total_deaths ELSE total_deaths END,
+            today_cases = CASE WHEN excluded.last_timestamp >= last_timestamp
+                               THEN excluded.today_cases ELSE today_cases END,
+            today_deaths = CASE WHEN excluded.last_timestamp >= last_timestamp
+                                THEN excluded.today_deaths ELSE today_deaths END,
+            last_timestamp = MAX(last_timestamp, excluded.last_timestamp),
+            min_today_cases = MIN(COALESCE(min_today_cases, excluded.min_today_cases),
+                                  COALESCE(excluded.min_today_cases, min_today_cases)),
+            max_today_cases = MAX(COALESCE(max_today_cases, excluded.max_today_cases),
+                                  COALESCE(excluded.max_today_cases, max_today_cases)),
+            sample_count = sample_count + 1
+    '''
+
+ROLLUP_UPSERT_SQL = [_rollup_upsert_sql(table, fmt) for table, fmt in ROLLUP_TABLES.items()]
+
+# One row per error fingerprint; the sample payload is the first one seen
+UPSERT_ERROR_FINGERPRINT_SQL = '''
+    INSERT INTO error_fingerprints
+    (fingerprint, error_type, message, schema_hash, sample_payload, last_message,
+     first_seen, last_seen, occurrences)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(fingerprint) DO UPDATE SET
+        sample_payload = COALESCE(sample_payload, excluded.sample_payload),
+        last_message = excluded.last_message,
+        last_seen = MAX(last_seen, excluded.last_seen),
+        occurrences = occurrences + excluded.occurrences
+'''
+
+# Content-addressed: a payload shared by several fingerprints is stored once
+INSERT_ERROR_PAYLOAD_SQL = '''
+    INSERT OR IGNORE INTO error_payloads (hash, size, payload)
+    VALUES (?, ?, ?)
+'''
+
+UPSERT_QUALITY_COUNTER_SQL = '''
+    INSERT INTO quality_counters (event, source, bucket, entity, count)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(event, source, bucket, entity) DO UPDATE SET count = count + excluded.count
+'''
+
+_ERROR_EVENT_CASE = 'CASE error_type {} ELSE \'{}\' END'.format(
+    ' '.join(f"WHEN '{error_type}' THEN '{event}'" for error_type, event in ERROR_TYPE_EVENTS.items()),
+    OTHER_ERROR)
+
+# Versioned schema changes applied by create_tables, in order. PRAGMA user_version
+# records the last one applied - append new entries, never edit released ones.
+SCHEMA_MIGRATIONS = [
+    (1, 'Indexes for time-range, per-country and latest-snapshot queries', [
+        # Per-country history; today_cases makes it covering for detect_case_surge
+        'CREATE INDEX IF NOT EXISTS idx_country_stats_country_timestamp '
+        'ON country_stats (country, timestamp, today_cases)',
+        # MAX(timestamp) and the exact-timestamp lookup in get_top_countries_by_today_cases
+        'CREATE INDEX IF NOT EXISTS idx_country_stats_timestamp ON country_stats (timestamp)',
+        # "Last N hours" range scans and counts
+        'CREATE INDEX IF NOT EXISTS idx_global_stats_timestamp ON global_stats (timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_error_log_timestamp ON error_log (timestamp)',
+    ]),
+    (2, 'Alerts and streaming detector state written by the collector', [
+        '''CREATE TABLE IF NOT EXISTS alerts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at DATETIME NOT NULL,
+            data_timestamp DATETIME NOT NULL,
+            country TEXT NOT NULL,
+            alert_type TEXT NOT NULL,
+            severity TEXT NOT NULL,
+            details TEXT NOT NULL
+        )''',
+        'CREATE INDEX IF NOT EXISTS idx_alerts_created_at ON alerts (created_at)',
+        '''CREATE TABLE IF NOT EXISTS detector_state (
+            country TEXT PRIMARY KEY,
+            state TEXT NOT NULL,
+            updated_at DATETIME NOT NULL
+        )''',
+    ]),
+    (3, 'Hourly and daily country rollups for long-range trends', [
+        *[_rollup_table_sql(table) for table in ROLLUP_TABLES],
+        *[_rollup_backfill_sql(table, fmt) for table, fmt in ROLLUP_TABLES.items()],
+    ]),
+    (4, 'Latest snapshot per country for current-state reads', [
+        '''CREATE TABLE IF NOT EXISTS country_latest (
+            country TEXT PRIMARY KEY,
+            timestamp DATETIME NOT NULL,
+            total_cases INTEGER NOT NULL,
+            total_deaths INTEGER NOT NULL,
+            total_recovered INTEGER NOT NULL,
+            active_cases INTEGER NOT NULL,
+            critical_cases INTEGER,
+            today_cases INTEGER,
+            today_deaths INTEGER,
+            population INTEGER,
+            tests INTEGER,
+            cases_per_million REAL,
+            deaths_per_million REAL
+        )''',
+        'CREATE INDEX IF NOT EXISTS idx_country_latest_today_cases ON country_latest (today_cases)',
+        COUNTRY_LATEST_BACKFILL_SQL,
+    ]),
+    (5, 'Data generation counter for cache invalidation', [
+        '''CREATE TABLE IF NOT EXISTS metadata (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )''',
+        "INSERT OR IGNORE INTO metadata (key, value) VALUES ('data_generation', 0)",
+    ]),
+    (6, 'Checkpoints for resumable historical backfills', [
+        '''CREATE TABLE IF NOT EXISTS backfill_checkpoints (
+            country TEXT NOT NULL,
+            lastdays TEXT NOT NULL,
+            rows_inserted INTEGER NOT NULL,
+            completed_at DATETIME NOT NULL,
+            PRIMARY KEY (country, lastdays)
+        )''',
+    ]),
+    (7, 'Metrics snapshots shared between the collector and the health API', [
+        '''CREATE TABLE IF NOT EXISTS metrics_snapshots (
+            process TEXT PRIMARY KEY,
+            updated_at DATETIME NOT NULL,
+            snapshot TEXT NOT NULL
+        )''',
+    ]),
+    (8, 'Per-bucket data-quality counters, seeded from the existing history', [
+        # Key order serves "one event and source over the last N buckets"
+        '''CREATE TABLE IF NOT EXISTS quality_counters (
+            event TEXT NOT NULL,
+            source TEXT NOT NULL,
+            bucket TEXT NOT NULL,
+            entity TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (event, source, bucket, entity)
+        ) WITHOUT ROWID''',
+        f'''INSERT OR IGNORE INTO quality_counters (event, source, bucket, entity, count)
+            SELECT '{INSERTED}', '{GLOBAL}', strftime('{BUCKET_FORMAT}', timestamp), '', COUNT(*)
+            FROM global_stats GROUP BY 3''',
+        # Gaps between consecutive global snapshots, as missed_intervals() counts them
+        f'''INSERT OR IGNORE INTO quality_counters (event, source, bucket, entity, count)
+            SELECT '{MISSED_INTERVAL}', '{GLOBAL}', strftime('{BUCKET_FORMAT}', timestamp), '',
+                   SUM(CAST(ROUND(intervals) AS INTEGER) - 1)
+            FROM (
+                SELECT timestamp, (julianday(timestamp) - julianday(LAG(timestamp) OVER (ORDER BY timestamp)))
+                                  * 1440 / {FETCH_INTERVAL_MINUTES} AS intervals
+                FROM global_stats
+            )
+            WHERE intervals > 1.5 GROUP BY 3''',
+        f'''INSERT OR IGNORE INTO quality_counters (event, source, bucket, entity, count)
+            SELECT '{INSERTED}', '{COUNTRY}', bucket, country, sample_count
+            FROM country_stats_hourly''',
+        # error_log timestamps default to UTC; everything else is local time
+        f'''INSERT OR IGNORE INTO quality_counters (event, source, bucket, entity, count)
+            SELECT {_ERROR_EVENT_CASE}, '{GLOBAL}',
+                   strftime('{BUCKET_FORMAT}', timestamp, 'localtime'), '', COUNT(*)
+            FROM error_log GROUP BY 1, 3''',
+    ]),
+    (9, 'Fingerprinted errors with compressed, deduplicated payloads', [
+        '''CREATE TABLE IF NOT EXISTS error_payloads (
+            hash TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            payload BLOB NOT NULL
+        ) WITHOUT ROWID''',
+        '''CREATE TABLE IF NOT EXISTS error_fingerprints (
+            fingerprint TEXT PRIMARY KEY,
+            error_type TEXT NOT NULL,
+            message TEXT NOT NULL,
+            schema_hash TEXT,
+            sample_payload TEXT REFERENCES error_payloads (hash),
+            last_message TEXT NOT NULL,
+            first_seen DATETIME NOT NULL,
+            last_seen DATETIME NOT NULL,
+            occurrences INTEGER NOT NULL
+        )''',
+        'CREATE INDEX IF NOT EXISTS idx_error_fingerprints_last_seen ON error_fingerprints (last_seen)',
+        # error_log stops growing from here; fold its rows in by type and message
+        # (their payloads were Python reprs, so they get no schema or sample)
+        '''INSERT OR IGNORE INTO error_fingerprints
+            (fingerprint, error_type, message, schema_hash, sample_payload, last_message,
+             first_seen, last_seen, occurrences)
+            SELECT 'error_log:' || error_type || ':' || error_message, error_type, error_message, NULL, NULL,
+                   error_message, datetime(MIN(timestamp), 'localtime'), datetime(MAX(timestamp), 'localtime'),
+                   COUNT(*)
+            FROM error_log GROUP BY error_type, error_message''',
+    ]),
+]
+
+def _rollup_params(row_params: Tuple) -> Dict:
+    """Pick the rollup columns out of INSERT_COUNTRY_STATS_SQL parameters"""
+    return {
+        'timestamp': row_params[0],
+        'country': row_params[1],
+        'total_cases': row_params[2],
+        'total_deaths': row_params[3],
+        'today_cases': row_params[7],
+        'today_deaths': row_params[8]
+    }
+
+def _insert_country_rows(conn: sqlite3.Connection, rows_params: List[Tuple]):
+    """Insert raw country rows and fold them into country_latest and the rollup tables"""
+    conn.executemany(INSERT_COUNTRY_STATS_SQL, rows_params)
+    conn.executemany(UPSERT_COUNTRY_LATEST_SQL, rows_params)
+    rollup_params = [_rollup_params(row_params) for row_params in rows_params]
+    for upsert_sql in ROLLUP_UPSERT_SQL:
+        conn.executemany(upsert_sql, rollup_params)
+
+def _count_events(conn: sqlite3.Connection, events: Counter):
+    """Add (event, source, entity) -> count to the current hour's quality counters"""
+    conn.executemany(UPSERT_QUALITY_COUNTER_SQL, counter_rows(events, datetime.now()))
+
+def _country_insert_events(conn: sqlite3.Connection, rows_params: List[Tuple]) -> Counter:
+    """
+    Quality events for country rows about to be inserted: one insert each, plus
+    intervals missed since the country's previous snapshot (from country_latest)
+    """
+    countries = list({row_params[1] for row_params in rows_params})
+    previous = {country: datetime.fromisoformat(timestamp) for country, timestamp in conn.execute(
+        f"SELECT country, timestamp FROM country_latest WHERE country IN ({','.join('?' * len(countries))})",
+        countries)}
+    
+    events = Counter()
+    for row_params in sorted(rows_params, key=lambda row: row[0]):
+        timestamp, country = row_params[0], row_params[1]
+        events[(INSERTED, COUNTRY, country)] += 1
+        if country in previous:
+            events[(MISSED_INTERVAL, COUNTRY, country)] += missed_intervals(previous[country], timestamp)
+        previous[country] = max(previous.get(country, timestamp), timestamp)
+    return events
+
+# /history bucket sizes, and the metrics every source (raw rows and rollups) has
+HISTORY_BUCKETS = {
+    '10m': timedelta(minutes=10),
+    '1h': timedelta(hours=1),
+    '1d': timedelta(days=1),
+    '1w': timedelta(weeks=1),
+}
+HISTORY_METRICS = ('total_cases', 'total_deaths', 'today_cases', 'today_deaths')
+
+def naive_local(when: Optional[datetime]) -> Optional[datetime]:
+    """Timestamps are stored as naive local time; convert an aware datetime to match"""
+    if when is None or when.tzinfo is None:
+        return when
+    return when.astimezone().replace(tzinfo=None)
+
+def floor_bucket(when: datetime, bucket: str) -> datetime:
+    """Start of the bucket containing `when` (weeks start on Monday)"""
+    if bucket == '1w':
+        day = when.replace(hour=0, minute=0, second=0, microsecond=0)
+        return day - timedelta(days=day.weekday())
+    size = int(HISTORY_BUCKETS[bucket].total_seconds())
+    midnight = when.replace(hour=0, minute=0, second=0, microsecond=0)
+    return midnight + timedelta(seconds=int((when - midnight).total_seconds()) // size * size)
+
+def _last_per_bucket(history: Dict[str, np.ndarray], metrics: Sequence[str],
+                     size: timedelta) -> Iterator[Tuple[datetime, int, List]]:
+    """Downsample raw history columns to (bucket, samples, last metric values) per bucket"""
+    timestamps = history['timestamp']
+    if not len(timestamps):
+        return
+    step = np.timedelta64(int(size.total_seconds()), 's')
+    buckets = timestamps.astype('datetime64[s]') - (timestamps.astype('datetime64[s]') - np.datetime64(0, 's')) % step
+    # Rows are sorted, so the last row of each bucket is where the bucket changes
+    last = np.flatnonzero(np.append(buckets[1:] != buckets[:-1], True))
+    samples = np.diff(np.append(-1, last))
+    columns = [history[metric][last].tolist() for metric in metrics]
+    for index, bucket in enumerate(buckets[last].astype(datetime)):
+        values = [None if value != value else int(value) for value in (column[index] for column in columns)]
+        yield bucket, int(samples[index]), values
+
+# Columns behind get_country_trend's raw points
+TREND_COLUMNS = ['timestamp', 'total_cases', 'total_deaths', 'today_cases', 'today_deaths']
+
+def _column_values(column: str, values: np.ndarray) -> List:
+    """One history column as Python values, NULLs (NaN) as None"""
+    if values.dtype == object:
+        return values.tolist()
+    if column == 'timestamp':
+        # The same text SQLite holds: str(datetime), which drops a zero fraction
+        texts = np.datetime_as_string(values, unit='us').tolist()
+        return [text[:10] + ' ' + (text[11:19] if text.endswith('.000000') else text[11:]) for text in texts]
+    missing = np.isnan(values) if values.dtype.kind == 'f' else None
+    if column not in FLOAT_COLUMNS and missing is not None:
+        # Integer columns that held NULLs were stored as float with NaN
+        values = values.astype(np.int64, copy=False) if not missing.any() else \
+            np.where(missing, 0, values).astype(np.int64)
+    if missing is None or not missing.any():
+        return values.tolist()
+    result = values.astype(object)
+    result[missing] = None
+    return result.tolist()
+
+def _history_dicts(history: Dict[str, np.ndarray]) -> List[Dict]:
+    """History columns as row dicts, newest first, shaped like the SQLite reads"""
+    names = list(history)
+    columns = [_column_values(column, values[::-1]) for column, values in history.items()]
+    return [dict(zip(names, row)) for row in zip(*columns)]
+
+def _country_stats_params(data: Dict) -> Tuple:
+    """Map a country API payload to INSERT_COUNTRY_STATS_SQL parameters"""
+    return (
+        datetime.fromtimestamp(data['updated'] / 1000),  # Convert ms to seconds
+        data['country'],
+        data['cases'],
+        data['deaths'],
+        data['recovered'],
+        data['active'],
+        data.get('critical'),
+        data.get('todayCases'),
+        data.get('todayDeaths'),
+        data.get('population'),
+        data.get('tests'),
+        data.get('casesPerOneMillion'),
+        data.get('deathsPerOneMillion')
+    )
+
+SCHEMA_VERSION = SCHEMA_MIGRATIONS[-1][0]
+
+def ensure_schema(db_path: str) -> int:
+    """
+    Create or migrate the database if it isn't at SCHEMA_VERSION yet
+    Read-only processes call this once before opening their connections;
+    when the schema is already current it doesn't open a writer at all, so
+    concurrent callers (e.g. server workers) never race on migrations.
+    Returns: The schema version
+    """
+    if os.path.exists(db_path):
+        conn = sqlite3.connect(f'file:{quote(db_path)}?mode=ro', uri=True)
+        try:
+            if conn.execute('PRAGMA user_version').fetchone()[0] >= SCHEMA_VERSION:
+                return SCHEMA_VERSION
+        finally:
+            conn.close()
+    HealthDatabase(db_path, pool_size=1).close()
+    return SCHEMA_VERSION
 
 class HealthDatabase:
     """Manages SQLite database for public health data"""
     
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str, pool_size: int = DB_READER_POOL_SIZE,
+                 archive: Optional[ColumnarArchive] = None, recent: Optional[RecentStore] = None,
+                 read_only: bool = False):
+        """
+        Args:
+            db_path: SQLite database file
+            pool_size: Reader connections
+            archive: Columnar archive of closed months; history reads that reach
+                     back past its horizon read those months from it
+            recent: In-memory window of recent rows (loaded here); trend, surge
+                    and top-country reads it covers are answered from it
+            read_only: Only read (no writer connection); the schema must already
+                       be current, see ensure_schema()
+        """
         self.db_path = db_path
-        self.create_tables()
+        self.pool = SQLiteConnectionPool(db_path, readers=pool_size, read_only=read_only)
+        self.archive = archive
+        self.recent = recent
+        if read_only:
+            version = self.get_schema_version()
+            if version < SCHEMA_VERSION:
+                raise RuntimeError(f"{db_path} is at schema version {version}, expected {SCHEMA_VERSION}; "
+                                   f"run ensure_schema() or start the collector first")
+        else:
+            self.create_tables()
+        if recent is not None:
+            recent.load(self.pool)
+    
+    def close(self):
+        """Close all pooled connections"""
+        self.pool.close()
     
+    @timed(DB_METHOD_SECONDS)
     def create_tables(self):
         """Create database tables if they don't exist"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Global statistics table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS global_stats (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp DATETIME NOT NULL,
-                total_cases INTEGER NOT NULL,
-                total_deaths INTEGER NOT NULL,
-                total_recovered INTEGER NOT NULL,
-                active_cases INTEGER NOT NULL,
-                critical_cases INTEGER,
-                today_cases INTEGER,
-                today_deaths INTEGER,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Country-specific data table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS country_stats (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp DATETIME NOT NULL,
-                country TEXT NOT NULL,
-                total_cases INTEGER NOT NULL,
-                total_deaths INTEGER NOT NULL,
-                total_recovered INTEGER NOT NULL,
-                active_cases INTEGER NOT NULL,
-                critical_cases INTEGER,
-                today_cases INTEGER,
-                today_deaths INTEGER,
-                population INTEGER,
-                tests INTEGER,
-                cases_per_million REAL,
-                deaths_per_million REAL,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Error log table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS error_log (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                error_type TEXT NOT NULL,
-                error_message TEXT NOT NULL,
-                raw_response TEXT
-            )
-        ''')
+        with self.pool.writer() as conn:
+            cursor = conn.cursor()
+            
+            # Global statistics table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS global_stats (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp DATETIME NOT NULL,
+                    total_cases INTEGER NOT NULL,
+                    total_deaths INTEGER NOT NULL,
+                    total_recovered INTEGER NOT NULL,
+                    active_cases INTEGER NOT NULL,
+                    critical_cases INTEGER,
+                    today_cases INTEGER,
+                    today_deaths INTEGER,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # Country-specific data table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS country_stats (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp DATETIME NOT NULL,
+                    country TEXT NOT NULL,
+                    total_cases INTEGER NOT NULL,
+                    total_deaths INTEGER NOT NULL,
+                    total_recovered INTEGER NOT NULL,
+                    active_cases INTEGER NOT NULL,
+                    critical_cases INTEGER,
+                    today_cases INTEGER,
+                    today_deaths INTEGER,
+                    population INTEGER,
+                    tests INTEGER,
+                    cases_per_million REAL,
+                    deaths_per_million REAL,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # Error log table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS error_log (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    error_type TEXT NOT NULL,
+                    error_message TEXT NOT NULL,
+                    raw_response TEXT
+                )
+            ''')
         
-        conn.commit()
-        conn.close()
+        self._apply_migrations()
+    
+    def _apply_migrations(self):
+        """Bring the schema up to the latest SCHEMA_MIGRATIONS version"""
+        with self.pool.writer() as conn:
+            current_version = conn.execute('PRAGMA user_version').fetchone()[0]
+            
+            for version, description, statements in SCHEMA_MIGRATIONS:
+                if version <= current_version:
+                    continue
+                # Each migration commits atomically together with its version bump
+                conn.execute('BEGIN')
+                for statement in statements:
+                    conn.execute(statement)
+                conn.execute(f'PRAGMA user_version = {version}')
+                conn.commit()
+                logger.info("Applied schema migration %d: %s", version, description)
+    
+    @timed(DB_METHOD_SECONDS)
+    def get_schema_version(self) -> int:
+        """Get the last applied schema migration version"""
+        with self.pool.reader() as conn:
+            return conn.execute('PRAGMA user_version').fetchone()[0]
     
+    @timed(DB_METHOD_SECONDS)
+    def bump_data_generation(self) -> int:
+        """
+        Mark that new data was committed (the collector calls this after each cycle),
+        so caches in other processes know to drop their results
+        Returns: The new generation number
+        """
+        with self.pool.writer() as conn:
+            conn.execute("UPDATE metadata SET value = value + 1 WHERE key = 'data_generation'")
+            return conn.execute("SELECT value FROM metadata WHERE key = 'data_generation'").fetchone()[0]
+    
+    @timed(DB_METHOD_SECONDS)
+    def get_data_generation(self) -> int:
+        """Get the data generation counter"""
+        with self.pool.reader() as conn:
+            return conn.execute("SELECT value FROM metadata WHERE key = 'data_generation'").fetchone()[0]
+    
+    def _sync_recent(self):
+        """Append rows this process just committed to the recent store"""
+        if self.recent is not None:
+            self.recent.sync(self.pool, force=True)
+    
+    def _recent_dicts(self, table: str, partition: str, start: datetime,
+                      columns: List[str]) -> Optional[List[Dict]]:
+        """Rows from `start` on as newest-first dicts from the recent store, or None if it can't answer"""
+        if self.recent is None:
+            return None
+        self.recent.sync(self.pool)
+        window = self.recent.window(table, partition, start)
+        if window is None:
+            return None
+        # Timestamps as the exact text SQLite returns, without formatting them again
+        return _history_dicts({column: window['timestamp_text' if column == 'timestamp' else column]
+                               for column in columns})
+    
+    @timed(DB_METHOD_SECONDS)
     def insert_global_stats(self, data: Dict) -> bool:
         """Insert global statistics"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
             timestamp = datetime.fromtimestamp(data['updated'] / 1000)  # Convert ms to seconds
             
-            cursor.execute('''
-                INSERT INTO global_stats 
-                (timestamp, total_cases, total_deaths, total_recovered, 
-                 active_cases, critical_cases, today_cases, today_deaths)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                timestamp,
-                data['cases'],
-                data['deaths'],
-                data['recovered'],
-                data['active'],
-                data.get('critical'),
-                data.get('todayCases'),
-                data.get('todayDeaths')
-            ))
+            with self.pool.writer() as conn:
+                previous = conn.execute('SELECT MAX(timestamp) FROM global_stats').fetchone()[0]
+                conn.execute('''
+                    INSERT INTO global_stats 
+                    (timestamp, total_cases, total_deaths, total_recovered, 
+                     active_cases, critical_cases, today_cases, today_deaths)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (
+                    timestamp,
+                    data['cases'],
+                    data['deaths'],
+                    data['recovered'],
+                    data['active'],
+                    data.get('critical'),
+                    data.get('todayCases'),
+                    data.get('todayDeaths')
+                ))
+                
+                events = Counter({(INSERTED, GLOBAL, ''): 1})
+                if previous:
+                    events[(MISSED_INTERVAL, GLOBAL, '')] = missed_intervals(
+                        datetime.fromisoformat(previous), timestamp)
+                _count_events(conn, events)
             
-            conn.commit()
-            conn.close()
+            self._sync_recent()
             return True
-            
+        
         except Exception as e:
-            print(f"ERROR inserting global stats: {e}")
+            logger.error("Error inserting global stats: %s", e)
+            self._count_storage_failures(GLOBAL, [''])
             return False
     
+    @timed(DB_METHOD_SECONDS)
     def insert_country_stats(self, data: Dict) -> bool:
         """Insert country-specific statistics"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            timestamp = datetime.fromtimestamp(data['updated'] / 1000)
-            
-            cursor.execute('''
-                INSERT INTO country_stats 
-                (timestamp, country, total_cases, total_deaths, total_recovered,
-                 active_cases, critical_cases, today_cases, today_deaths,
-                 population, tests, cases_per_million, deaths_per_million)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                timestamp,
-                data['country'],
-                data['cases'],
-                data['deaths'],
-                data['recovered'],
-                data['active'],
-                data.get('critical'),
-                data.get('todayCases'),
-                data.get('todayDeaths'),
-                data.get('population'),
-                data.get('tests'),
-                data.get('casesPerOneMillion'),
-                data.get('deathsPerOneMillion')
-            ))
-            
-            conn.commit()
-            conn.close()
+            row_params = _country_stats_params(data)
+            with self.pool.writer() as conn:
+                events = _country_insert_events(conn, [row_params])
+                _insert_country_rows(conn, [row_params])
+                _count_events(conn, events)
+            self._sync_recent()
             return True
-            
+        
         except Exception as e:
-            print(f"ERROR inserting country stats: {e}")
+            logger.error("Error inserting country stats: %s", e)
+            self._count_storage_failures(COUNTRY, [data.get('country')])
             return False
     
-    def log_error(self, error_type: str, error_message: str, raw_response: str = None):
-        """Log errors to database"""
+    @timed(DB_METHOD_SECONDS)
+    def insert_country_stats_batch(self, rows: List[Dict]) -> Dict:
+        """
+        Insert many country payloads in a single transaction
+        Args:
+            rows: Country API payloads (e.g. one whole fetch cycle)
+        Returns: {'inserted': count, 'errors': [{'index', 'country', 'error'}]}
+                 A bad row is reported in 'errors' without discarding the rest
+        """
+        errors = []
+        params = []
+        for index, data in enumerate(rows):
+            try:
+                params.append((index, _country_stats_params(data)))
+            except Exception as e:
+                errors.append({'index': index, 'country': data.get('country'), 'error': repr(e)})
+        
+        if not params:
+            return {'inserted': 0, 'errors': errors}
+        
+        try:
+            with self.pool.writer() as conn:
+                try:
+                    with conn:
+                        rows_params = [p for _, p in params]
+                        events = _country_insert_events(conn, rows_params)
+                        _insert_country_rows(conn, rows_params)
+                        _count_events(conn, events)
+                    inserted = len(params)
+                except sqlite3.Error:
+                    # Something in the batch was rejected - redo it row by row, still in
+                    # one transaction, using a savepoint per row to isolate failures
+                    stored = []
+                    conn.execute('BEGIN')
+                    for index, row_params in params:
+                        conn.execute('SAVEPOINT batch_row')
+                        try:
+                            _insert_country_rows(conn, [row_params])
+                            stored.append(row_params)
+                        except sqlite3.Error as e:
+                            conn.execute('ROLLBACK TO batch_row')
+                            errors.append({'index': index, 'country': rows[index].get('country'),
+                                           'error': repr(e)})
+                        conn.execute('RELEASE batch_row')
+                    inserted = len(stored)
+                    # country_latest already holds the new rows, so no gap detection here
+                    _count_events(conn, Counter((INSERTED, COUNTRY, row_params[1]) for row_params in stored))
+        except sqlite3.Error as e:
+            logger.error("Error inserting country stats batch: %s", e)
+            inserted = 0
+            errors = [{'index': index, 'country': data.get('country'), 'error': repr(e)}
+                      for index, data in enumerate(rows)]
+        
+        if inserted:
+            self._sync_recent()
+        errors.sort(key=lambda error: error['index'])
+        self._count_storage_failures(COUNTRY, [error['country'] for error in errors])
+        for error in errors:
+            logger.error("Error inserting country stats for %s: %s", error['country'], error['error'])
+        
+        return {'inserted': inserted, 'errors': errors}
+    
+    @timed(DB_METHOD_SECONDS)
+    def get_backfill_checkpoints(self, lastdays: str) -> set:
+        """Countries whose historical backfill for this lastdays value already finished"""
+        with self.pool.reader() as conn:
+            cursor = conn.execute('SELECT country FROM backfill_checkpoints WHERE lastdays = ?',
+                                  (lastdays,))
+            return {row[0] for row in cursor}
+    
+    @timed(DB_METHOD_SECONDS)
+    def insert_backfill_rows(self, timelines: Dict[str, List[Tuple]], lastdays: str) -> Dict[str, int]:
+        """
+        Bulk-load flattened historical rows and checkpoint each country, in one transaction
+        Args:
+            timelines: country -> INSERT_COUNTRY_STATS_SQL parameter tuples
+            lastdays: The lastdays value the timelines were fetched with
+        Returns: country -> rows inserted. Days that already have data for a
+                 country (from live polling or an earlier backfill) are skipped,
+                 so re-running a backfill never duplicates rows
+        """
+        inserted = {}
+        completed_at = datetime.now()
+        with self.pool.writer() as conn:
+            for country, rows_params in timelines.items():
+                existing_days = {row[0] for row in conn.execute(
+                    'SELECT bucket FROM country_stats_daily WHERE country = ?', (country,))}
+                new_rows = [row_params for row_params in rows_params
+                            if row_params[0].strftime('%Y-%m-%d 00:00:00') not in existing_days]
+                if new_rows:
+                    _insert_country_rows(conn, new_rows)
+                conn.execute('''
+                    INSERT OR REPLACE INTO backfill_checkpoints (country, lastdays, rows_inserted, completed_at)
+                    VALUES (?, ?, ?, ?)
+                ''', (country, lastdays, len(new_rows), completed_at))
+                inserted[country] = len(new_rows)
+        self._sync_recent()
+        return inserted
+    
+    def save_metrics_snapshot(self, process: str, snapshot: Dict):
+        """Publish a process's metrics registry so the health API can export it"""
+        try:
+            with self.pool.writer() as conn:
+                conn.execute('''
+                    INSERT OR REPLACE INTO metrics_snapshots (process, updated_at, snapshot)
+                    VALUES (?, ?, ?)
+                ''', (process, datetime.now(), json.dumps(snapshot)))
+        except sqlite3.Error as e:
+            logger.error("Error saving metrics snapshot: %s", e)
+    
+    def load_metrics_snapshots(self) -> Dict[str, Dict]:
+        """Get every published metrics snapshot: process -> {'updated_at', 'snapshot'}"""
+        with self.pool.reader() as conn:
+            cursor = conn.execute('SELECT process, updated_at, snapshot FROM metrics_snapshots')
+            return {process: {'updated_at': datetime.fromisoformat(updated_at),
+                              'snapshot': json.loads(snapshot)}
+                    for process, updated_at, snapshot in cursor}
+    
+    @timed(DB_METHOD_SECONDS)
+    def log_error(self, error_type: str, error_message: str, raw_response: str = None,
+                  country: str = None):
+        """Log errors to database (country attributes it to that country's quality counters)"""
+        self.log_errors_batch([(error_type, error_message, raw_response, country)])
+    
+    @timed(DB_METHOD_SECONDS)
+    def log_errors_batch(self, entries: List[Tuple]):
+        """
+        Log many errors in a single transaction
+        Errors are grouped by fingerprint (type, normalized message, payload
+        schema): a repeat only bumps its fingerprint's count and last_seen, and
+        a payload is compressed and stored only with a fingerprint's first
+        occurrence, so storage grows with distinct errors rather than with time.
+        Args:
+            entries: (error_type, error_message, raw_response) tuples, optionally
+                     with a fourth country element for per-country quality counters
+        """
+        if not entries:
+            return
+        now = datetime.now()
+        events = Counter()
+        fingerprints = {}
+        for entry in entries:
+            country = entry[3] if len(entry) > 3 else None
+            events[(event_for_error(entry[0]), COUNTRY if country else GLOBAL, country)] += 1
+            error = fingerprint_error(*entry[:3])
+            seen = fingerprints.setdefault(error['fingerprint'], dict(error, raw_response=None, occurrences=0))
+            seen['occurrences'] += 1
+            seen['last_message'] = entry[1]
+            if seen['raw_response'] is None:
+                seen['raw_response'] = entry[2]
+                seen['payload_hash'] = error['payload_hash']
+        try:
+            with self.pool.writer() as conn:
+                placeholders = ','.join('?' * len(fingerprints))
+                sampled = {row[0] for row in conn.execute(f'''
+                    SELECT fingerprint FROM error_fingerprints
+                    WHERE fingerprint IN ({placeholders}) AND sample_payload IS NOT NULL
+                ''', list(fingerprints))}
+                payloads = []
+                for key, error in fingerprints.items():
+                    if key in sampled or error['raw_response'] is None:
+                        error['payload_hash'] = None
+                    else:
+                        payloads.append((error['payload_hash'], *compress_payload(error['raw_response'])))
+                conn.executemany(INSERT_ERROR_PAYLOAD_SQL, payloads)
+                conn.executemany(UPSERT_ERROR_FINGERPRINT_SQL, [
+                    (key, error['error_type'], error['message'], error['schema_hash'], error['payload_hash'],
+                     error['last_message'], now, now, error['occurrences'])
+                    for key, error in fingerprints.items()])
+                _count_events(conn, events)
+        
+        except Exception as e:
+            logger.error("Error logging errors: %s", e)
+    
+    @timed(DB_METHOD_SECONDS)
+    def get_error_fingerprints(self, hours: float = 24, limit: int = 20) -> List[Dict]:
+        """
+        Get the errors seen in the last N hours, one entry per fingerprint
+        Returns: Fingerprint dicts (with lifetime occurrence counts), most recently seen first
+        """
+        with self.pool.reader() as conn:
+            rows = conn.execute('''
+                SELECT fingerprint, error_type, message, last_message, schema_hash, sample_payload,
+                       first_seen, last_seen, occurrences
+                FROM error_fingerprints
+                WHERE last_seen > datetime('now', 'localtime', '-' || ? || ' minutes')
+                ORDER BY last_seen DESC
+                LIMIT ?
+            ''', (int(hours * 60), limit)).fetchall()
+        
+        columns = ('fingerprint', 'error_type', 'message', 'last_message', 'schema_hash', 'sample_payload',
+                   'first_seen', 'last_seen', 'occurrences')
+        return [dict(zip(columns, row)) for row in rows]
+    
+    @timed(DB_METHOD_SECONDS)
+    def get_error_payload(self, payload_hash: str) -> Optional[str]:
+        """Get a stored error payload by hash (a fingerprint's sample_payload), decompressed"""
+        with self.pool.reader() as conn:
+            row = conn.execute('SELECT payload FROM error_payloads WHERE hash = ?', (payload_hash,)).fetchone()
+        return decompress_payload(row[0]) if row else None
+    
+    def _count_storage_failures(self, source: str, entities: List[Optional[str]]):
+        """Count failed inserts (in their own transaction - the insert's was rolled back)"""
+        if not entities:
+            return
         try:
-            conn = sqlite3.connect(self.db_path)
+            with self.pool.writer() as conn:
+                _count_events(conn, Counter((STORAGE_FAILED, source, entity) for entity in entities))
+        except sqlite3.Error as e:
+            logger.error("Error counting storage failures: %s", e)
+    
+    @timed(DB_METHOD_SECONDS)
+    def save_alerts(self, alerts: List[Dict], detector_states: Dict[str, Dict]):
+        """
+        Store alerts and the detector state that produced them in one transaction
+        Args:
+            alerts: Alert dicts from StreamingSurgeDetector.update
+            detector_states: Country -> state from StreamingSurgeDetector.dump_states
+        """
+        now = datetime.now()
+        try:
+            with self.pool.writer() as conn:
+                conn.executemany('''
+                    INSERT INTO alerts
+                    (created_at, data_timestamp, country, alert_type, severity, details)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', [(now, alert['data_timestamp'], alert['country'], alert['alert_type'],
+                       alert['severity'], json.dumps(alert['details'])) for alert in alerts])
+                conn.executemany('''
+                    INSERT INTO detector_state (country, state, updated_at)
+                    VALUES (?, ?, ?)
+                    ON CONFLICT(country) DO UPDATE SET
+                        state = excluded.state, updated_at = excluded.updated_at
+                ''', [(country, json.dumps(state), now) for country, state in detector_states.items()])
+        
+        except Exception as e:
+            logger.error("Error saving alerts: %s", e)
+    
+    @timed(DB_METHOD_SECONDS)
+    def load_detector_state(self) -> Dict[str, Dict]:
+        """Get persisted streaming detector state per country"""
+        with self.pool.reader() as conn:
+            rows = conn.execute('SELECT country, state FROM detector_state').fetchall()
+        return {country: json.loads(state) for country, state in rows}
+    
+    @timed(DB_METHOD_SECONDS)
+    def get_recent_alerts(self, hours: float = 1) -> List[Dict]:
+        """
+        Get the latest alert of each type per country raised in the last N hours
+        Returns: List of alert dicts, newest first
+        """
+        with self.pool.reader() as conn:
+            rows = conn.execute('''
+                SELECT country, alert_type, severity, details, data_timestamp, created_at
+                FROM alerts
+                WHERE id IN (
+                    SELECT MAX(id) FROM alerts
+                    WHERE created_at > datetime('now', 'localtime', '-' || ? || ' minutes')
+                    GROUP BY country, alert_type
+                )
+                ORDER BY id DESC
+            ''', (int(hours * 60),)).fetchall()
+        
+        result = []
+        for row in rows:
+            result.append({
+                'country': row[0],
+                'alert_type': row[1],
+                'severity': row[2],
+                'details': json.loads(row[3]),
+                'data_timestamp': row[4],
+                'created_at': row[5]
+            })
+        
+        return result
+    
+    @timed(DB_METHOD_SECONDS)
+    def get_latest_updated(self) -> Dict:
+        """
+        Get the newest stored snapshot time, for change detection after a restart
+        Returns: {'global': ms or None, 'countries': {country: ms}}
+        """
+        with self.pool.reader() as conn:
             cursor = conn.cursor()
             
-            cursor.execute('''
-                INSERT INTO error_log (error_type, error_message, raw_response)
-                VALUES (?, ?, ?)
-            ''', (error_type, error_message, raw_response))
-            
-            conn.commit()
-            conn.close()
+            cursor.execute('SELECT MAX(timestamp) FROM global_stats')
+            latest_global = cursor.fetchone()[0]
             
-        except Exception as e:
-            print(f"ERROR logging error: {e}")
+            cursor.execute('SELECT country, timestamp FROM country_latest')
+            latest_countries = cursor.fetchall()
+        
+        def to_ms(timestamp: str) -> int:
+            # Timestamps were stored from datetime.fromtimestamp(updated / 1000)
+            return round(datetime.fromisoformat(timestamp).timestamp() * 1000)
+        
+        return {
+            'global': to_ms(latest_global) if latest_global else None,
+            'countries': {country: to_ms(latest) for country, latest in latest_countries if latest}
+        }
     
+    @timed(DB_METHOD_SECONDS)
     def get_recent_global_data(self, hours: int = 24) -> List[Dict]:
         """Get recent global data"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        start = datetime.now() - timedelta(hours=hours)
+        columns = ['timestamp', 'total_cases', 'total_deaths', 'active_cases', 'today_cases']
+        recent = self._recent_dicts('global_stats', GLOBAL_PARTITION, start, columns)
+        if recent is not None:
+            return recent
+        if self._archived(start, 'global_stats'):
+            return _history_dicts(self.get_global_history(start, columns=columns))
         
-        cursor.execute('''
-            SELECT timestamp, total_cases, total_deaths, active_cases, today_cases
-            FROM global_stats
-            WHERE timestamp > datetime('now', 'localtime', '-' || ? || ' hours')
-            ORDER BY timestamp DESC
-        ''', (hours,))
-        
-        rows = cursor.fetchall()
-        conn.close()
+        with self.pool.reader() as conn:
+            rows = conn.execute('''
+                SELECT timestamp, total_cases, total_deaths, active_cases, today_cases
+                FROM global_stats
+                WHERE timestamp > datetime('now', 'localtime', '-' || ? || ' hours')
+                ORDER BY timestamp DESC
+            ''', (hours,)).fetchall()
         
         result = []
         for row in rows:
@@ -179,21 +1001,42 @@ class HealthDatabase:
         
         return result
     
+    @timed(DB_METHOD_SECONDS)
     def get_country_trend(self, country: str, days: int = 7) -> List[Dict]:
-        """Get trend data for a specific country"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT timestamp, total_cases, total_deaths, today_cases, today_deaths
-            FROM country_stats
-            WHERE country = ? 
-            AND timestamp > datetime('now', 'localtime', '-' || ? || ' days')
-            ORDER BY timestamp DESC
-        ''', (country, days))
-        
-        rows = cursor.fetchall()
-        conn.close()
+        """
+        Get trend data for a specific country.
+        Short windows read raw rows; longer ones read the coarsest rollup that
+        fits (one point per hour or day, holding that period's last values).
+        """
+        if days <= RAW_TREND_MAX_DAYS:
+            start = datetime.now() - timedelta(days=days)
+            recent = self._recent_dicts('country_stats', country, start, TREND_COLUMNS)
+            if recent is not None:
+                return recent
+            if self._archived(start, 'country_stats'):
+                history = self.get_country_history([country], start, columns=TREND_COLUMNS)
+                return _history_dicts(history[country])
+            
+            with self.pool.reader() as conn:
+                rows = conn.execute('''
+                    SELECT timestamp, total_cases, total_deaths, today_cases, today_deaths
+                    FROM country_stats
+                    WHERE country = ? 
+                    AND timestamp > datetime('now', 'localtime', '-' || ? || ' days')
+                    ORDER BY timestamp DESC
+                ''', (country, days)).fetchall()
+        else:
+            table = 'country_stats_hourly' if days <= HOURLY_TREND_MAX_DAYS else 'country_stats_daily'
+            bucket_format = ROLLUP_TABLES[table]
+            with self.pool.reader() as conn:
+                rows = conn.execute(f'''
+                    SELECT last_timestamp, total_cases, total_deaths, today_cases, today_deaths
+                    FROM {table}
+                    WHERE country = ?
+                    AND bucket >= strftime('{bucket_format}', 'now', 'localtime', '-' || ? || ' days')
+                    AND last_timestamp > datetime('now', 'localtime', '-' || ? || ' days')
+                    ORDER BY bucket DESC
+                ''', (country, days, days)).fetchall()
         
         result = []
         for row in rows:
@@ -206,42 +1049,296 @@ class HealthDatabase:
             })
         
         return result
-
-    def get_data_quality_metrics(self, hours: int = 24) -> Dict:
-        """Calculate data quality metrics"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    
+    def _archived(self, start: datetime, table: str) -> bool:
+        """Does a read from `start` onwards reach into archived months?"""
+        if self.archive is None:
+            return False
+        horizon = self.archive.horizon(table)
+        return horizon is not None and start < horizon
+    
+    def _history(self, table: str, partitions: List[str], columns: List[str],
+                 start: Optional[datetime], end: Optional[datetime]) -> Dict[str, Dict[str, np.ndarray]]:
+        """Archived months up to the horizon, then the live SQLite rows from there on"""
+        horizon = self.archive.horizon(table) if self.archive is not None else None
+        pieces = {partition: [] for partition in partitions}
+        if horizon is not None and (start is None or start < horizon):
+            archive_end = min(end, horizon) if end else horizon
+            for partition in partitions:
+                pieces[partition].append(self.archive.read(table, partition, columns, start, archive_end))
         
-        # Expected data points (one every 10 minutes)
-        expected_points = (hours * 60) // 10
+        live_start = max(start, horizon) if start and horizon else (start or horizon)
+        if end is None or live_start is None or live_start < end:
+            conditions, params = [], []
+            if table == 'country_stats':
+                conditions.append(f"country IN ({','.join('?' * len(partitions))})")
+                params.extend(partitions)
+            if live_start is not None:
+                conditions.append('timestamp >= ?')
+                params.append(live_start)
+            if end is not None:
+                conditions.append('timestamp < ?')
+                params.append(end)
+            key = 'country' if table == 'country_stats' else f"'{GLOBAL_PARTITION}'"
+            with self.pool.reader() as conn:
+                rows = conn.execute(f'''
+                    SELECT {key}, {', '.join(columns)} FROM {table}
+                    {'WHERE ' + ' AND '.join(conditions) if conditions else ''}
+                    ORDER BY {key}, timestamp
+                ''', params).fetchall()
+            live: Dict[str, List[Tuple]] = {}
+            for row in rows:
+                live.setdefault(row[0], []).append(row[1:])
+            for partition, partition_rows in live.items():
+                pieces[partition].append(rows_to_columns(partition_rows, columns))
         
-        # Count actual global data points
-        cursor.execute('''
-            SELECT COUNT(*) FROM global_stats
-            WHERE timestamp > datetime('now', 'localtime', '-' || ? || ' hours')
-        ''', (hours,))
-        actual_points = cursor.fetchone()[0]
+        history = {}
+        for partition, parts in pieces.items():
+            parts = [part for part in parts if len(part['timestamp'])]
+            if len(parts) == 1:
+                history[partition] = parts[0]  # archive-only reads stay memory-mapped views
+            else:
+                history[partition] = rows_to_columns([], columns) if not parts else {
+                    column: np.concatenate([part[column] for part in parts]) for column in columns}
+        return history
+    
+    @timed(DB_METHOD_SECONDS)
+    def get_country_history(self, countries: List[str], start: Optional[datetime] = None,
+                            end: Optional[datetime] = None,
+                            columns: List[str] = TREND_COLUMNS) -> Dict[str, Dict[str, np.ndarray]]:
+        """
+        Raw country_stats history as NumPy columns, for long analytical scans
+        Closed months come from the columnar archive (only the requested
+        columns are read), so only the live tail is read from SQLite.
+        Args:
+            countries: Country names
+            start, end: Half-open time range (None = unbounded)
+            columns: Columns to return; 'timestamp' (datetime64[ms]) is always included
+        Returns: country -> {column: array}, oldest first
+        """
+        columns = ['timestamp'] + [column for column in columns if column != 'timestamp']
+        return self._history('country_stats', list(countries), columns, start, end)
+    
+    @timed(DB_METHOD_SECONDS)
+    def get_global_history(self, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                           columns: List[str] = TREND_COLUMNS) -> Dict[str, np.ndarray]:
+        """Raw global_stats history as NumPy columns (see get_country_history)"""
+        columns = ['timestamp'] + [column for column in columns if column != 'timestamp']
+        return self._history('global_stats', [GLOBAL_PARTITION], columns, start, end)[GLOBAL_PARTITION]
+    
+    def iter_country_history(self, countries: List[str], metrics: Sequence[str] = HISTORY_METRICS,
+                             start: Optional[datetime] = None, end: Optional[datetime] = None,
+                             bucket: str = '1h',
+                             window_buckets: int = HISTORY_WINDOW_BUCKETS) -> Iterator[Dict]:
+        """
+        Stream downsampled history, country by country, oldest bucket first
+        Each point holds the last values within its bucket. 10m buckets are
+        downsampled with NumPy from raw rows (and the archive); 1h, 1d and 1w
+        are aggregated in SQL from the hourly and daily rollups, so 1h only
+        reaches back HOURLY_RETENTION_DAYS. The range is read window_buckets
+        at a time, each with its own short read, so memory stays bounded and
+        no pooled connection is held while the consumer is slow.
+        Args:
+            countries: Country names
+            metrics: Subset of HISTORY_METRICS
+            start, end: Range; widened to whole buckets (end defaults to now,
+                        start to HISTORY_DEFAULT_DAYS before end)
+            bucket: One of HISTORY_BUCKETS
+            window_buckets: Buckets per read
+        Yields: {'country', 'bucket', 'samples', <metric>: value, ...}
+        Raises: ValueError for an unknown bucket or an empty range, on the call
+                itself rather than on the first next(), so a streaming response
+                can still report it
+        """
+        if bucket not in HISTORY_BUCKETS:
+            raise ValueError(f"Unknown bucket {bucket!r}")
+        size = HISTORY_BUCKETS[bucket]
+        end = naive_local(end) or datetime.now()
+        start = floor_bucket(naive_local(start) or end - timedelta(days=HISTORY_DEFAULT_DAYS), bucket)
+        if start >= end:
+            raise ValueError("'start' must be before 'end'")
+        if floor_bucket(end, bucket) < end:
+            end = floor_bucket(end, bucket) + size
+        return self._iter_country_history(list(countries), list(metrics), start, end, bucket, window_buckets)
+    
+    def _iter_country_history(self, countries: List[str], metrics: List[str], start: datetime, end: datetime,
+                              bucket: str, window_buckets: int) -> Iterator[Dict]:
+        size = HISTORY_BUCKETS[bucket]
+        for country in countries:
+            window_start = start
+            while window_start < end:
+                window_end = min(window_start + size * window_buckets, end)
+                if bucket == '10m':
+                    history = self.get_country_history([country], window_start, window_end, metrics)[country]
+                    points = _last_per_bucket(history, metrics, size)
+                else:
+                    points = self._rollup_buckets(country, metrics, window_start, window_end, bucket)
+                for bucket_start, samples, values in points:
+                    point = {'country': country, 'bucket': str(bucket_start), 'samples': samples}
+                    point.update(zip(metrics, values))
+                    yield point
+                window_start = window_end
+    
+    def _rollup_buckets(self, country: str, metrics: List[str], start: datetime, end: datetime,
+                        bucket: str) -> List[Tuple[str, int, List]]:
+        """(bucket, samples, last metric values) from a rollup table, for buckets in [start, end)"""
+        table = 'country_stats_hourly' if bucket == '1h' else 'country_stats_daily'
+        selected = ', '.join(metrics)
+        with self.pool.reader() as conn:
+            if bucket == '1w':
+                # Bare columns next to MAX() come from the row holding the maximum
+                rows = conn.execute(f'''
+                    SELECT datetime(bucket, '-6 days', 'weekday 1') AS week, SUM(sample_count),
+                           MAX(last_timestamp), {selected}
+                    FROM {table}
+                    WHERE country = ? AND bucket >= ? AND bucket < ?
+                    GROUP BY week ORDER BY week
+                ''', (country, start, end)).fetchall()
+                return [(row[0], row[1], list(row[3:])) for row in rows]
+            rows = conn.execute(f'''
+                SELECT bucket, sample_count, {selected}
+                FROM {table}
+                WHERE country = ? AND bucket >= ? AND bucket < ?
+                ORDER BY bucket
+            ''', (country, start, end)).fetchall()
+        return [(row[0], row[1], list(row[2:])) for row in rows]
+    
+    @timed(DB_METHOD_SECONDS)
+    def get_country_rollup(self, country: str, days: int = 30, granularity: str = 'daily') -> List[Dict]:
+        """
+        Get hourly or daily aggregates for a country
+        Returns: List of dicts with last, min, max and delta values per bucket, newest first
+        """
+        table = {'hourly': 'country_stats_hourly', 'daily': 'country_stats_daily'}[granularity]
+        bucket_format = ROLLUP_TABLES[table]
+        with self.pool.reader() as conn:
+            rows = conn.execute(f'''
+                SELECT bucket, total_cases, total_deaths, total_cases - first_total_cases,
+                       total_deaths - first_total_deaths, today_cases,
+                       min_today_cases, max_today_cases, sample_count
+                FROM {table}
+                WHERE country = ?
+                AND bucket >= strftime('{bucket_format}', 'now', 'localtime', '-' || ? || ' days')
+                ORDER BY bucket DESC
+            ''', (country, days)).fetchall()
+        
+        result = []
+        for row in rows:
+            result.append({
+                'bucket': row[0],
+                'total_cases': row[1],
+                'total_deaths': row[2],
+                'cases_delta': row[3],
+                'deaths_delta': row[4],
+                'today_cases': row[5],
+                'min_today_cases': row[6],
+                'max_today_cases': row[7],
+                'sample_count': row[8]
+            })
+        
+        return result
+    
+    @timed(DB_METHOD_SECONDS)
+    def prune_raw_data(self, raw_retention_days: int, hourly_retention_days: int) -> Dict[str, int]:
+        """
+        Delete raw rows and hourly rollups older than their retention horizon.
+        Rollups already hold the pruned history, and SQLite reuses the freed
+        pages, so the database file stops growing once it reaches steady state.
+        With an archive, raw country_stats rows are only deleted once the
+        archive confirms it holds them (before its horizon, and with an id it
+        has compacted); until the first compaction none are deleted.
+        Args:
+            raw_retention_days: Keep this many days of raw country_stats and alerts
+            hourly_retention_days: Keep this many days of hourly rollups
+        Returns: Dict of table -> rows deleted
+        """
+        # (table, age column, retention days, key columns, extra condition and its parameters)
+        targets = [
+            ('country_stats', 'timestamp', raw_retention_days, 'rowid', '', ()),
+            ('alerts', 'created_at', raw_retention_days, 'rowid', '', ()),
+            ('country_stats_hourly', 'last_timestamp', hourly_retention_days, 'country, bucket', '', ()),
+            ('quality_counters', 'bucket', hourly_retention_days, 'event, source, bucket, entity', '', ()),
+        ]
+        deleted = {'country_stats': 0}
+        if self.archive is not None:
+            coverage = self.archive.coverage('country_stats')
+            if coverage is None:
+                targets.pop(0)
+            else:
+                targets[0] = targets[0][:4] + (' AND timestamp < ? AND id <= ?', coverage)
         
-        # Count errors
-        cursor.execute('''
-            SELECT COUNT(*) FROM error_log
-            WHERE timestamp > datetime('now', 'localtime', '-' || ? || ' hours')
-        ''', (hours,))
-        error_count = cursor.fetchone()[0]
+        for table, column, days, key_columns, extra, extra_params in targets:
+            deleted[table] = 0
+            condition = f"{column} < datetime('now', 'localtime', '-{int(days)} days'){extra}"
+            while True:
+                # Small batches keep each write transaction (and lock) short
+                with self.pool.writer() as conn:
+                    count = conn.execute(f'''
+                        DELETE FROM {table} WHERE ({key_columns}) IN (
+                            SELECT {key_columns} FROM {table} WHERE {condition} LIMIT ?
+                        )
+                    ''', (*extra_params, RETENTION_BATCH_SIZE)).rowcount
+                deleted[table] += count
+                if count < RETENTION_BATCH_SIZE:
+                    break
         
-        # Calculate success rate
-        success_rate = (actual_points / expected_points * 100) if expected_points > 0 else 0
+        return deleted
+    
+    @timed(DB_METHOD_SECONDS)
+    def get_data_quality_metrics(self, hours: int = 24) -> Dict:
+        """
+        Calculate data quality metrics from the quality counters
+        Sums at most hours + 1 hourly buckets per event, plus one index lookup
+        for the newest snapshot, so the cost doesn't grow with the tables.
+        Args:
+            hours: Window length; the window starts on a bucket boundary, so it
+                   covers the last `hours` whole hours plus the current one
+        Returns: Expected/actual/missing global data points (expected comes from
+                 gaps against FETCH_INTERVAL_MINUTES), success rate, failure
+                 counts by event and source, and gap details
+        """
+        now = datetime.now()
+        start = window_start(now, hours).strftime(BUCKET_FORMAT)
+        other_events = [*FAILURE_EVENTS, MISSED_INTERVAL]
         
-        conn.close()
+        with self.pool.reader() as conn:
+            # Per-country inserts are the bulk of the counter rows; only the global ones are needed
+            rows = conn.execute(f'''
+                SELECT event, source, SUM(count) FROM quality_counters
+                WHERE event = ? AND source = ? AND bucket >= ?
+                GROUP BY event, source
+                UNION ALL
+                SELECT event, source, SUM(count) FROM quality_counters
+                WHERE event IN ({','.join('?' * len(other_events))}) AND source IN (?, ?) AND bucket >= ?
+                GROUP BY event, source
+            ''', (INSERTED, GLOBAL, start, *other_events, GLOBAL, COUNTRY, start)).fetchall()
+            last_data = conn.execute('SELECT MAX(timestamp) FROM global_stats').fetchone()[0]
         
-        return {
-            'expected_data_points': expected_points,
-            'actual_data_points': actual_points,
-            'missing_data_points': expected_points - actual_points,
-            'success_rate_percent': round(success_rate, 2),
-            'error_count': error_count
-        }
+        totals = {(event, source): count for event, source, count in rows}
+        return summarize(totals, datetime.fromisoformat(last_data) if last_data else None, now, hours)
+    
+    @timed(DB_METHOD_SECONDS)
+    def get_country_quality(self, hours: int = 24) -> Dict[str, Dict[str, int]]:
+        """
+        Per-country quality counters over the same window as get_data_quality_metrics
+        Returns: country -> {event: count}, for every country with any events
+        """
+        start = window_start(datetime.now(), hours).strftime(BUCKET_FORMAT)
+        events = [INSERTED, *FAILURE_EVENTS, MISSED_INTERVAL]
+        with self.pool.reader() as conn:
+            rows = conn.execute(f'''
+                SELECT entity, event, SUM(count) FROM quality_counters
+                WHERE event IN ({','.join('?' * len(events))}) AND source = ? AND bucket >= ?
+                GROUP BY entity, event
+            ''', (*events, COUNTRY, start)).fetchall()
+        
+        quality = {}
+        for country, event, count in rows:
+            if count:
+                quality.setdefault(country, {})[event] = count
+        return quality
     
+    @timed(DB_METHOD_SECONDS)
     def detect_case_surge(self, country: str, threshold_percent: float = 5.0) -> Dict:
         """
         Detect if there's a surge in cases
@@ -250,26 +1347,24 @@ class HealthDatabase:
             threshold_percent: % increase to consider a surge
         Returns: Dict with surge information
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         # Get last two data points
-        cursor.execute('''
-            SELECT today_cases, timestamp
-            FROM country_stats
-            WHERE country = ?
-            ORDER BY timestamp DESC
-            LIMIT 2
-        ''', (country,))
+        latest = self._recent_latest([country], 2).get(country, [])
+        if len(latest) < 2:
+            with self.pool.reader() as conn:
+                rows = conn.execute('''
+                    SELECT today_cases, timestamp
+                    FROM country_stats
+                    WHERE country = ?
+                    ORDER BY timestamp DESC
+                    LIMIT 2
+                ''', (country,)).fetchall()
+            latest = [row[0] for row in rows]
         
-        rows = cursor.fetchall()
-        conn.close()
-        
-        if len(rows) < 2:
+        if len(latest) < 2:
             return {'surge_detected': False, 'message': 'Insufficient data'}
         
-        current_cases = rows[0][0] or 0
-        previous_cases = rows[1][0] or 0
+        current_cases = latest[0] or 0
+        previous_cases = latest[1] or 0
         
         if previous_cases == 0:
             return {'surge_detected': False, 'message': 'No previous data'}
@@ -284,30 +1379,123 @@ class HealthDatabase:
             'threshold': threshold_percent
         }
     
-    def get_top_countries_by_today_cases(self, limit: int = 5) -> List[Dict]:
-        """Get countries with highest cases today"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    @timed(DB_METHOD_SECONDS)
+    def detect_case_surges(self, countries: List[str], threshold_percent: float = 5.0,
+                           points: int = 2) -> Dict[str, Dict]:
+        """
+        Detect surges for many countries with one query (batch detect_case_surge)
+        Args:
+            countries: Country names
+            threshold_percent: % increase to consider a surge
+            points: Latest data points fetched per country (at least 2)
+        Returns: Dict of country -> the same dict detect_case_surge returns
+        """
+        if not countries:
+            return {}
+        points = max(points, 2)
         
-        # Get most recent timestamp
-        cursor.execute('SELECT MAX(timestamp) FROM country_stats')
-        latest_time = cursor.fetchone()[0]
+        # The recent store holds each country's newest rows; any it can't answer
+        # mostly have their last points within the lookback window, which keeps
+        # the window function from ranking each country's whole history
+        latest = self._recent_latest(countries, points)
+        missing = [country for country in countries if len(latest.get(country, [])) < 2]
+        if missing:
+            latest.update(self._latest_points(missing, points, lookback_days=SURGE_LOOKBACK_DAYS))
+        sparse = [country for country in countries if len(latest.get(country, [])) < 2]
+        if sparse:
+            latest.update(self._latest_points(sparse, points))
         
-        if not latest_time:
-            return []
+        # Vectorised percent change over countries that have two points
+        ready = [country for country in countries if len(latest.get(country, [])) >= 2]
+        current = np.array([latest[c][0] or 0 for c in ready], dtype=np.int64)
+        previous = np.array([latest[c][1] or 0 for c in ready], dtype=np.int64)
+        has_previous = previous != 0
+        percent_change = np.zeros(len(ready), dtype=np.float64)
+        np.divide((current - previous).astype(np.float64), previous,
+                  out=percent_change, where=has_previous)
+        percent_change *= 100
         
-        # Get top countries at that timestamp
-        cursor.execute('''
-            SELECT country, today_cases, cases_per_million
-            FROM country_stats
-            WHERE timestamp = ?
-            AND today_cases IS NOT NULL
-            ORDER BY today_cases DESC
-            LIMIT ?
-        ''', (latest_time, limit))
+        results = {country: {'surge_detected': False, 'message': 'Insufficient data'}
+                   for country in countries}
+        for i, country in enumerate(ready):
+            if not has_previous[i]:
+                results[country] = {'surge_detected': False, 'message': 'No previous data'}
+                continue
+            results[country] = {
+                'surge_detected': bool(percent_change[i] > threshold_percent),
+                'percent_change': round(float(percent_change[i]), 2),
+                'current_cases': int(current[i]),
+                'previous_cases': int(previous[i]),
+                'threshold': threshold_percent
+            }
         
-        rows = cursor.fetchall()
-        conn.close()
+        return results
+    
+    def _recent_latest(self, countries: List[str], points: int) -> Dict[str, List]:
+        """Newest today_cases values per country from the recent store ({} without one)"""
+        if self.recent is None:
+            return {}
+        self.recent.sync(self.pool)
+        return self.recent.latest_values(countries, 'today_cases', points)
+    
+    def _latest_points(self, countries: List[str], points: int,
+                       lookback_days: Optional[int] = None) -> Dict[str, List]:
+        """
+        Get the latest today_cases values per country, newest first
+        Args:
+            countries: Country names
+            points: Values to keep per country
+            lookback_days: Only consider rows this recent (None for all history)
+        Returns: Dict of country -> list of up to `points` today_cases values
+        """
+        placeholders = ', '.join('?' * len(countries))
+        time_filter = ''
+        params = list(countries)
+        if lookback_days is not None:
+            time_filter = "AND timestamp > datetime('now', 'localtime', '-' || ? || ' days')"
+            params.append(lookback_days)
+        params.append(points)
+        
+        with self.pool.reader() as conn:
+            rows = conn.execute(f'''
+                SELECT country, today_cases
+                FROM (
+                    SELECT country, today_cases,
+                           ROW_NUMBER() OVER (PARTITION BY country ORDER BY timestamp DESC) AS rn
+                    FROM country_stats
+                    WHERE country IN ({placeholders})
+                    {time_filter}
+                )
+                WHERE rn <= ?
+                ORDER BY country, rn
+            ''', params).fetchall()
+        
+        latest = {}
+        for country, today_cases in rows:
+            latest.setdefault(country, []).append(today_cases)
+        return latest
+    
+    @timed(DB_METHOD_SECONDS)
+    def get_top_countries_by_today_cases(self, limit: int = 5) -> List[Dict]:
+        """Get countries with highest cases today (from each country's latest snapshot)"""
+        if self.recent is not None:
+            self.recent.sync(self.pool)
+            top = self.recent.top_countries('today_cases', limit)
+            if top is not None:
+                return [{
+                    'country': country,
+                    'today_cases': int(row['today_cases']),
+                    'cases_per_million': None if np.isnan(row['cases_per_million']) else float(row['cases_per_million'])
+                } for country, row in top]
+        
+        with self.pool.reader() as conn:
+            rows = conn.execute('''
+                SELECT country, today_cases, cases_per_million
+                FROM country_latest
+                WHERE today_cases IS NOT NULL
+                ORDER BY today_cases DESC
+                LIMIT ?
+            ''', (limit,)).fetchall()
         
         result = []
         for row in rows:
@@ -318,6 +1506,27 @@ class HealthDatabase:
             })
         
         return result
+    
+    @timed(DB_METHOD_SECONDS)
+    def get_latest_country_stats(self, countries: Optional[List[str]] = None) -> List[Dict]:
+        """
+        Get the current state of each country (its newest snapshot)
+        Args:
+            countries: Restrict to these countries (all if None)
+        Returns: List of dicts in country_stats column names, ordered by country
+        """
+        query = f'SELECT {COUNTRY_COLUMNS} FROM country_latest'
+        params = []
+        if countries is not None:
+            query += f" WHERE country IN ({', '.join('?' * len(countries))})"
+            params = list(countries)
+        
+        with self.pool.reader() as conn:
+            cursor = conn.execute(query + ' ORDER BY country', params)
+            columns = [description[0] for description in cursor.description]
+            rows = cursor.fetchall()
+        
+        return [dict(zip(columns, row)) for row in rows]
 
 # Test it
 if __name__ == '__main__':
@@ -0,0 +1,73 @@
+import hashlib
+import json
+import re
+import zlib
+from typing import Dict, Optional, Tuple
+
+# Literal values in error messages that vary between otherwise identical errors
+_QUOTED = re.compile(r"'[^']*'|\"[^\"]*\"")
+_NUMBER = re.compile(r'-?\d+(?:\.\d+)?')
+_SPACE = re.compile(r'\s+')
+
+PAYLOAD_COMPRESSION_LEVEL = 6
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def normalize_message(message: str) -> str:
+    """Replace quoted literals and numbers with placeholders, so 'got 12' and 'got 15' match"""
+    message = _QUOTED.sub('<str>', message)
+    message = _NUMBER.sub('<n>', message)
+    return _SPACE.sub(' ', message).strip()
+
+def payload_schema(value):
+    """
+    Shape of a decoded JSON payload: keys and value types, without the values
+    int and float are both 'number', so a figure that happens to be whole
+    doesn't make a new schema; list elements are reduced to their distinct shapes.
+    """
+    if isinstance(value, dict):
+        return {key: payload_schema(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return sorted({json.dumps(payload_schema(item), sort_keys=True) for item in value})
+    if isinstance(value, bool):
+        return 'bool'
+    if isinstance(value, (int, float)):
+        return 'number'
+    if isinstance(value, str):
+        return 'string'
+    return 'null'
+
+def payload_schema_hash(raw_response: Optional[str]) -> Optional[str]:
+    """Hash of the payload's schema; payloads that aren't JSON all share the 'text' schema"""
+    if raw_response is None:
+        return None
+    try:
+        schema = payload_schema(json.loads(raw_response))
+    except ValueError:
+        schema = 'text'
+    return _sha256(json.dumps(schema, sort_keys=True, separators=(',', ':')))
+
+def fingerprint_error(error_type: str, error_message: str, raw_response: Optional[str] = None) -> Dict:
+    """
+    Identify an error by what went wrong rather than by the data it happened to
+    Returns: {'fingerprint', 'error_type', 'message' (normalized), 'schema_hash',
+              'payload_hash'}; the hashes are None without a payload
+    """
+    message = normalize_message(error_message)
+    schema_hash = payload_schema_hash(raw_response)
+    return {
+        'fingerprint': _sha256(f'{error_type}\n{message}\n{schema_hash or ""}'),
+        'error_type': error_type,
+        'message': message,
+        'schema_hash': schema_hash,
+        'payload_hash': _sha256(raw_response) if raw_response is not None else None,
+    }
+
+def compress_payload(raw_response: str) -> Tuple[int, bytes]:
+    """(uncompressed size in bytes, zlib-compressed payload)"""
+    encoded = raw_response.encode('utf-8')
+    return len(encoded), zlib.compress(encoded, PAYLOAD_COMPRESSION_LEVEL)
+
+def decompress_payload(payload: bytes) -> str:
+    return zlib.decompress(payload).decode('utf-8')
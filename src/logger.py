@@ -1,50 +1,164 @@
+import atexit
+import json
 import logging
-from datetime import datetime
+import logging.handlers
 import os
+import queue
+import threading
+from datetime import datetime
+from typing import List, Optional, Tuple
+from config import LOG_DIR, LOG_QUEUED, LOG_JSON, LOG_ROTATION, LOG_MAX_BYTES, LOG_BACKUP_COUNT
+
+# Attributes every LogRecord has; anything else was passed via extra= and goes into the JSON
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
 
-def setup_logger(name: str) -> logging.Logger:
+class JsonFormatter(logging.Formatter):
+    """Formats each record as one JSON object per line"""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'timestamp': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'thread': record.threadName
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class _InProcessQueueHandler(logging.handlers.QueueHandler):
     """
-    Create a logger that writes to both file and console
-    Args:
-        name: Name of the logger (usually __name__ from calling file)
-    Returns:
-        Configured logger object
+    QueueHandler that hands the record over untouched. The stock prepare()
+    formats the message in the calling thread (to make it picklable), which
+    is exactly the work we want off the hot path.
     """
     
-    # Create logs directory if it doesn't exist
-    if not os.path.exists('logs'):
-        os.makedirs('logs')
-    
-    # Create logger
-    logger = logging.getLogger(name)
-    logger.setLevel(logging.DEBUG)
-    
-    # Avoid adding handlers multiple times
-    if logger.handlers:
-        return logger
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+def build_handlers(log_dir: str = LOG_DIR, json_format: bool = LOG_JSON,
+                   rotation: str = LOG_ROTATION) -> List[logging.Handler]:
+    """
+    Create the file and console handlers
+    Args:
+        log_dir: Directory for the log file
+        json_format: Write JSON lines to the file instead of plain text
+        rotation: 'time' rolls the file over at midnight, 'size' at LOG_MAX_BYTES
+    Returns: [file handler (everything), console handler (INFO and above)]
+    """
+    if not os.path.exists(log_dir):
+        os.makedirs(log_dir)
     
     # File handler - writes everything to file
-    log_file = f'logs/health_monitor_{datetime.now().strftime("%Y%m%d")}.log'
-    file_handler = logging.FileHandler(log_file)
+    log_file = os.path.join(log_dir, 'health_monitor.jsonl' if json_format else 'health_monitor.log')
+    if rotation == 'size':
+        file_handler = logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT)
+    else:
+        file_handler = logging.handlers.TimedRotatingFileHandler(
+            log_file, when='midnight', backupCount=LOG_BACKUP_COUNT)
     file_handler.setLevel(logging.DEBUG)
     
     # Console handler - only important messages
     console_handler = logging.StreamHandler()
     console_handler.setLevel(logging.INFO)
     
-    # Create formatter
-    formatter = logging.Formatter(
+    text_formatter = logging.Formatter(
         '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
         datefmt='%Y-%m-%d %H:%M:%S'
     )
-    
-    file_handler.setFormatter(formatter)
-    console_handler.setFormatter(formatter)
-    
-    # Add handlers to logger
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
-    
+    file_handler.setFormatter(JsonFormatter() if json_format else text_formatter)
+    console_handler.setFormatter(text_formatter)
+    return [file_handler, console_handler]
+
+def start_queue_listener(handlers: List[logging.Handler]) -> Tuple[logging.Handler, logging.handlers.QueueListener]:
+    """
+    Route records through a queue to a background thread that formats and writes them
+    Returns: (handler to attach to loggers, started listener - stop() it to flush)
+    """
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return _InProcessQueueHandler(log_queue), listener
+
+# Handlers shared by every logger, so they all write (and rotate) one file
+_handlers: Optional[List[logging.Handler]] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+_handlers_lock = threading.Lock()
+
+def _shared_handlers(queued: bool) -> List[logging.Handler]:
+    global _handlers, _listener
+    with _handlers_lock:
+        if _handlers is None:
+            handlers = build_handlers()
+            if queued:
+                queue_handler, _listener = start_queue_listener(handlers)
+                atexit.register(shutdown_logging)
+                handlers = [queue_handler]
+            _handlers = handlers
+        return _handlers
+
+def shutdown_logging():
+    """Flush queued records and stop the listener thread (runs automatically at exit)"""
+    global _listener
+    with _handlers_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+def _per_process_log_file(handler: logging.FileHandler):
+    """Point a file handler at <name>.<pid><ext>, so this process rotates a file of its own"""
+    root, ext = os.path.splitext(handler.baseFilename)
+    handler.close()  # the child's copy of the descriptor; the parent keeps writing its own
+    handler.baseFilename = f'{root}.{os.getpid()}{ext}'
+    handler.stream = handler._open()
+
+def _restart_listener_in_child():
+    """
+    A forked child (e.g. a server worker) inherits the queue but not the thread
+    draining it, and must not share the parent's log file: every process would
+    roll it over at midnight and clobber the others' rotated files
+    """
+    global _listener, _handlers_lock
+    _handlers_lock = threading.Lock()
+    handlers = _listener.handlers if _listener is not None else (_handlers or [])
+    for handler in handlers:
+        if isinstance(handler, logging.FileHandler):
+            _per_process_log_file(handler)
+    if _listener is not None:
+        _listener = logging.handlers.QueueListener(_listener.queue, *_listener.handlers,
+                                                   respect_handler_level=True)
+        _listener.start()
+
+if hasattr(os, 'register_at_fork'):  # not on Windows, which doesn't fork
+    os.register_at_fork(after_in_child=_restart_listener_in_child)
+
+def _attach(logger: logging.Logger, handlers: List[logging.Handler]):
+    logger.setLevel(logging.DEBUG)
+    for handler in handlers:
+        if handler not in logger.handlers:
+            logger.addHandler(handler)
+    logger.propagate = False
+
+def setup_logger(name: str, queued: bool = LOG_QUEUED) -> logging.Logger:
+    """
+    Create a logger that writes to both file and console
+    Args:
+        name: Name of the logger (usually __name__ from calling file)
+        queued: Hand records to a background thread instead of writing them inline
+                (the handlers are created once per process, so the first call decides)
+    Returns:
+        Configured logger object
+    """
+    handlers = _shared_handlers(queued)
+    # The src modules log through logging.getLogger(__name__); send those here too
+    _attach(logging.getLogger('src'), handlers)
+    logger = logging.getLogger(name)
+    _attach(logger, handlers)
     return logger
 
 # Test it
@@ -55,5 +169,6 @@ if __name__ == '__main__':
     logger.info("Fetching public health data...")
     logger.warning("Daily cases increased by 10%")
     logger.error("API request failed")
+    shutdown_logging()
     
-    print("\n✓ Check the logs/ folder for the log file")
\ No newline at end of file
+    print(f"\n✓ Check the {LOG_DIR}/ folder for the log file")
@@ -0,0 +1,201 @@
+import bisect
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from sub-millisecond SQLite reads to slow HTTP retries
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Counter:
+    """Monotonic counter, optionally split by labels"""
+    
+    kind = 'counter'
+    
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+    
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def snapshot(self) -> Dict:
+        with self._lock:
+            samples = [[list(key), value] for key, value in self._values.items()]
+        return {'type': self.kind, 'help': self.help, 'labelnames': list(self.labelnames),
+                'samples': samples}
+
+class Histogram:
+    """
+    Fixed-bucket histogram, optionally split by labels. observe() is a
+    bisect plus a few additions under a lock, cheap enough for hot paths.
+    """
+    
+    kind = 'histogram'
+    
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._values: Dict[Tuple, List] = {}
+        self._lock = threading.Lock()
+    
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+    
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """Observe how long the block takes"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+    
+    def snapshot(self) -> Dict:
+        with self._lock:
+            samples = [[list(key), list(counts), total, count]
+                       for key, (counts, total, count) in self._values.items()]
+        return {'type': self.kind, 'help': self.help, 'labelnames': list(self.labelnames),
+                'buckets': list(self.buckets), 'samples': samples}
+
+class MetricsRegistry:
+    """Named metrics for one process; snapshots are plain JSON-serialisable dicts"""
+    
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+    
+    def _get_or_create(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f'Metric {name} already registered as a {metric.kind}')
+            return metric
+    
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help_text, labelnames)
+    
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help_text, labelnames, buckets)
+    
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+# Process-wide registry used by the instrumented modules
+REGISTRY = MetricsRegistry()
+
+def timed(histogram: Histogram, **labels) -> Callable:
+    """Decorator observing each call's duration (label 'method' defaults to the function name)"""
+    def decorator(func: Callable) -> Callable:
+        call_labels = dict(labels)
+        if 'method' in histogram.labelnames and 'method' not in call_labels:
+            call_labels['method'] = func.__name__
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start, **call_labels)
+        return wrapper
+    return decorator
+
+def _format_labels(pairs: List[Tuple[str, str]]) -> str:
+    if not pairs:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+def render_prometheus(snapshots: List[Tuple[Dict[str, str], Dict[str, Dict]]],
+                      gauges: Optional[Dict[str, Tuple[str, List[Tuple[Dict[str, str], float]]]]] = None) -> str:
+    """
+    Render registry snapshots in the Prometheus text exposition format
+    Args:
+        snapshots: (extra labels, e.g. {'process': 'collector'}, snapshot) pairs;
+                   metrics with the same name are merged under one HELP/TYPE header
+        gauges: Point-in-time values computed at scrape time: name -> (help, [(labels, value)])
+    Returns: Exposition text
+    """
+    merged: Dict[str, Dict] = {}
+    for extra_labels, snapshot in snapshots:
+        extra = list(extra_labels.items())
+        for name, metric in snapshot.items():
+            entry = merged.setdefault(name, {'type': metric['type'], 'help': metric['help'], 'lines': []})
+            for sample in metric['samples']:
+                labels = extra + list(zip(metric['labelnames'], sample[0]))
+                if metric['type'] == 'counter':
+                    entry['lines'].append(f"{name}{_format_labels(labels)} {_format_value(sample[1])}")
+                    continue
+                counts, total, count = sample[1], sample[2], sample[3]
+                cumulative = 0
+                for bound, bucket_count in zip(metric['buckets'] + ['+Inf'], counts):
+                    cumulative += bucket_count
+                    le = bound if bound == '+Inf' else _format_value(bound)
+                    entry['lines'].append(
+                        f"{name}_bucket{_format_labels(labels + [('le', str(le))])} {cumulative}")
+                entry['lines'].append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+                entry['lines'].append(f"{name}_count{_format_labels(labels)} {count}")
+    
+    for name, (help_text, samples) in (gauges or {}).items():
+        merged[name] = {'type': 'gauge', 'help': help_text, 'lines': [
+            f"{name}{_format_labels(list(labels.items()))} {_format_value(value)}" for labels, value in samples
+        ]}
+    
+    output = []
+    for name, entry in merged.items():
+        output.append(f"# HELP {name} {entry['help']}")
+        output.append(f"# TYPE {name} {entry['type']}")
+        output.extend(entry['lines'])
+    return '\n'.join(output) + '\n'
+
+# Metrics shared by the instrumented modules
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    'http_request_duration_seconds', 'disease.sh request latency per attempt', ['endpoint'])
+HTTP_RESPONSES = REGISTRY.counter(
+    'http_responses_total', 'disease.sh responses by status code', ['endpoint', 'status'])
+HTTP_RETRIES = REGISTRY.counter(
+    'http_retries_total', 'disease.sh request attempts that were retried', ['endpoint', 'reason'])
+VALIDATION_SECONDS = REGISTRY.histogram(
+    'validation_duration_seconds', 'Time spent validating payloads per call', ['model', 'mode'])
+VALIDATION_RESULTS = REGISTRY.counter(
+    'validation_results_total', 'Validated payloads by outcome', ['model', 'result'])
+DB_METHOD_SECONDS = REGISTRY.histogram(
+    'db_method_duration_seconds', 'HealthDatabase method latency', ['method'])
+DB_COMMIT_SECONDS = REGISTRY.histogram(
+    'db_commit_duration_seconds', 'SQLite writer commit latency')
+DB_WRITER_WAIT_SECONDS = REGISTRY.histogram(
+    'db_writer_wait_seconds', 'Time spent waiting for the SQLite writer connection')
+PIPELINE_STAGE_SECONDS = REGISTRY.histogram(
+    'pipeline_stage_busy_seconds', 'Busy time per ingest pipeline stage per cycle', ['stage'])
+CYCLE_SECONDS = REGISTRY.histogram(
+    'collection_cycle_duration_seconds', 'Duration of a full collection cycle',
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0))
+API_REQUEST_SECONDS = REGISTRY.histogram(
+    'api_request_duration_seconds', 'Health API request latency', ['route', 'status'])
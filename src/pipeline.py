@@ -0,0 +1,178 @@
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from config import (PIPELINE_FETCH_WORKERS, PIPELINE_VALIDATE_WORKERS, PIPELINE_QUEUE_SIZE,
+                    PIPELINE_VALIDATE_BATCH_SIZE, PIPELINE_WRITE_BATCH_SIZE)
+
+_DONE = object()  # end-of-stream marker passed down the queues
+
+class StageStats:
+    """Items handled and time spent working (not waiting on queues) by one stage"""
+    
+    def __init__(self):
+        self.items_in = 0
+        self.items_out = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self._lock = threading.Lock()
+    
+    def record(self, items_in: int, items_out: int, errors: int, seconds: float):
+        with self._lock:
+            self.items_in += items_in
+            self.items_out += items_out
+            self.errors += errors
+            self.busy_seconds += seconds
+    
+    def to_dict(self) -> Dict:
+        return {
+            'items_in': self.items_in,
+            'items_out': self.items_out,
+            'errors': self.errors,
+            'busy_seconds': round(self.busy_seconds, 4)
+        }
+
+class IngestPipeline:
+    """
+    Three-stage ingest: fetch workers -> validation workers -> one batched DB writer.
+    Stages are connected by bounded queues, so a slow writer makes validation
+    (and then fetching) wait instead of buffering without limit, and a slow
+    API doesn't stop already-fetched rows from being stored. A cycle's
+    throughput is bounded by its slowest stage instead of the sum of all three.
+    """
+    
+    def __init__(self, fetch_workers: int = PIPELINE_FETCH_WORKERS,
+                 validate_workers: int = PIPELINE_VALIDATE_WORKERS,
+                 queue_size: int = PIPELINE_QUEUE_SIZE,
+                 validate_batch_size: int = PIPELINE_VALIDATE_BATCH_SIZE,
+                 write_batch_size: int = PIPELINE_WRITE_BATCH_SIZE):
+        self.fetch_workers = fetch_workers
+        self.validate_workers = validate_workers
+        self.queue_size = queue_size
+        self.validate_batch_size = validate_batch_size
+        self.write_batch_size = write_batch_size
+    
+    def run(self, fetch_tasks: List[Callable[[], Optional[Iterable[Any]]]],
+            validate: Callable[[List[Any]], Tuple[List[Any], List[Any]]],
+            write: Callable[[List[Any], List[Any]], None]) -> Dict:
+        """
+        Run one cycle to completion
+        Args:
+            fetch_tasks: Zero-argument callables, each returning payloads (or None on failure)
+            validate: Takes a batch of payloads, returns (valid items, error entries);
+                      payloads it drops from both lists are counted as skipped
+            write: Takes (valid items, error entries); only ever called from one thread
+        Returns: Per-stage stats ('fetch', 'validate', 'write') and 'total_seconds'
+        Raises: The first exception raised by any stage, after the pipeline has drained
+        """
+        to_validate = queue.Queue(maxsize=self.queue_size)
+        to_write = queue.Queue(maxsize=self.queue_size)
+        stats = {'fetch': StageStats(), 'validate': StageStats(), 'write': StageStats()}
+        failures: List[BaseException] = []
+        started = time.perf_counter()
+        
+        def fetch_one(task):
+            start = time.perf_counter()
+            try:
+                payloads = list(task() or [])
+            except Exception as e:
+                failures.append(e)
+                stats['fetch'].record(1, 0, 1, time.perf_counter() - start)
+                return
+            stats['fetch'].record(1, len(payloads), 0 if payloads else 1, time.perf_counter() - start)
+            for payload in payloads:
+                to_validate.put(payload)  # blocks while validation is behind
+        
+        def run_fetchers():
+            try:
+                workers = max(1, min(self.fetch_workers, len(fetch_tasks)))
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    list(executor.map(fetch_one, fetch_tasks))
+            finally:
+                for _ in range(self.validate_workers):
+                    to_validate.put(_DONE)
+        
+        def run_validator():
+            done = False
+            try:
+                while not done:
+                    batch, done = self._take_batch(to_validate, self.validate_batch_size)
+                    if not batch:
+                        continue
+                    start = time.perf_counter()
+                    try:
+                        valid, errors = validate(batch)
+                    except Exception as e:
+                        failures.append(e)
+                        stats['validate'].record(len(batch), 0, len(batch), time.perf_counter() - start)
+                        continue
+                    stats['validate'].record(len(batch), len(valid), len(errors), time.perf_counter() - start)
+                    if valid or errors:
+                        to_write.put((valid, errors))
+            finally:
+                # Keep draining after a failure so the fetchers can never block forever
+                while not done:
+                    done = to_validate.get() is _DONE
+                to_write.put(_DONE)
+        
+        def run_writer():
+            remaining = self.validate_workers
+            while remaining:
+                valid, errors = [], []
+                # Merge whatever validation has produced into one write batch
+                item = to_write.get()
+                while True:
+                    if item is _DONE:
+                        remaining -= 1
+                    else:
+                        valid.extend(item[0])
+                        errors.extend(item[1])
+                    if not remaining or len(valid) + len(errors) >= self.write_batch_size:
+                        break
+                    try:
+                        item = to_write.get_nowait()
+                    except queue.Empty:
+                        break
+                if not valid and not errors:
+                    continue
+                start = time.perf_counter()
+                try:
+                    write(valid, errors)
+                    stats['write'].record(len(valid) + len(errors), len(valid), len(errors),
+                                          time.perf_counter() - start)
+                except Exception as e:
+                    failures.append(e)
+                    stats['write'].record(len(valid) + len(errors), 0, len(valid) + len(errors),
+                                          time.perf_counter() - start)
+        
+        threads = [threading.Thread(target=run_fetchers, name='pipeline-fetch')]
+        threads += [threading.Thread(target=run_validator, name=f'pipeline-validate-{i}')
+                    for i in range(self.validate_workers)]
+        threads.append(threading.Thread(target=run_writer, name='pipeline-write'))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        if failures:
+            raise failures[0]
+        
+        result = {name: stage.to_dict() for name, stage in stats.items()}
+        result['total_seconds'] = round(time.perf_counter() - started, 4)
+        return result
+    
+    @staticmethod
+    def _take_batch(source: queue.Queue, limit: int) -> Tuple[List[Any], bool]:
+        """Block for one item, then take whatever else is ready (up to limit)"""
+        batch = []
+        item = source.get()
+        while item is not _DONE:
+            batch.append(item)
+            if len(batch) >= limit:
+                return batch, False
+            try:
+                item = source.get_nowait()
+            except queue.Empty:
+                return batch, False
+        return batch, True
@@ -0,0 +1,116 @@
+import math
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from config import FETCH_INTERVAL_MINUTES
+
+# Counted events
+INSERTED = 'inserted'
+VALIDATION_FAILED = 'validation_failed'
+FETCH_FAILED = 'fetch_failed'
+STORAGE_FAILED = 'storage_failed'
+OTHER_ERROR = 'error'
+MISSED_INTERVAL = 'missed_interval'  # a snapshot that should have arrived but didn't
+FAILURE_EVENTS = (VALIDATION_FAILED, FETCH_FAILED, STORAGE_FAILED, OTHER_ERROR)
+
+# Sources
+GLOBAL = 'global'
+COUNTRY = 'country'
+
+# error_log types with a dedicated event; anything else counts as OTHER_ERROR
+ERROR_TYPE_EVENTS = {
+    'VALIDATION_FAILED': VALIDATION_FAILED,
+    'API_FETCH_FAILED': FETCH_FAILED,
+}
+
+BUCKET_FORMAT = '%Y-%m-%d %H:00:00'  # hourly buckets
+
+def event_for_error(error_type: str) -> str:
+    """Counter event for an error_log error type"""
+    return ERROR_TYPE_EVENTS.get(error_type, OTHER_ERROR)
+
+def bucket_of(when: datetime) -> str:
+    """Bucket key for an event that happened at `when`"""
+    return when.strftime(BUCKET_FORMAT)
+
+def window_start(now: datetime, hours: int) -> datetime:
+    """
+    Start of an `hours` window made of whole buckets: the last `hours`
+    complete hours plus the current partial one
+    """
+    return (now - timedelta(hours=hours)).replace(minute=0, second=0, microsecond=0)
+
+def missed_intervals(previous: datetime, current: datetime,
+                     interval_minutes: int = FETCH_INTERVAL_MINUTES) -> int:
+    """
+    Snapshots missing between two consecutive ones
+    A gap of up to 1.5 intervals counts as on time; longer gaps are rounded
+    to whole intervals (35 minutes at a 10-minute cadence = 3 missed)
+    """
+    intervals = (current - previous).total_seconds() / (interval_minutes * 60)
+    if intervals <= 1.5:
+        return 0
+    return round(intervals) - 1
+
+def overdue_intervals(last: Optional[datetime], now: datetime,
+                      interval_minutes: int = FETCH_INTERVAL_MINUTES) -> int:
+    """
+    Snapshots missing since the newest one, for a gap that is still open
+    One interval of slack is allowed: disease.sh data is up to an interval
+    old when it's fetched, and fetches happen once per interval.
+    """
+    if last is None:
+        return 0
+    elapsed = (now - last).total_seconds() / (interval_minutes * 60)
+    return max(0, math.floor(elapsed) - 1)
+
+def counter_rows(events: Counter, when: datetime) -> List[Tuple[str, str, str, str, int]]:
+    """
+    Turn counted events into UPSERT_QUALITY_COUNTER_SQL parameters
+    Args:
+        events: (event, source, entity) -> count
+        when: Time the events happened
+    """
+    bucket = bucket_of(when)
+    return [(event, source, bucket, entity or '', count)
+            for (event, source, entity), count in events.items() if count]
+
+def summarize(totals: Dict[Tuple[str, str], int], last_data: Optional[datetime], now: datetime,
+              hours: int, interval_minutes: int = FETCH_INTERVAL_MINUTES) -> Dict:
+    """
+    Build get_data_quality_metrics' result from summed window counters
+    Args:
+        totals: (event, source) -> count over the window
+        last_data: Timestamp of the newest global snapshot
+        now: Current time
+        hours: Window length the totals were summed over
+        interval_minutes: Expected cadence
+    Returns: Data-point, failure and gap figures for the window
+    """
+    start = window_start(now, hours)
+    window_intervals = math.ceil((now - start).total_seconds() / (interval_minutes * 60))
+    actual = totals.get((INSERTED, GLOBAL), 0)
+    recorded_missed = totals.get((MISSED_INTERVAL, GLOBAL), 0)
+    overdue = overdue_intervals(last_data, now, interval_minutes)
+    missing = min(recorded_missed + overdue, window_intervals)
+    expected = actual + missing
+
+    failures = {event: {} for event in FAILURE_EVENTS}
+    for (event, source), count in totals.items():
+        if event in failures and count:
+            failures[event][source] = count
+
+    return {
+        'window_start': start.isoformat(sep=' '),
+        'expected_data_points': expected,
+        'actual_data_points': actual,
+        'missing_data_points': missing,
+        'success_rate_percent': round(actual / expected * 100, 2) if expected else 0,
+        'error_count': sum(sum(by_source.values()) for by_source in failures.values()),
+        'failures': failures,
+        'gaps': {
+            'missed_intervals': recorded_missed,
+            'overdue_intervals': overdue,
+            'minutes_since_last_data': round((now - last_data).total_seconds() / 60, 1) if last_data else None,
+        }
+    }
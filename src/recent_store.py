@@ -0,0 +1,277 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from config import RECENT_STORE_DAYS, RECENT_STORE_SLACK, RECENT_STORE_SYNC_SECONDS, FETCH_INTERVAL_MINUTES
+from src.archive import FLOAT_COLUMNS, GLOBAL_PARTITION
+
+# Columns kept per table besides the timestamp. Nullable integer columns are
+# float64 with NaN for NULL, as in the archive, so both convert to dicts the same way.
+RECENT_COLUMNS = {
+    'country_stats': {
+        'total_cases': np.int64,
+        'total_deaths': np.int64,
+        'today_cases': np.float64,
+        'today_deaths': np.float64,
+        'cases_per_million': np.float64,
+    },
+    'global_stats': {
+        'total_cases': np.int64,
+        'total_deaths': np.int64,
+        'active_cases': np.int64,
+        'today_cases': np.float64,
+    },
+}
+
+def _value(value, dtype):
+    return np.nan if value is None and dtype is np.float64 else value
+
+class SeriesBuffer:
+    """
+    Fixed-capacity ring buffer of one partition's rows, one typed array per column
+    Rows are kept in timestamp order; once full, each new row overwrites the oldest.
+    """
+    
+    def __init__(self, columns: Dict[str, type], capacity: int, covered_from: np.datetime64):
+        """
+        Args:
+            columns: Column name -> dtype (timestamp is added)
+            capacity: Rows held before the oldest are overwritten
+            covered_from: Rows from this time on are all in the buffer
+        """
+        self.capacity = capacity
+        self.timestamps = np.zeros(capacity, dtype='datetime64[ms]')
+        self.texts = np.empty(capacity, dtype=object)  # timestamps as SQLite stores them, for dict reads
+        self.columns = {name: np.zeros(capacity, dtype=dtype) for name, dtype in columns.items()}
+        self.start = 0  # index of the oldest row
+        self.size = 0
+        self.covered_from = covered_from
+    
+    def _ordered(self) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """Copies of all rows, oldest first (the columns include 'timestamp_text')"""
+        order = (self.start + np.arange(self.size)) % self.capacity
+        columns = {name: values[order] for name, values in self.columns.items()}
+        columns['timestamp_text'] = self.texts[order]
+        return self.timestamps[order], columns
+    
+    def append(self, timestamp: np.datetime64, values: Dict, text: Optional[str] = None):
+        """Add a row; a row older than the newest one is slotted into place"""
+        if self.size and timestamp < self.timestamps[self.newest]:
+            self._insert_sorted(timestamp, values, text)
+            return
+        if self.size == self.capacity:
+            # Everything after the overwritten row is still here
+            self.covered_from = max(self.covered_from, self.timestamps[self.start] + np.timedelta64(1, 'ms'))
+            index = self.start
+            self.start = (self.start + 1) % self.capacity
+        else:
+            index = (self.start + self.size) % self.capacity
+            self.size += 1
+        self.timestamps[index] = timestamp
+        self.texts[index] = text
+        for name, column in self.columns.items():
+            column[index] = _value(values.get(name), column.dtype.type)
+    
+    def _insert_sorted(self, timestamp: np.datetime64, values: Dict, text: Optional[str]):
+        timestamps, columns = self._ordered()
+        position = int(np.searchsorted(timestamps, timestamp, side='right'))
+        timestamps = np.insert(timestamps, position, timestamp)
+        columns['timestamp_text'] = np.insert(columns['timestamp_text'], position, text)
+        for name in self.columns:
+            columns[name] = np.insert(columns[name], position, _value(values.get(name), columns[name].dtype.type))
+        if len(timestamps) > self.capacity:
+            self.covered_from = max(self.covered_from, timestamps[0] + np.timedelta64(1, 'ms'))
+            timestamps = timestamps[1:]
+            columns = {name: column[1:] for name, column in columns.items()}
+        self.size = len(timestamps)
+        self.start = 0
+        self.timestamps[:self.size] = timestamps
+        self.texts[:self.size] = columns.pop('timestamp_text')
+        for name, column in columns.items():
+            self.columns[name][:self.size] = column
+    
+    def window(self, since: np.datetime64) -> Dict[str, np.ndarray]:
+        """Copies of the rows at or after `since`, oldest first, with 'timestamp' and 'timestamp_text'"""
+        timestamps, columns = self._ordered()
+        first = int(np.searchsorted(timestamps, since))
+        result = {'timestamp': timestamps[first:]}
+        result.update((name, column[first:]) for name, column in columns.items())
+        return result
+    
+    @property
+    def newest(self) -> int:
+        """Index of the newest row"""
+        return (self.start + self.size - 1) % self.capacity
+    
+    def latest(self, column: str, points: int) -> np.ndarray:
+        """The newest `points` values of a column, newest first"""
+        count = min(points, self.size)
+        order = (self.start + self.size - 1 - np.arange(count)) % self.capacity
+        return self.columns[column][order]
+    
+    @property
+    def nbytes(self) -> int:
+        return (self.timestamps.nbytes + self.texts.nbytes
+                + sum(column.nbytes for column in self.columns.values()))
+
+class RecentStore:
+    """
+    The last `days` of country_stats and global_stats in memory, as ring buffers
+    Loaded once from SQLite, then kept current by sync(), which reads only rows
+    with a higher id than it has seen: after every insert in the collector, and
+    at most every sync_interval seconds on reads in the health API (a separate
+    process). Reads answer only windows the store fully covers; anything else
+    returns None and goes to SQLite.
+    """
+    
+    def __init__(self, days: int = RECENT_STORE_DAYS, slack: float = RECENT_STORE_SLACK,
+                 sync_interval: float = RECENT_STORE_SYNC_SECONDS,
+                 interval_minutes: int = FETCH_INTERVAL_MINUTES):
+        """
+        Args:
+            days: Window kept per country
+            slack: Capacity multiplier over one row per fetch interval, for bursts and late rows
+            sync_interval: Minimum seconds between syncs on the read path
+            interval_minutes: Expected cadence, for sizing the buffers
+        """
+        self.days = days
+        self.capacity = int(days * 24 * 60 / interval_minutes * slack) + 1
+        self.sync_interval = sync_interval
+        self.buffers: Dict[str, Dict[str, SeriesBuffer]] = {table: {} for table in RECENT_COLUMNS}
+        self.last_ids = {table: 0 for table in RECENT_COLUMNS}
+        self.loaded_from: Optional[np.datetime64] = None
+        # Newest country row per country, one slot each, so rankings are a single argsort
+        self.latest_slots: Dict[str, int] = {}
+        self.latest = self._latest_arrays(256)
+        self._synced_at = 0.0
+        self._lock = threading.RLock()
+    
+    @staticmethod
+    def _latest_arrays(size: int) -> Dict[str, np.ndarray]:
+        return {name: np.full(size, np.nan) for name in RECENT_COLUMNS['country_stats']}
+    
+    def _buffer(self, table: str, partition: str) -> SeriesBuffer:
+        buffers = self.buffers[table]
+        if partition not in buffers:
+            buffers[partition] = SeriesBuffer(RECENT_COLUMNS[table], self.capacity, self.loaded_from)
+        return buffers[partition]
+    
+    def load(self, pool, now: Optional[datetime] = None):
+        """Fill the store from SQLite, replacing anything already held"""
+        now = now or datetime.now()
+        since = now - timedelta(days=self.days)
+        with self._lock:
+            self.loaded_from = np.datetime64(since, 'ms')
+            self.buffers = {table: {} for table in RECENT_COLUMNS}
+            self.latest_slots = {}
+            self.latest = self._latest_arrays(256)
+            with pool.reader() as conn:
+                for table in RECENT_COLUMNS:
+                    self.last_ids[table] = conn.execute(f'SELECT COALESCE(MAX(id), 0) FROM {table}').fetchone()[0]
+                    self._read(conn, table, 'timestamp >= ? AND id <= ?', (since, self.last_ids[table]))
+                # Latest snapshots of countries that went quiet, so summaries still see them
+                columns = ', '.join(RECENT_COLUMNS['country_stats'])
+                for row in conn.execute(f'SELECT country, timestamp, {columns} FROM country_latest '
+                                        f'WHERE timestamp < ?', (since,)):
+                    if not self._buffer('country_stats', row[0]).size:
+                        self._place('country_stats', row)
+            self._synced_at = time.monotonic()
+    
+    def sync(self, pool, force: bool = False):
+        """Append rows inserted since the last sync (throttled unless forced)"""
+        if self.loaded_from is None:
+            return
+        if not force and time.monotonic() - self._synced_at < self.sync_interval:
+            return
+        with self._lock:
+            with pool.reader() as conn:
+                for table in RECENT_COLUMNS:
+                    newest = conn.execute(f'SELECT COALESCE(MAX(id), 0) FROM {table}').fetchone()[0]
+                    if newest > self.last_ids[table]:
+                        # Rows older than the window (e.g. from a backfill) are skipped in SQL
+                        self._read(conn, table, 'id > ? AND id <= ? AND timestamp >= ?',
+                                   (self.last_ids[table], newest, self.loaded_from.astype(datetime)))
+                        self.last_ids[table] = newest
+            self._synced_at = time.monotonic()
+    
+    def _read(self, conn, table: str, condition: str, params: Tuple):
+        columns = ', '.join(RECENT_COLUMNS[table])
+        key = 'country' if table == 'country_stats' else f"'{GLOBAL_PARTITION}'"
+        cursor = conn.execute(f'SELECT {key}, timestamp, {columns} FROM {table} WHERE {condition} '
+                              f'ORDER BY {key}, timestamp', params)
+        for row in cursor:
+            self._place(table, row)
+    
+    def _place(self, table: str, row: Tuple):
+        """Append a (partition, timestamp, columns...) row to its buffer"""
+        buffer = self._buffer(table, row[0])
+        buffer.append(np.datetime64(row[1], 'ms'), dict(zip(RECENT_COLUMNS[table], row[2:])), row[1])
+        if table != 'country_stats':
+            return
+        slot = self.latest_slots.get(row[0])
+        if slot is None:
+            slot = self.latest_slots[row[0]] = len(self.latest_slots)
+            if slot == len(self.latest['total_cases']):
+                grown = self._latest_arrays(slot * 2)
+                for name, values in self.latest.items():
+                    grown[name][:slot] = values
+                self.latest = grown
+        for name, values in buffer.columns.items():
+            self.latest[name][slot] = values[buffer.newest]
+    
+    def window(self, table: str, partition: str, since: datetime) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Rows of one partition from `since` on, oldest first
+        Returns: Column arrays (timestamp as datetime64[ms]), or None if the
+                 store doesn't hold the whole window
+        """
+        since = np.datetime64(since, 'ms')
+        with self._lock:
+            if self.loaded_from is None or since < self.loaded_from:
+                return None
+            buffer = self.buffers[table].get(partition)
+            if buffer is None:
+                # Nothing in the window
+                result = {'timestamp': np.array([], dtype='datetime64[ms]'),
+                          'timestamp_text': np.array([], dtype=object)}
+                result.update((name, np.array([], dtype=dtype)) for name, dtype in RECENT_COLUMNS[table].items())
+                return result
+            if since < buffer.covered_from:
+                return None
+            return buffer.window(since)
+    
+    def latest_values(self, countries: List[str], column: str, points: int) -> Dict[str, List]:
+        """
+        Newest `points` values of a country column, newest first, as Python values
+        (NULL as None, integer columns as int); countries without rows are left out
+        """
+        convert = float if column in FLOAT_COLUMNS else int
+        latest = {}
+        with self._lock:
+            for country in countries:
+                buffer = self.buffers['country_stats'].get(country)
+                if buffer is not None and buffer.size:
+                    latest[country] = [None if value != value else convert(value)
+                                       for value in buffer.latest(column, points).tolist()]
+        return latest
+    
+    def top_countries(self, column: str, limit: int) -> Optional[List[Tuple[str, Dict]]]:
+        """
+        Countries with the largest `column` in their newest row, skipping NULLs
+        Returns: (country, newest row values as floats, NULL as NaN) pairs, or None before load()
+        """
+        with self._lock:
+            if self.loaded_from is None:
+                return None
+            names = list(self.latest_slots)
+            values = self.latest[column][:len(names)]
+            present = np.flatnonzero(~np.isnan(values))
+            order = present[np.argsort(-values[present], kind='stable')][:limit]
+            return [(names[i], {name: values[i] for name, values in self.latest.items()}) for i in order]
+    
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the column arrays (not counting the timestamp strings they point to)"""
+        with self._lock:
+            return sum(buffer.nbytes for buffers in self.buffers.values() for buffer in buffers.values())
@@ -0,0 +1,203 @@
+import math
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+from config import (CASE_INCREASE_THRESHOLD_PERCENT, EWMA_ALPHA, ANOMALY_WINDOW_POINTS,
+                    ANOMALY_MIN_POINTS, ANOMALY_ZSCORE_THRESHOLD, WOW_INCREASE_THRESHOLD_PERCENT)
+
+WOW_DAYS = 7
+
+class CountryStats:
+    """Rolling statistics for one country, updated in O(1) per data point"""
+    
+    def __init__(self, window: int):
+        self.last_timestamp: Optional[datetime] = None
+        self.last_today_cases: Optional[int] = None
+        self.ewma: Optional[float] = None
+        self.window = deque(maxlen=window)
+        self.window_sum = 0.0
+        self.window_sumsq = 0.0
+        # [date, last today_cases reported that day] for the last two weeks
+        self.daily = deque(maxlen=2 * WOW_DAYS)
+    
+    def push(self, value: float, alpha: float):
+        """Add a value to the EWMA and the rolling window"""
+        self.ewma = value if self.ewma is None else alpha * value + (1 - alpha) * self.ewma
+        if len(self.window) == self.window.maxlen:
+            oldest = self.window[0]
+            self.window_sum -= oldest
+            self.window_sumsq -= oldest * oldest
+        self.window.append(value)
+        self.window_sum += value
+        self.window_sumsq += value * value
+    
+    def mean_std(self):
+        """Rolling mean and population standard deviation"""
+        count = len(self.window)
+        mean = self.window_sum / count
+        variance = max(self.window_sumsq / count - mean * mean, 0.0)
+        return mean, math.sqrt(variance)
+    
+    def to_dict(self) -> Dict:
+        return {
+            'last_timestamp': self.last_timestamp.isoformat() if self.last_timestamp else None,
+            'last_today_cases': self.last_today_cases,
+            'ewma': self.ewma,
+            'window': list(self.window),
+            'daily': [list(day) for day in self.daily]
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict, window: int) -> 'CountryStats':
+        stats = cls(window)
+        if data.get('last_timestamp'):
+            stats.last_timestamp = datetime.fromisoformat(data['last_timestamp'])
+        stats.last_today_cases = data.get('last_today_cases')
+        stats.ewma = data.get('ewma')
+        stats.window.extend(data.get('window', []))
+        # Recompute the sums rather than persisting them, so rounding can't drift
+        stats.window_sum = float(sum(stats.window))
+        stats.window_sumsq = float(sum(v * v for v in stats.window))
+        stats.daily.extend([day[0], day[1]] for day in data.get('daily', []))
+        return stats
+
+class StreamingSurgeDetector:
+    """
+    Stateful surge and anomaly detection, fed one data point at a time by the
+    collector. Emits three alert types:
+        case_surge      - today_cases rose more than threshold_percent since the
+                          previous point (same rule as HealthDatabase.detect_case_surge)
+        anomaly         - today_cases is more than zscore_threshold standard
+                          deviations above the rolling mean
+        week_over_week  - the last 7 days' cases exceed the previous 7 days' by
+                          more than wow_threshold_percent (checked once per day)
+    """
+    
+    def __init__(self, threshold_percent: float = CASE_INCREASE_THRESHOLD_PERCENT,
+                 ewma_alpha: float = EWMA_ALPHA,
+                 window: int = ANOMALY_WINDOW_POINTS,
+                 min_points: int = ANOMALY_MIN_POINTS,
+                 zscore_threshold: float = ANOMALY_ZSCORE_THRESHOLD,
+                 wow_threshold_percent: float = WOW_INCREASE_THRESHOLD_PERCENT):
+        self.threshold_percent = threshold_percent
+        self.ewma_alpha = ewma_alpha
+        self.window = window
+        self.min_points = min_points
+        self.zscore_threshold = zscore_threshold
+        self.wow_threshold_percent = wow_threshold_percent
+        self.states: Dict[str, CountryStats] = {}
+    
+    def update(self, country: str, timestamp: datetime, today_cases: Optional[int]) -> List[Dict]:
+        """
+        Feed one data point and return any alerts it triggers
+        Args:
+            country: Country name
+            timestamp: Snapshot time of the data point
+            today_cases: Reported cases today (None counts as 0)
+        Returns: List of alert dicts (country, alert_type, severity, data_timestamp, details)
+        """
+        stats = self.states.get(country)
+        if stats is None:
+            stats = self.states[country] = CountryStats(self.window)
+        
+        # Replayed or out-of-order points would corrupt the rolling state
+        if stats.last_timestamp is not None and timestamp <= stats.last_timestamp:
+            return []
+        
+        value = today_cases or 0
+        alerts = []
+        
+        surge = self._check_surge(stats, value)
+        if surge:
+            alerts.append(self._alert(country, timestamp, 'case_surge', 'warning', surge))
+        
+        anomaly = self._check_anomaly(stats, value)
+        if anomaly:
+            alerts.append(self._alert(country, timestamp, 'anomaly', 'warning', anomaly))
+        
+        week_over_week = self._update_daily(stats, timestamp, value)
+        if week_over_week:
+            alerts.append(self._alert(country, timestamp, 'week_over_week', 'info', week_over_week))
+        
+        stats.push(float(value), self.ewma_alpha)
+        stats.last_timestamp = timestamp
+        stats.last_today_cases = value
+        return alerts
+    
+    def _check_surge(self, stats: CountryStats, value: int) -> Optional[Dict]:
+        previous = stats.last_today_cases or 0
+        if previous == 0:
+            return None
+        percent_change = ((value - previous) / previous) * 100
+        if percent_change <= self.threshold_percent:
+            return None
+        return {
+            'surge_detected': True,
+            'percent_change': round(percent_change, 2),
+            'current_cases': value,
+            'previous_cases': previous,
+            'threshold': self.threshold_percent
+        }
+    
+    def _check_anomaly(self, stats: CountryStats, value: int) -> Optional[Dict]:
+        if len(stats.window) < self.min_points:
+            return None
+        mean, std = stats.mean_std()
+        if std == 0:
+            return None
+        zscore = (value - mean) / std
+        if zscore <= self.zscore_threshold:
+            return None
+        return {
+            'current_cases': value,
+            'rolling_mean': round(mean, 2),
+            'rolling_std': round(std, 2),
+            'ewma': round(stats.ewma, 2),
+            'zscore': round(zscore, 2),
+            'threshold': self.zscore_threshold
+        }
+    
+    def _update_daily(self, stats: CountryStats, timestamp: datetime, value: int) -> Optional[Dict]:
+        """Track each day's last value; on a new day, compare the two completed weeks"""
+        day = timestamp.date().isoformat()
+        if stats.daily and stats.daily[-1][0] == day:
+            stats.daily[-1][1] = value
+            return None
+        
+        result = None
+        if len(stats.daily) == stats.daily.maxlen:
+            days = list(stats.daily)
+            previous_week = sum(v for _, v in days[:WOW_DAYS])
+            current_week = sum(v for _, v in days[WOW_DAYS:])
+            if previous_week > 0:
+                change = ((current_week - previous_week) / previous_week) * 100
+                if change > self.wow_threshold_percent:
+                    result = {
+                        'current_week_cases': current_week,
+                        'previous_week_cases': previous_week,
+                        'ratio': round(current_week / previous_week, 3),
+                        'percent_change': round(change, 2),
+                        'threshold': self.wow_threshold_percent
+                    }
+        stats.daily.append([day, value])
+        return result
+    
+    @staticmethod
+    def _alert(country: str, timestamp: datetime, alert_type: str, severity: str, details: Dict) -> Dict:
+        return {
+            'country': country,
+            'alert_type': alert_type,
+            'severity': severity,
+            'data_timestamp': timestamp,
+            'details': details
+        }
+    
+    def dump_states(self, countries: Optional[List[str]] = None) -> Dict[str, Dict]:
+        """Serialisable state for the given countries (all if None)"""
+        names = self.states.keys() if countries is None else countries
+        return {name: self.states[name].to_dict() for name in names if name in self.states}
+    
+    def load_states(self, states: Dict[str, Dict]):
+        """Restore state saved with dump_states, so a restart doesn't replay history"""
+        for country, data in states.items():
+            self.states[country] = CountryStats.from_dict(data, self.window)
@@ -1,6 +1,25 @@
-from pydantic import BaseModel, Field, validator
+import logging
+import math
+import time
+import numpy as np
+from pydantic import BaseModel, Field, ValidationError, ValidationInfo, field_validator, model_validator
 from datetime import datetime
-from typing import Optional
+from typing import Callable, Dict, List, Optional, Tuple
+from src.metrics import VALIDATION_SECONDS, VALIDATION_RESULTS
+
+logger = logging.getLogger(__name__)
+
+# Messages of the models' own rules, shared with the batch validators below
+def _exceeds_cases(field: str, value, cases) -> str:
+    return f'{field} ({value}) cannot exceed cases ({cases})'
+
+def _active_inconsistent(active) -> str:
+    return f'Active cases ({active}) inconsistent with totals'
+
+def _per_million_mismatch(value) -> str:
+    return f'Cases per million ({value}) doesn\'t match calculation'
+
+PER_MILLION_WITHOUT_POPULATION = 'Cases per million given without population'
 
 class GlobalHealthData(BaseModel):
     """Validates global health statistics"""
@@ -14,29 +33,30 @@ class GlobalHealthData(BaseModel):
     todayCases: Optional[int] = Field(None, ge=0)
     todayDeaths: Optional[int] = Field(None, ge=0)
     
-    @validator('deaths')
-    def deaths_not_greater_than_cases(cls, v, values):
+    @field_validator('deaths')
+    @classmethod
+    def deaths_not_greater_than_cases(cls, v: int, info: ValidationInfo) -> int:
         """Deaths can't exceed total cases"""
-        if 'cases' in values and v > values['cases']:
-            raise ValueError(f'Deaths ({v}) cannot exceed cases ({values["cases"]})')
+        if 'cases' in info.data and v > info.data['cases']:
+            raise ValueError(_exceeds_cases('Deaths', v, info.data['cases']))
         return v
     
-    @validator('recovered')
-    def recovered_reasonable(cls, v, values):
+    @field_validator('recovered')
+    @classmethod
+    def recovered_reasonable(cls, v: int, info: ValidationInfo) -> int:
         """Recovered should be reasonable compared to total cases"""
-        if 'cases' in values and v > values['cases']:
-            raise ValueError(f'Recovered ({v}) cannot exceed cases ({values["cases"]})')
+        if 'cases' in info.data and v > info.data['cases']:
+            raise ValueError(_exceeds_cases('Recovered', v, info.data['cases']))
         return v
     
-    @validator('active')
-    def active_cases_reasonable(cls, v, values):
+    @model_validator(mode='after')
+    def active_cases_reasonable(self) -> 'GlobalHealthData':
         """Active cases should roughly equal cases - deaths - recovered"""
-        if 'cases' in values and 'deaths' in values and 'recovered' in values:
-            expected_active = values['cases'] - values['deaths'] - values['recovered']
-            # Allow 10% margin due to data reporting delays
-            if abs(v - expected_active) > values['cases'] * 0.1:
-                raise ValueError(f'Active cases ({v}) inconsistent with totals')
-        return v
+        expected_active = self.cases - self.deaths - self.recovered
+        # Allow 10% margin due to data reporting delays
+        if abs(self.active - expected_active) > self.cases * 0.1:
+            raise ValueError(_active_inconsistent(self.active))
+        return self
 
 class CountryHealthData(BaseModel):
     """Validates country-specific health statistics"""
@@ -55,40 +75,59 @@ class CountryHealthData(BaseModel):
     casesPerOneMillion: Optional[float] = Field(None, ge=0)
     deathsPerOneMillion: Optional[float] = Field(None, ge=0)
     
-    @validator('todayCases')
-    def today_cases_reasonable(cls, v, values):
+    @field_validator('todayCases')
+    @classmethod
+    def today_cases_reasonable(cls, v: Optional[int], info: ValidationInfo) -> Optional[int]:
         """Today's cases shouldn't exceed 1% of population"""
-        if v is not None and 'population' in values and values['population']:
-            if v > values['population'] * 0.01:
+        # population is declared after todayCases, so it's never in info.data
+        # here and this rule doesn't fire (same as under pydantic 1.x)
+        if v is not None and 'population' in info.data and info.data['population']:
+            if v > info.data['population'] * 0.01:
                 raise ValueError(f'Today\'s cases ({v}) seems unreasonably high')
         return v
     
-    @validator('casesPerOneMillion')
-    def cases_per_million_matches(cls, v, values):
+    @field_validator('casesPerOneMillion')
+    @classmethod
+    def cases_per_million_matches(cls, v: Optional[float], info: ValidationInfo) -> Optional[float]:
         """Verify cases per million calculation"""
-        if v is not None and 'cases' in values and 'population' in values:
-            if values['population'] > 0:
-                expected = (values['cases'] / values['population']) * 1000000
+        if v is not None and 'cases' in info.data and 'population' in info.data:
+            population = info.data['population']
+            if population is None:
+                # pydantic 1.x rejected this via the TypeError from None > 0
+                raise ValueError(PER_MILLION_WITHOUT_POPULATION)
+            if population > 0:
+                expected = (info.data['cases'] / population) * 1000000
                 # Allow 5% margin for rounding
                 if abs(v - expected) > expected * 0.05:
-                    raise ValueError(f'Cases per million ({v}) doesn\'t match calculation')
+                    raise ValueError(_per_million_mismatch(v))
         return v
 
+def _record_validation(model: str, mode: str, start: float, passed: int = 0, failed: int = 0):
+    VALIDATION_SECONDS.observe(time.perf_counter() - start, model=model, mode=mode)
+    if passed:
+        VALIDATION_RESULTS.inc(passed, model=model, result='valid')
+    if failed:
+        VALIDATION_RESULTS.inc(failed, model=model, result='invalid')
+
 def validate_global_data(api_data: dict) -> Optional[GlobalHealthData]:
     """
     Validate global API response
     Returns: GlobalHealthData object if valid, None if invalid
     """
+    start = time.perf_counter()
     try:
         validated = GlobalHealthData(**api_data)
+        _record_validation('GlobalHealthData', 'single', start, passed=1)
         return validated
-        
+    
     except ValueError as e:
-        print(f"ERROR: Validation failed: {e}")
+        _record_validation('GlobalHealthData', 'single', start, failed=1)
+        logger.error("Validation failed: %s", e)
         return None
-        
+    
     except Exception as e:
-        print(f"ERROR: Unexpected validation error: {e}")
+        _record_validation('GlobalHealthData', 'single', start, failed=1)
+        logger.error("Unexpected validation error: %s", e)
         return None
 
 def validate_country_data(api_data: dict) -> Optional[CountryHealthData]:
@@ -96,18 +135,203 @@ def validate_country_data(api_data: dict) -> Optional[CountryHealthData]:
     Validate country API response
     Returns: CountryHealthData object if valid, None if invalid
     """
+    start = time.perf_counter()
     try:
         validated = CountryHealthData(**api_data)
+        _record_validation('CountryHealthData', 'single', start, passed=1)
         return validated
-        
+    
     except ValueError as e:
-        print(f"ERROR: Validation failed for {api_data.get('country', 'unknown')}: {e}")
+        _record_validation('CountryHealthData', 'single', start, failed=1)
+        logger.error("Validation failed for %s: %s", api_data.get('country', 'unknown'), e)
         return None
-        
+    
     except Exception as e:
-        print(f"ERROR: Unexpected validation error: {e}")
+        _record_validation('CountryHealthData', 'single', start, failed=1)
+        logger.error("Unexpected validation error: %s", e)
         return None
 
+# Batch validation
+#
+# Column specs for the batch validators: (field, type, required, non_negative).
+# They mirror the models above; str columns hold the string's length.
+GLOBAL_COLUMNS = [
+    ('updated', int, True, False),
+    ('cases', int, True, True),
+    ('deaths', int, True, True),
+    ('recovered', int, True, True),
+    ('active', int, True, True),
+    ('critical', int, False, True),
+    ('todayCases', int, False, True),
+    ('todayDeaths', int, False, True),
+]
+
+COUNTRY_COLUMNS = [
+    ('updated', int, True, False),
+    ('country', str, True, False),
+    ('cases', int, True, True),
+    ('deaths', int, True, True),
+    ('recovered', int, True, True),
+    ('active', int, True, True),
+    ('critical', int, False, True),
+    ('todayCases', int, False, True),
+    ('todayDeaths', int, False, True),
+    ('population', int, False, True),
+    ('tests', int, False, True),
+    ('casesPerOneMillion', float, False, True),
+    ('deathsPerOneMillion', float, False, True),
+]
+
+# float64 holds every integer below this exactly, so column-wise comparisons
+# give the same answers as pydantic's Python int arithmetic
+EXACT_INT_LIMIT = 2 ** 51
+
+def _fast_path_row(payload: dict, columns: List[Tuple]) -> Optional[List[float]]:
+    """
+    Column values for a payload whose fields are all plain, in-range values
+    Returns: List of values (NaN for missing optional fields), or None if the
+             payload needs the model's coercion rules (bools, numeric strings,
+             floats in int fields, huge numbers, missing required fields...)
+    """
+    row = []
+    for name, kind, required, _ in columns:
+        value = payload.get(name)
+        if value is None:
+            if required:
+                return None
+            row.append(math.nan)
+        elif kind is str:
+            if type(value) is not str:
+                return None
+            row.append(len(value))
+        elif type(value) is int:
+            if abs(value) >= EXACT_INT_LIMIT:
+                return None
+            row.append(value)
+        elif kind is float and type(value) is float and math.isfinite(value) and abs(value) < EXACT_INT_LIMIT:
+            row.append(value)
+        else:
+            return None
+    return row
+
+def error_text(field: Optional[str], message: str) -> str:
+    """One validation error as the batch validators report it: '<field>: <pydantic message>'"""
+    return f'{field}: {message}' if field else message
+
+def first_error(e: Exception) -> str:
+    """The first error a model raised, formatted by error_text (or str(e) for non-validation errors)"""
+    if isinstance(e, ValidationError):
+        error = e.errors()[0]
+        return error_text('.'.join(str(part) for part in error['loc']), error['msg'])
+    return str(e)
+
+# pydantic 2 messages for the constraints declared with Field()
+NOT_NEGATIVE = 'Input should be greater than or equal to 0'
+TOO_SHORT = 'String should have at least 2 characters'
+VALUE_ERROR = 'Value error, '  # prefix pydantic 2 puts on a validator's ValueError
+
+# A check is (field, failing-rows mask, message); field None is a model-level
+# rule, which pydantic only runs once every field is valid. The message is
+# either fixed or built from the row's column values.
+def _global_checks(cols: Dict[str, np.ndarray]) -> List[Tuple]:
+    """Cross-field rules of GlobalHealthData"""
+    expected_active = cols['cases'] - cols['deaths'] - cols['recovered']
+    return [
+        ('deaths', cols['deaths'] > cols['cases'],
+         lambda row: VALUE_ERROR + _exceeds_cases('Deaths', int(row['deaths']), int(row['cases']))),
+        ('recovered', cols['recovered'] > cols['cases'],
+         lambda row: VALUE_ERROR + _exceeds_cases('Recovered', int(row['recovered']), int(row['cases']))),
+        # Allow 10% margin due to data reporting delays
+        (None, np.abs(cols['active'] - expected_active) > cols['cases'] * 0.1,
+         lambda row: VALUE_ERROR + _active_inconsistent(int(row['active']))),
+    ]
+
+def _country_checks(cols: Dict[str, np.ndarray]) -> List[Tuple]:
+    """Cross-field rules of CountryHealthData"""
+    cases_per_million = cols['casesPerOneMillion']
+    population = cols['population']
+    has_cases_per_million = ~np.isnan(cases_per_million)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        expected = (cols['cases'] / population) * 1000000
+    # CountryHealthData.today_cases_reasonable never fires (population is
+    # validated after todayCases, so it's never in `values`), so there's no
+    # todayCases rule here either
+    return [
+        ('country', cols['country'] < 2, TOO_SHORT),
+        # The model's check compares against population, so it rejects a
+        # cases-per-million figure without one
+        ('casesPerOneMillion', has_cases_per_million & np.isnan(population),
+         VALUE_ERROR + PER_MILLION_WITHOUT_POPULATION),
+        # Allow 5% margin for rounding
+        ('casesPerOneMillion',
+         has_cases_per_million & (population > 0) & (np.abs(cases_per_million - expected) > expected * 0.05),
+         lambda row: VALUE_ERROR + _per_million_mismatch(float(row['casesPerOneMillion']))),
+    ]
+
+def _validate_batch(payloads: List[dict], model, columns: List[Tuple],
+                    checks: Callable) -> Dict:
+    """
+    Validate payloads column-wise, falling back to the model for unusual rows
+    Either way a rejected row's error is the model's first error, as first_error formats it.
+    """
+    start = time.perf_counter()
+    rejected: Dict[int, str] = {}
+    fast_indices = []
+    fast_rows = []
+    for index, payload in enumerate(payloads):
+        row = _fast_path_row(payload, columns) if isinstance(payload, dict) else None
+        if row is not None:
+            fast_indices.append(index)
+            fast_rows.append(row)
+            continue
+        try:
+            model(**payload)
+        except Exception as e:
+            rejected[index] = first_error(e)
+    
+    if fast_rows:
+        matrix = np.array(fast_rows, dtype=np.float64)
+        names = [name for name, *_ in columns]
+        cols = {name: matrix[:, position] for position, name in enumerate(names)}
+        rules = [(name, cols[name] < 0, NOT_NEGATIVE) for name, _, _, non_negative in columns if non_negative]
+        # pydantic reports fields in declaration order, then model-level rules
+        rules = sorted(rules + checks(cols),
+                       key=lambda rule: names.index(rule[0]) if rule[0] else len(names))
+        failed = np.zeros(len(fast_rows), dtype=bool)
+        for field, mask, message in rules:
+            # Report the first rule each row breaks
+            for position in np.flatnonzero(mask & ~failed):
+                text = message(dict(zip(names, matrix[position]))) if callable(message) else message
+                rejected[fast_indices[position]] = error_text(field, text)
+            failed |= mask
+    
+    valid = [payload for index, payload in enumerate(payloads) if index not in rejected]
+    errors = [{
+        'index': index,
+        'country': payloads[index].get('country') if isinstance(payloads[index], dict) else None,
+        'error': rejected[index]
+    } for index in sorted(rejected)]
+    _record_validation(model.__name__, 'batch', start, passed=len(valid), failed=len(errors))
+    return {'valid': valid, 'errors': errors}
+
+def validate_global_batch(payloads: List[dict]) -> Dict:
+    """
+    Validate many global API responses at once, with the same accept/reject
+    decisions as GlobalHealthData
+    Returns: {'valid': payloads that passed (input order),
+              'errors': [{'index', 'country', 'error'}, ...]}
+    """
+    return _validate_batch(payloads, GlobalHealthData, GLOBAL_COLUMNS, _global_checks)
+
+def validate_country_batch(payloads: List[dict]) -> Dict:
+    """
+    Validate a whole fetch cycle of country API responses at once, with the
+    same accept/reject decisions as CountryHealthData
+    Returns: {'valid': payloads that passed (input order),
+              'errors': [{'index', 'country', 'error'}, ...]}
+    """
+    return _validate_batch(payloads, CountryHealthData, COUNTRY_COLUMNS, _country_checks)
+
 # Test it
 if __name__ == '__main__':
     # Test valid global data
@@ -9,9 +9,11 @@ def test_db():
     test_db_path = 'test_health.db'
     db = HealthDatabase(test_db_path)
     yield db
-    # Cleanup after test
-    if os.path.exists(test_db_path):
-        os.remove(test_db_path)
+    # Cleanup after test (WAL mode leaves -wal/-shm files next to the database)
+    db.close()
+    for path in (test_db_path, f'{test_db_path}-wal', f'{test_db_path}-shm'):
+        if os.path.exists(path):
+            os.remove(path)
 
 @pytest.fixture
 def sample_global_data():
@@ -1,6 +1,9 @@
 import pytest
+import json
+import time
 import responses
-from src.api_client import HealthDataAPIClient
+from src.api_client import HealthDataAPIClient, iter_json_array
+from src.rate_limiter import RateLimiter
 from config import BASE_URL
 
 @responses.activate
@@ -50,4 +53,133 @@ def test_fetch_country_data_not_found():
     client = HealthDataAPIClient()
     data = client.fetch_country_data('InvalidCountry')
     
-    assert data is None
\ No newline at end of file
+    assert data is None
+
+@responses.activate
+def test_fetch_all_countries_concurrent(sample_country_data):
+    """Test concurrent fetch keeps COUNTRIES order and drops failures"""
+    countries = ['USA', 'UK', 'Canada', 'Germany']
+    for country in countries:
+        if country == 'Canada':
+            responses.add(responses.GET, f"{BASE_URL}/countries/{country}",
+                          json={'message': 'Country not found'}, status=404)
+            continue
+        payload = sample_country_data.copy()
+        payload['country'] = country
+        responses.add(responses.GET, f"{BASE_URL}/countries/{country}",
+                      json=payload, status=200)
+    
+    client = HealthDataAPIClient(max_workers=4, requests_per_second=100)
+    client.countries = countries
+    data = client.fetch_all_countries()
+    
+    assert [d['country'] for d in data] == ['USA', 'UK', 'Germany']
+
+def test_rate_limiter_enforces_rate():
+    """Test token bucket blocks once the burst capacity is used up"""
+    limiter = RateLimiter(rate=20, capacity=1)
+    
+    start = time.monotonic()
+    for _ in range(5):
+        limiter.acquire()
+    elapsed = time.monotonic() - start
+    
+    # First token is free, the other four need 1/20s each
+    assert elapsed >= 0.15
+
+def test_iter_json_array_across_chunk_boundaries():
+    """Test streaming parser handles objects split over many chunks"""
+    payload = json.dumps([{'country': 'USA', 'cases': 1}, {'country': 'Café', 'cases': 2}])
+    raw = payload.encode('utf-8')
+    chunks = [raw[i:i + 3] for i in range(0, len(raw), 3)]
+    
+    rows = list(iter_json_array(chunks))
+    
+    assert rows == [{'country': 'USA', 'cases': 1}, {'country': 'Café', 'cases': 2}]
+
+def test_iter_json_array_truncated():
+    """Test streaming parser rejects a truncated array"""
+    with pytest.raises(ValueError):
+        list(iter_json_array([b'[{"country": "USA"}, {"coun']))
+
+@responses.activate
+def test_fetch_all_countries_bulk_filters(sample_country_data):
+    """Test bulk fetch keeps only configured countries, matching name or ISO code"""
+    rows = []
+    for name, iso2, iso3 in [('USA', 'US', 'USA'), ('France', 'FR', 'FRA'), ('UK', 'GB', 'GBR')]:
+        row = sample_country_data.copy()
+        row['country'] = name
+        row['countryInfo'] = {'iso2': iso2, 'iso3': iso3}
+        rows.append(row)
+    responses.add(responses.GET, f"{BASE_URL}/countries", json=rows, status=200)
+    
+    client = HealthDataAPIClient()
+    client.countries = ['usa', 'GBR']
+    data = client.fetch_all_countries_bulk()
+    
+    assert [d['country'] for d in data] == ['USA', 'UK']
+    
+    client.countries = ['usa', 'GBR', 'Atlantis']
+    assert client.missing_countries(data) == ['Atlantis']
+
+@responses.activate
+def test_fetch_all_countries_bulk_failure():
+    """Test bulk fetch returns None so callers can fall back"""
+    responses.add(responses.GET, f"{BASE_URL}/countries", json={'message': 'nope'}, status=404)
+    
+    client = HealthDataAPIClient()
+    assert client.fetch_all_countries_bulk() is None
+
+@responses.activate
+def test_requests_reuse_pooled_session(sample_global_data):
+    """Test retries go through the client's session with gzip/keep-alive headers"""
+    responses.add(responses.GET, f"{BASE_URL}/all", status=503)
+    responses.add(responses.GET, f"{BASE_URL}/all", json=sample_global_data, status=200)
+    
+    with HealthDataAPIClient(pool_maxsize=2) as client:
+        data = client.fetch_global_data()
+        adapter = client.session.get_adapter(BASE_URL)
+    
+    assert data['cases'] == 700000000
+    assert len(responses.calls) == 2
+    assert adapter._pool_maxsize == 2
+    headers = responses.calls[1].request.headers
+    assert 'gzip' in headers['Accept-Encoding']
+    assert headers['Connection'] == 'keep-alive'
+
+@responses.activate
+def test_conditional_request_not_modified(sample_global_data):
+    """Test a 304 reply returns the previous payload and sends validators"""
+    responses.add(responses.GET, f"{BASE_URL}/all", json=sample_global_data, status=200,
+                  headers={'ETag': 'W/"abc"', 'Last-Modified': 'Sat, 17 Oct 2026 10:00:00 GMT'})
+    responses.add(responses.GET, f"{BASE_URL}/all", status=304)
+    
+    client = HealthDataAPIClient()
+    first = client.fetch_global_data()
+    second = client.fetch_global_data()
+    
+    assert second == first
+    headers = responses.calls[1].request.headers
+    assert headers['If-None-Match'] == 'W/"abc"'
+    assert headers['If-Modified-Since'] == 'Sat, 17 Oct 2026 10:00:00 GMT'
+
+@responses.activate
+def test_retried_streamed_responses_are_closed(sample_country_data, monkeypatch):
+    """Test 429 and 5xx responses release their pooled connection before the retry"""
+    monkeypatch.setattr(time, 'sleep', lambda seconds: None)
+    responses.add(responses.GET, f"{BASE_URL}/countries", status=429)
+    responses.add(responses.GET, f"{BASE_URL}/countries", status=503)
+    responses.add(responses.GET, f"{BASE_URL}/countries", status=404)
+    client = HealthDataAPIClient()
+    seen = []
+    get = client.session.get
+    
+    def recording_get(*args, **kwargs):
+        seen.append(get(*args, **kwargs))
+        return seen[-1]
+    monkeypatch.setattr(client.session, 'get', recording_get)
+    
+    assert client.fetch_all_countries_bulk() is None
+    
+    assert [response.status_code for response in seen] == [429, 503, 404]
+    assert all(response.raw.closed for response in seen)
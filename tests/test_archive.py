@@ -0,0 +1,128 @@
+import numpy as np
+from datetime import datetime, timedelta
+from src.archive import ColumnarArchive, GLOBAL_PARTITION
+from src.backfill import flatten_timeline
+
+def _at(data, when, **overrides):
+    return dict(data, updated=int(when.timestamp() * 1000), **overrides)
+
+def _seed(test_db, sample_country_data, sample_global_data):
+    """Country and global snapshots in January, February and March 2024"""
+    times = [datetime(2024, 1, 15, 12), datetime(2024, 1, 20), datetime(2024, 2, 10, 8), datetime(2024, 3, 5)]
+    test_db.insert_country_stats_batch(
+        [_at(sample_country_data, when, todayCases=100 + i) for i, when in enumerate(times)] +
+        [_at(sample_country_data, when, country='UK', todayCases=i) for i, when in enumerate(times)])
+    for when in times:
+        test_db.insert_global_stats(_at(sample_global_data, when))
+    return times
+
+def test_compact_archives_closed_months(test_db, sample_country_data, sample_global_data, tmp_path):
+    """Test only months that ended before the grace period are archived"""
+    _seed(test_db, sample_country_data, sample_global_data)
+    archive = ColumnarArchive(str(tmp_path))
+    
+    written = archive.compact(test_db, now=datetime(2024, 3, 1, 12), grace_days=1)
+    
+    assert written == {'country_stats': ['2024-01'], 'global_stats': ['2024-01']}
+    assert archive.horizon('country_stats') == datetime(2024, 2, 1)
+    assert archive.manifest('country_stats', '2024-01')['partitions']['USA']['rows'] == 2
+    
+    # Later runs continue from the horizon
+    written = archive.compact(test_db, now=datetime(2024, 3, 10), grace_days=1)
+    assert written['country_stats'] == ['2024-02']
+    assert archive.partitions('country_stats') == ['UK', 'USA']
+    assert archive.partitions('global_stats') == [GLOBAL_PARTITION]
+
+def test_read_is_memory_mapped_and_column_selective(test_db, sample_country_data, sample_global_data, tmp_path):
+    """Test a single-month read returns narrow, read-only views of the column files"""
+    times = _seed(test_db, sample_country_data, sample_global_data)
+    archive = ColumnarArchive(str(tmp_path))
+    archive.compact(test_db, now=datetime(2024, 3, 10))
+    
+    january = archive.read('country_stats', 'USA', ['timestamp', 'today_cases'],
+                           start=datetime(2024, 1, 1), end=datetime(2024, 2, 1))
+    
+    assert set(january) == {'timestamp', 'today_cases'}
+    assert isinstance(january['today_cases'].base, np.memmap)
+    assert january['today_cases'].dtype == np.int8
+    assert january['today_cases'].tolist() == [100, 101]
+    assert january['timestamp'][0] == np.datetime64(times[0], 'ms')
+    
+    both = archive.read('country_stats', 'USA', ['today_cases'])
+    assert both['today_cases'].tolist() == [100, 101, 102]
+    assert len(archive.read('country_stats', 'France', ['today_cases'])['today_cases']) == 0
+
+def test_history_combines_archive_and_live_rows(test_db, sample_country_data, sample_global_data, tmp_path):
+    """Test history reads join archived months with SQLite rows past the horizon"""
+    times = _seed(test_db, sample_country_data, sample_global_data)
+    test_db.archive = ColumnarArchive(str(tmp_path))
+    test_db.archive.compact(test_db, now=datetime(2024, 3, 10))
+    
+    history = test_db.get_country_history(['USA', 'UK', 'France'], start=datetime(2024, 1, 16),
+                                          columns=['today_cases'])
+    
+    assert history['USA']['today_cases'].tolist() == [101, 102, 103]
+    assert history['UK']['timestamp'].tolist() == times[1:]
+    assert len(history['France']['timestamp']) == 0
+    assert test_db.get_global_history(end=datetime(2024, 2, 1))['total_cases'].tolist() == [700000000] * 2
+
+def test_prune_keeps_rows_not_yet_archived(test_db, sample_country_data, sample_global_data, tmp_path):
+    """Test retention only drops raw rows older than the archive horizon"""
+    _seed(test_db, sample_country_data, sample_global_data)
+    archive = ColumnarArchive(str(tmp_path))
+    archive.compact(test_db, now=datetime(2024, 2, 10))
+    
+    test_db.archive = archive
+    deleted = test_db.prune_raw_data(30, 400)
+    
+    assert deleted['country_stats'] == 4  # January for USA and UK
+    assert len(test_db.get_country_history(['USA'])['USA']['timestamp']) == 4
+
+def test_trend_reads_match_through_archive(test_db, sample_country_data, sample_global_data, tmp_path):
+    """Test raw trend reads return the same rows when their window is archived"""
+    older = _at(sample_country_data, datetime.fromtimestamp(sample_country_data['updated'] / 1000 - 3600))
+    test_db.insert_country_stats_batch([older, dict(sample_country_data, tests=None)])
+    test_db.insert_global_stats(sample_global_data)
+    expected_trend = test_db.get_country_trend('USA', days=1)
+    expected_global = test_db.get_recent_global_data(hours=24)
+    
+    # Archive everything up to and including the current month
+    test_db.archive = ColumnarArchive(str(tmp_path))
+    test_db.archive.compact(test_db, now=datetime.now() + timedelta(days=40), grace_days=0)
+    
+    assert test_db.get_country_trend('USA', days=1) == expected_trend
+    assert test_db.get_recent_global_data(hours=24) == expected_global
+
+def test_prune_waits_for_the_first_compaction(test_db, sample_country_data, tmp_path):
+    """Test nothing raw is pruned while the archive is enabled but still empty"""
+    test_db.insert_country_stats(_at(sample_country_data, datetime.now() - timedelta(days=90)))
+    test_db.archive = ColumnarArchive(str(tmp_path))
+    
+    assert test_db.prune_raw_data(30, 400)['country_stats'] == 0
+    assert len(test_db.get_country_history(['USA'])['USA']['timestamp']) == 1
+
+def test_backfill_below_the_horizon_survives_retention(test_db, sample_country_data, tmp_path):
+    """Test rows backfilled into archived months (and months before them) are archived before pruning"""
+    now = datetime.now()
+    test_db.insert_country_stats(_at(sample_country_data, now - timedelta(days=40)))
+    test_db.archive = ColumnarArchive(str(tmp_path))
+    test_db.archive.compact(test_db, now=now, grace_days=0)
+    assert test_db.archive.horizon('country_stats') is not None
+    
+    days = [now - timedelta(days=offset) for offset in range(365, 0, -1)]
+    cases = {day.strftime('%-m/%-d/%y'): 1000 + index for index, day in enumerate(days)}
+    test_db.insert_backfill_rows({'Brazil': flatten_timeline('Brazil', {'timeline': {'cases': cases}})}, 365)
+    
+    # What apply_retention does
+    written = test_db.archive.compact(test_db, now=now, grace_days=0)
+    deleted = test_db.prune_raw_data(30, 400)
+    
+    assert len(written['country_stats']) >= 12
+    assert deleted['country_stats'] > 300
+    history = test_db.get_country_history(['Brazil', 'USA'], columns=['total_cases'])
+    assert history['Brazil']['total_cases'].tolist() == list(cases.values())
+    assert len(history['USA']['timestamp']) == 1
+    
+    # Nothing new since: a rerun writes nothing and deletes nothing
+    assert test_db.archive.compact(test_db, now=now, grace_days=0)['country_stats'] == []
+    assert test_db.prune_raw_data(30, 400)['country_stats'] == 0
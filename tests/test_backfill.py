@@ -0,0 +1,56 @@
+import pytest
+import responses
+from datetime import datetime
+from src.api_client import HealthDataAPIClient
+from src.backfill import flatten_timeline, run_backfill
+from config import BASE_URL
+
+def _historical(country: str) -> dict:
+    return {
+        'country': country,
+        'timeline': {
+            'cases': {'1/1/23': 100, '1/2/23': 150, '1/3/23': 140},
+            'deaths': {'1/1/23': 1, '1/2/23': 2, '1/3/23': 2},
+            'recovered': {'1/1/23': 0, '1/2/23': 0, '1/3/23': 0}
+        }
+    }
+
+def test_flatten_timeline_builds_daily_rows():
+    """Test timelines become one row per day with day-over-day changes"""
+    rows = flatten_timeline('USA', _historical('USA'))
+    
+    assert [row[0] for row in rows] == [datetime(2023, 1, d, 23, 59, 59) for d in (1, 2, 3)]
+    assert [row[2] for row in rows] == [100, 150, 140]
+    # today_cases: unknown on the first day and after a downward revision
+    assert [row[7] for row in rows] == [None, 50, None]
+    assert rows[1][5] == 148  # active = cases - deaths - recovered
+
+@responses.activate
+def test_backfill_loads_rows_and_resumes(test_db):
+    """Test a backfill stores every country once and a re-run skips finished ones"""
+    for country in ('USA', 'UK'):
+        responses.add(responses.GET, f"{BASE_URL}/historical/{country}?lastdays=all",
+                      json=_historical(country), status=200)
+    responses.add(responses.GET, f"{BASE_URL}/historical/Atlantis?lastdays=all", status=404)
+    
+    client = HealthDataAPIClient(requests_per_second=1000)
+    result = run_backfill(client, test_db, ['USA', 'UK', 'Atlantis'], 'all', batch_rows=2)
+    
+    assert result['inserted'] == {'USA': 3, 'UK': 3}
+    assert result['failed'] == ['Atlantis']
+    assert len(test_db.get_country_rollup('USA', days=100000)) == 3
+    
+    again = run_backfill(client, test_db, ['USA', 'UK', 'Atlantis'], 'all')
+    assert sorted(again['skipped']) == ['UK', 'USA']
+    assert again['inserted'] == {}
+
+def test_backfill_skips_days_with_live_data(test_db, sample_country_data):
+    """Test historical rows never duplicate days that already have data"""
+    test_db.insert_country_stats(sample_country_data)
+    today = datetime.fromtimestamp(sample_country_data['updated'] / 1000)
+    historical = {'timeline': {'cases': {today.strftime('%-m/%-d/%y'): 1, '1/1/20': 1}}}
+    
+    inserted = test_db.insert_backfill_rows({'USA': flatten_timeline('USA', historical)}, 'all')
+    
+    assert inserted == {'USA': 1}
+    assert test_db.get_latest_country_stats(['USA'])[0]['total_cases'] == sample_country_data['cases']
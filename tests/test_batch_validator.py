@@ -0,0 +1,81 @@
+import pytest
+import math
+import random
+from src.validator import (GlobalHealthData, CountryHealthData, validate_global_batch,
+                           validate_country_batch, first_error)
+
+# Values that exercise pydantic's coercion rules and the batch validator's fallback
+ODD_VALUES = [None, -1, 0, 1, True, False, 5.0, 5.5, '12', '1.5', 'x', math.nan, math.inf,
+              2 ** 53 + 1, -(2 ** 60), [], {}]
+
+def _model_error(model, payload):
+    """The model's first error as the batch validators report it, or None if it accepts the payload"""
+    try:
+        model(**payload)
+        return None
+    except Exception as e:
+        return first_error(e)
+
+def _mutate(payload: dict, rng: random.Random) -> dict:
+    """Randomly perturb a valid payload into something near a validation boundary"""
+    payload = dict(payload)
+    for _ in range(rng.randint(0, 3)):
+        field = rng.choice(list(payload))
+        roll = rng.random()
+        if roll < 0.15:
+            del payload[field]
+        elif roll < 0.4:
+            payload[field] = rng.choice(ODD_VALUES)
+        elif isinstance(payload[field], (int, float)) and not isinstance(payload[field], bool):
+            # Scale towards the cross-field tolerances
+            payload[field] = type(payload[field])(payload[field] * rng.choice([0, 0.9, 0.95, 1.04, 1.06, 1.2, 2]))
+    return payload
+
+def _assert_parity(model, batch_validator, payloads):
+    result = batch_validator(payloads)
+    rejected = {error['index']: error['error'] for error in result['errors']}
+    for index, payload in enumerate(payloads):
+        # Same verdict and same message, whichever path checked the row
+        assert rejected.get(index) == _model_error(model, payload), payload
+    assert len(result['valid']) + len(result['errors']) == len(payloads)
+
+def test_country_batch_matches_model(sample_country_data):
+    """Test the batch validator accepts and rejects exactly what CountryHealthData does"""
+    rng = random.Random(13)
+    payloads = [sample_country_data] + [_mutate(sample_country_data, rng) for _ in range(3000)]
+    payloads += [
+        dict(sample_country_data, population=None),
+        dict(sample_country_data, population=0),
+        dict(sample_country_data, cases=0, casesPerOneMillion=0.0),
+        dict(sample_country_data, cases=0, casesPerOneMillion=0.5),
+        dict(sample_country_data, todayCases=10 ** 9),
+        dict(sample_country_data, country='A'),
+        dict(sample_country_data, country=123),
+    ]
+    _assert_parity(CountryHealthData, validate_country_batch, payloads)
+
+def test_global_batch_matches_model(sample_global_data):
+    """Test the batch validator accepts and rejects exactly what GlobalHealthData does"""
+    rng = random.Random(13)
+    payloads = [sample_global_data] + [_mutate(sample_global_data, rng) for _ in range(3000)]
+    _assert_parity(GlobalHealthData, validate_global_batch, payloads)
+
+def test_country_batch_reports_errors_per_row(sample_country_data):
+    """Test invalid rows come back with their index and country"""
+    bad = dict(sample_country_data, country='UK', casesPerOneMillion=1.0)
+    result = validate_country_batch([sample_country_data, bad, 'not a payload'])
+    
+    assert result['valid'] == [sample_country_data]
+    assert [(e['index'], e['country']) for e in result['errors']] == [(1, 'UK'), (2, None)]
+    assert 'casesPerOneMillion' in result['errors'][0]['error']
+
+def test_batch_error_wording_matches_fallback(sample_global_data):
+    """Test a rule reports the same pydantic 2 message on the fast path and the per-row fallback"""
+    bad = dict(sample_global_data, deaths=sample_global_data['cases'] + 1)
+    # A numeric string isn't taken by the fast path, so this row goes through the model
+    coerced = dict(bad, critical=str(bad['critical']))
+    result = validate_global_batch([bad, coerced])
+    
+    messages = [error['error'] for error in result['errors']]
+    assert messages[0] == messages[1]
+    assert messages[0].startswith('deaths: Value error, Deaths (')
@@ -0,0 +1,51 @@
+import time
+from datetime import datetime, timedelta
+from benchmarks.synthetic import SyntheticWorld, floor_time
+from benchmarks.stub_server import DiseaseShStub
+from src.api_client import HealthDataAPIClient
+from src.backfill import flatten_timeline
+from src.validator import validate_country_batch, validate_global_data
+
+def test_synthetic_payloads_pass_validation():
+    """The benchmark data has to survive the validators, or ingest timings mean nothing"""
+    world = SyntheticWorld(countries=20, seed=1)
+    for hours_ago in range(0, 24 * 30, 5):
+        when = floor_time(datetime.now() - timedelta(hours=hours_ago))
+        assert validate_global_data(world.global_payload(when)) is not None
+        assert validate_country_batch(world.country_payloads(when))['errors'] == []
+
+def test_stub_serves_client_requests():
+    world = SyntheticWorld(countries=10, seed=1)
+    with DiseaseShStub(world) as stub, HealthDataAPIClient(requests_per_second=1000) as client:
+        client.base_url = stub.url
+        
+        first = client.fetch_global_data()
+        assert client.fetch_global_data() == first  # clock only moves on advance()
+        stub.advance()
+        assert client.fetch_global_data()['updated'] > first['updated']
+        
+        assert [row['country'] for row in client.fetch_all_countries_bulk()] == client.countries
+        assert client.fetch_country_data('gbr')['country'] == 'UK'
+        assert client.fetch_country_data('Atlantis') is None
+        
+        historical = client.fetch_historical_data('USA', days=30)
+        assert len(flatten_timeline('USA', historical)) == 30
+        assert stub.requests['/all'] == 3
+
+def test_stub_injects_errors():
+    with DiseaseShStub(SyntheticWorld(countries=5), error_rate=1.0) as stub, \
+            HealthDataAPIClient(max_retries=1) as client:
+        client.base_url = stub.url
+        assert client.fetch_global_data() is None
+        assert stub.errors['/all'] == 1
+
+def test_stub_keep_alive_requests_follow_latency():
+    """Requests reusing a connection take about `latency`, with no ~40 ms Nagle/delayed-ACK stall"""
+    with DiseaseShStub(SyntheticWorld(countries=5), latency=0.01) as stub, \
+            HealthDataAPIClient(requests_per_second=1000) as client:
+        client.base_url = stub.url
+        client.fetch_global_data()  # opens the connection
+        start = time.perf_counter()
+        for _ in range(10):
+            client.fetch_global_data()
+        assert (time.perf_counter() - start) / 10 < 0.03
@@ -0,0 +1,85 @@
+import pytest
+import time
+from src.cache import TTLCache, CachedHealthDatabase
+
+def test_ttl_cache_expires_entries():
+    """Test entries are dropped once their TTL has passed"""
+    cache = TTLCache(max_entries=10)
+    cache.set('short', 1, ttl=0.05)
+    cache.set('long', 2, ttl=60)
+    
+    assert cache.get('short') == 1
+    time.sleep(0.1)
+    assert cache.get('short') is None
+    assert cache.get('long') == 2
+
+def test_ttl_cache_evicts_least_recently_used():
+    """Test the cache stays bounded, evicting the least recently used entry"""
+    cache = TTLCache(max_entries=2)
+    cache.set('a', 1, ttl=60)
+    cache.set('b', 2, ttl=60)
+    cache.get('a')
+    cache.set('c', 3, ttl=60)
+    
+    assert len(cache) == 2
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+
+def test_cached_reads_skip_database(test_db, sample_global_data):
+    """Test repeated reads are served from the cache"""
+    test_db.insert_global_stats(sample_global_data)
+    cached = CachedHealthDatabase(test_db, ttls={'get_recent_global_data': 60},
+                                  generation_check_interval=60)
+    
+    first = cached.get_recent_global_data(hours=24)
+    test_db.insert_global_stats(dict(sample_global_data, todayCases=1))
+    second = cached.get_recent_global_data(hours=24)
+    
+    assert second is first
+    assert len(second) == 1
+    assert cached.cache.hits == 1
+
+def test_generation_bump_invalidates_cache(test_db, sample_global_data):
+    """Test a commit from the collector invalidates cached results"""
+    test_db.insert_global_stats(sample_global_data)
+    cached = CachedHealthDatabase(test_db, ttls={'get_recent_global_data': 60},
+                                  generation_check_interval=0)
+    
+    assert len(cached.get_recent_global_data(hours=24)) == 1
+    test_db.insert_global_stats(dict(sample_global_data, todayCases=1))
+    generation = test_db.bump_data_generation()
+    
+    assert len(cached.get_recent_global_data(hours=24)) == 2
+    assert cached.generation == generation
+
+def test_uncached_methods_pass_through(test_db):
+    """Test methods without a TTL go straight to the database"""
+    cached = CachedHealthDatabase(test_db, ttls={})
+    
+    assert cached.get_schema_version() == test_db.get_schema_version()
+    assert cached.db_path == test_db.db_path
+
+def test_error_fingerprints_are_cached_until_new_data(test_db):
+    """Test /health's error list is cached by default and refreshed by a generation bump"""
+    test_db.log_error('API_FETCH_FAILED', 'Could not retrieve global data')
+    cached = CachedHealthDatabase(test_db, generation_check_interval=0)
+    
+    first = cached.get_error_fingerprints(hours=1, limit=10)
+    test_db.log_error('API_FETCH_FAILED', 'Could not retrieve global data')
+    assert cached.get_error_fingerprints(hours=1, limit=10) is first
+    
+    test_db.bump_data_generation()
+    assert cached.get_error_fingerprints(hours=1, limit=10)[0]['occurrences'] == 2
+
+def test_list_arguments_are_cached(test_db, sample_country_data):
+    """Test methods taking a list of countries can be cached, keyed by the list's contents"""
+    test_db.insert_country_stats(sample_country_data)
+    cached = CachedHealthDatabase(test_db, ttls={'get_latest_country_stats': 60, 'detect_case_surges': 60},
+                                  generation_check_interval=60)
+    
+    first = cached.get_latest_country_stats(['USA'])
+    assert cached.get_latest_country_stats(['USA']) is first
+    assert cached.get_latest_country_stats(countries=['USA', 'UK']) is not first
+    assert cached.detect_case_surges(['USA']) == test_db.detect_case_surges(['USA'])
+    assert cached.cache.hits == 1
@@ -0,0 +1,37 @@
+import pytest
+from src.change_detection import ChangeTracker, GLOBAL_ENTITY, country_entity
+
+def test_new_entity_is_changed(sample_global_data):
+    """Test the first payload for an entity is always new"""
+    tracker = ChangeTracker()
+    assert tracker.is_changed(GLOBAL_ENTITY, sample_global_data) is True
+
+def test_identical_payload_is_unchanged(sample_global_data):
+    """Test a repeated payload is skipped once processed"""
+    tracker = ChangeTracker()
+    tracker.mark_processed(GLOBAL_ENTITY, sample_global_data)
+    
+    assert tracker.is_changed(GLOBAL_ENTITY, dict(sample_global_data)) is False
+
+def test_newer_or_corrected_payload_is_changed(sample_country_data):
+    """Test a newer snapshot or a correction with the same timestamp is stored"""
+    tracker = ChangeTracker()
+    entity = country_entity('USA')
+    tracker.mark_processed(entity, sample_country_data)
+    
+    newer = dict(sample_country_data, updated=sample_country_data['updated'] + 600000)
+    corrected = dict(sample_country_data, todayCases=49000)
+    
+    assert tracker.is_changed(entity, newer) is True
+    assert tracker.is_changed(entity, corrected) is True
+
+def test_seeded_watermark_skips_old_snapshots(sample_country_data):
+    """Test watermarks loaded after a restart skip already-stored snapshots"""
+    tracker = ChangeTracker()
+    tracker.seed(None, {'USA': sample_country_data['updated']})
+    entity = country_entity('USA')
+    
+    older = dict(sample_country_data, updated=sample_country_data['updated'] - 1)
+    
+    assert tracker.is_changed(entity, sample_country_data) is False
+    assert tracker.is_changed(entity, older) is False
@@ -1,5 +1,7 @@
+import json
 import pytest
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from src.database import naive_local
 
 def test_insert_global_stats(test_db, sample_global_data):
     """Test inserting global statistics"""
@@ -36,4 +38,384 @@ def test_data_quality_metrics(test_db, sample_global_data):
     
     metrics = test_db.get_data_quality_metrics(hours=1)
     assert metrics['actual_data_points'] == 1
-    assert metrics['success_rate_percent'] > 0
\ No newline at end of file
+    assert metrics['success_rate_percent'] > 0
+
+def test_get_latest_updated(test_db, sample_global_data, sample_country_data):
+    """Test stored snapshot times round-trip back to API milliseconds"""
+    assert test_db.get_latest_updated() == {'global': None, 'countries': {}}
+    
+    test_db.insert_global_stats(sample_global_data)
+    test_db.insert_country_stats(sample_country_data)
+    
+    latest = test_db.get_latest_updated()
+    assert latest['global'] == sample_global_data['updated']
+    assert latest['countries'] == {'USA': sample_country_data['updated']}
+
+def test_insert_country_stats_batch(test_db, sample_country_data):
+    """Test a whole cycle is written in one call"""
+    rows = []
+    for country in ['USA', 'UK', 'Canada']:
+        row = sample_country_data.copy()
+        row['country'] = country
+        rows.append(row)
+    
+    result = test_db.insert_country_stats_batch(rows)
+    
+    assert result == {'inserted': 3, 'errors': []}
+    assert len(test_db.get_country_trend('UK', days=1)) == 1
+
+def test_insert_country_stats_batch_reports_bad_rows(test_db, sample_country_data):
+    """Test bad rows are reported per row without discarding the batch"""
+    missing_field = sample_country_data.copy()
+    del missing_field['cases']
+    null_country = dict(sample_country_data, country=None)  # violates NOT NULL
+    good = dict(sample_country_data, country='UK')
+    
+    result = test_db.insert_country_stats_batch([sample_country_data, missing_field, null_country, good])
+    
+    assert result['inserted'] == 2
+    assert [error['index'] for error in result['errors']] == [1, 2]
+    assert len(test_db.get_country_trend('USA', days=1)) == 1
+    assert len(test_db.get_country_trend('UK', days=1)) == 1
+
+def test_database_uses_wal_and_pragmas(test_db):
+    """Test pooled connections run in WAL mode with the configured PRAGMAs"""
+    with test_db.pool.reader() as conn:
+        assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        assert conn.execute('PRAGMA synchronous').fetchone()[0] == 1  # NORMAL
+        assert conn.execute('PRAGMA cache_size').fetchone()[0] < 0
+
+def test_readers_not_blocked_by_open_write(test_db, sample_global_data):
+    """Test readers see the last committed data while a write is in progress"""
+    test_db.insert_global_stats(sample_global_data)
+    
+    with test_db.pool.writer() as conn:
+        conn.execute('DELETE FROM global_stats')
+        # Uncommitted delete is invisible to readers, and they don't wait for it
+        assert len(test_db.get_recent_global_data(hours=24)) == 1
+        conn.rollback()
+    
+    assert len(test_db.get_recent_global_data(hours=24)) == 1
+
+def test_reader_pool_is_bounded(test_db):
+    """Test the pool reuses reader connections instead of opening new ones"""
+    for _ in range(10):
+        test_db.get_recent_global_data(hours=1)
+    
+    assert len(test_db.pool._all_readers) == 1
+
+def test_schema_migrations_applied(test_db):
+    """Test create_tables brings the schema to the latest version idempotently"""
+    from src.database import SCHEMA_MIGRATIONS
+    latest = SCHEMA_MIGRATIONS[-1][0]
+    
+    assert test_db.get_schema_version() == latest
+    test_db.create_tables()
+    assert test_db.get_schema_version() == latest
+
+def test_hot_queries_use_indexes(test_db):
+    """Test per-country and time-range queries avoid full table scans"""
+    with test_db.pool.reader() as conn:
+        surge_plan = conn.execute('''
+            EXPLAIN QUERY PLAN
+            SELECT today_cases, timestamp FROM country_stats
+            WHERE country = 'USA' ORDER BY timestamp DESC LIMIT 2
+        ''').fetchall()
+        recent_plan = conn.execute('''
+            EXPLAIN QUERY PLAN
+            SELECT COUNT(*) FROM error_log
+            WHERE timestamp > datetime('now', 'localtime', '-1 hours')
+        ''').fetchall()
+    
+    assert 'COVERING INDEX idx_country_stats_country_timestamp' in surge_plan[0][3]
+    assert 'idx_error_log_timestamp' in recent_plan[0][3]
+
+def test_detect_case_surges_matches_per_country(test_db, sample_country_data):
+    """Test the batch surge engine returns exactly what detect_case_surge does"""
+    series = {
+        'USA': [1000, 1200],      # surge
+        'UK': [1000, 1010],       # below threshold
+        'Canada': [0, 500],       # no previous cases
+        'Germany': [700],         # insufficient data
+        'Japan': [None, 300, 200, 260],
+    }
+    base = sample_country_data['updated'] - 3600 * 1000
+    rows = []
+    for country, values in series.items():
+        for i, today in enumerate(values):
+            rows.append(dict(sample_country_data, country=country, todayCases=today,
+                             updated=base + i * 600 * 1000))
+    test_db.insert_country_stats_batch(rows)
+    countries = list(series) + ['France']
+    
+    batch = test_db.detect_case_surges(countries, 5.0)
+    
+    for country in countries:
+        assert batch[country] == test_db.detect_case_surge(country, 5.0)
+    assert batch['USA']['surge_detected'] is True
+    assert batch['France']['message'] == 'Insufficient data'
+
+def test_detect_case_surges_outside_lookback(test_db, sample_country_data):
+    """Test countries that report rarely still compare against older points"""
+    old = dict(sample_country_data, todayCases=1000,
+               updated=sample_country_data['updated'] - 30 * 24 * 3600 * 1000)
+    test_db.insert_country_stats_batch([old, dict(sample_country_data, todayCases=2000)])
+    
+    batch = test_db.detect_case_surges(['USA'], 5.0)
+    
+    assert batch['USA'] == test_db.detect_case_surge('USA', 5.0)
+    assert batch['USA']['percent_change'] == 100.0
+
+def test_save_and_read_alerts(test_db):
+    """Test alerts and detector state are persisted for /alerts and restarts"""
+    alert = {
+        'country': 'USA',
+        'alert_type': 'case_surge',
+        'severity': 'warning',
+        'data_timestamp': datetime.now(),
+        'details': {'percent_change': 20.0}
+    }
+    test_db.save_alerts([alert], {'USA': {'last_today_cases': 1200}})
+    test_db.save_alerts([dict(alert, details={'percent_change': 30.0})],
+                        {'USA': {'last_today_cases': 1500}})
+    
+    alerts = test_db.get_recent_alerts(hours=1)
+    
+    # Only the latest alert per country and type is reported
+    assert len(alerts) == 1
+    assert alerts[0]['details'] == {'percent_change': 30.0}
+    assert test_db.load_detector_state() == {'USA': {'last_today_cases': 1500}}
+
+def _country_series(sample_country_data, points, step_minutes=10):
+    """Country payloads spaced step_minutes apart, ending at the sample's timestamp"""
+    rows = []
+    for i, (total, today) in enumerate(points):
+        offset = (len(points) - 1 - i) * step_minutes * 60 * 1000
+        rows.append(dict(sample_country_data, cases=total, todayCases=today,
+                         updated=sample_country_data['updated'] - offset))
+    return rows
+
+def test_rollups_maintained_on_insert(test_db, sample_country_data):
+    """Test hourly/daily rollups hold last, min, max and delta, even for out-of-order rows"""
+    rows = _country_series(sample_country_data, [(1000, 10), (1100, 30), (1250, 20)], step_minutes=1)
+    # Insert the newest row first to check first/last are ordered by time, not arrival
+    test_db.insert_country_stats(rows[2])
+    test_db.insert_country_stats_batch(rows[:2])
+    
+    daily = test_db.get_country_rollup('USA', days=1, granularity='daily')
+    
+    assert len(daily) == 1
+    assert daily[0]['total_cases'] == 1250
+    assert daily[0]['cases_delta'] == 250
+    assert daily[0]['today_cases'] == 20
+    assert (daily[0]['min_today_cases'], daily[0]['max_today_cases']) == (10, 30)
+    assert daily[0]['sample_count'] == 3
+
+def test_long_trend_reads_rollups(test_db, sample_country_data):
+    """Test long windows return one point per bucket instead of every raw row"""
+    rows = _country_series(sample_country_data, [(1000 + i, i) for i in range(12)])
+    test_db.insert_country_stats_batch(rows)
+    
+    raw = test_db.get_country_trend('USA', days=1)
+    hourly = test_db.get_country_trend('USA', days=7)
+    
+    assert len(raw) == 12
+    assert 1 <= len(hourly) <= 3  # two hours of data span at most three hour buckets
+    assert hourly[0] == raw[0]  # newest bucket carries the newest raw values
+
+def test_rollup_migration_backfills_existing_rows(test_db, sample_country_data):
+    """Test upgrading a database aggregates rows stored before rollups existed"""
+    test_db.insert_country_stats_batch(_country_series(sample_country_data, [(1000, 5), (1200, 9)]))
+    with test_db.pool.writer() as conn:
+        conn.execute('DROP TABLE country_stats_hourly')
+        conn.execute('DROP TABLE country_stats_daily')
+        conn.execute('PRAGMA user_version = 2')
+    
+    test_db.create_tables()
+    
+    daily = test_db.get_country_rollup('USA', days=1)
+    assert daily[0]['total_cases'] == 1200
+    assert daily[0]['sample_count'] == 2
+
+def test_prune_raw_data(test_db, sample_country_data):
+    """Test retention removes only raw rows older than the horizon"""
+    old = dict(sample_country_data, updated=sample_country_data['updated'] - 40 * 24 * 3600 * 1000)
+    test_db.insert_country_stats_batch([old, sample_country_data])
+    
+    deleted = test_db.prune_raw_data(raw_retention_days=30, hourly_retention_days=400)
+    
+    assert deleted['country_stats'] == 1
+    assert len(test_db.get_country_trend('USA', days=1)) == 1
+    assert len(test_db.get_country_rollup('USA', days=60)) == 2
+
+def test_top_countries_with_different_report_times(test_db, sample_country_data):
+    """Test top-N includes countries whose latest snapshots differ in time"""
+    usa = dict(sample_country_data, todayCases=500)
+    uk = dict(sample_country_data, country='UK', todayCases=900, updated=sample_country_data['updated'] - 1)
+    older_usa = dict(usa, todayCases=99999, updated=usa['updated'] - 3600 * 1000)
+    test_db.insert_country_stats_batch([usa, uk])
+    test_db.insert_country_stats(older_usa)  # late arrival must not replace the newer snapshot
+    
+    top = test_db.get_top_countries_by_today_cases(limit=5)
+    
+    assert [(c['country'], c['today_cases']) for c in top] == [('UK', 900), ('USA', 500)]
+    latest = test_db.get_latest_country_stats(['USA'])
+    assert len(latest) == 1
+    assert latest[0]['today_cases'] == 500
+
+def test_data_quality_detects_global_gaps(test_db, sample_global_data):
+    """Test a skipped poll shows up as a missing data point"""
+    ten_minutes = 10 * 60 * 1000
+    now = sample_global_data['updated']
+    for updated in (now - 4 * ten_minutes, now - 3 * ten_minutes, now - ten_minutes, now):
+        test_db.insert_global_stats(dict(sample_global_data, updated=updated))
+    
+    metrics = test_db.get_data_quality_metrics(hours=1)
+    assert metrics['actual_data_points'] == 4
+    assert metrics['missing_data_points'] == 1
+    assert metrics['gaps']['missed_intervals'] == 1
+    assert metrics['success_rate_percent'] == 80.0
+
+def test_quality_counters_by_source_and_country(test_db, sample_country_data):
+    """Test failures are counted per event, source and country as they're logged"""
+    test_db.insert_country_stats_batch([sample_country_data, dict(sample_country_data, country='UK')])
+    test_db.log_error('API_FETCH_FAILED', 'Could not retrieve global data')
+    test_db.log_error('API_FETCH_FAILED', 'Could not retrieve data for UK', country='UK')
+    test_db.log_errors_batch([('VALIDATION_FAILED', 'Country data invalid', '{}', 'Canada'),
+                              ('DATABASE_ERROR', 'Disk full', None)])
+    
+    metrics = test_db.get_data_quality_metrics(hours=1)
+    assert metrics['error_count'] == 4
+    assert metrics['failures']['fetch_failed'] == {'global': 1, 'country': 1}
+    assert metrics['failures']['validation_failed'] == {'country': 1}
+    assert metrics['failures']['error'] == {'global': 1}
+    
+    quality = test_db.get_country_quality(hours=1)
+    assert quality == {
+        'USA': {'inserted': 1},
+        'UK': {'inserted': 1, 'fetch_failed': 1},
+        'Canada': {'validation_failed': 1},
+    }
+
+def test_quality_counters_count_storage_failures(test_db, sample_country_data):
+    """Test rows rejected by the database are counted against their country"""
+    test_db.insert_country_stats_batch([sample_country_data, dict(sample_country_data, country=None)])
+    
+    assert test_db.get_country_quality(hours=1) == {'USA': {'inserted': 1}, '': {'storage_failed': 1}}
+
+def test_quality_migration_seeds_existing_history(test_db, sample_global_data, sample_country_data):
+    """Test upgrading a database derives counters from the rows already stored"""
+    ten_minutes = 10 * 60 * 1000
+    now = sample_global_data['updated']
+    for updated in (now - 3 * ten_minutes, now):
+        test_db.insert_global_stats(dict(sample_global_data, updated=updated))
+    test_db.insert_country_stats(sample_country_data)
+    test_db.log_error('VALIDATION_FAILED', 'Global data invalid')
+    with test_db.pool.writer() as conn:
+        # Before fingerprinting, errors went to error_log
+        conn.execute('INSERT INTO error_log (error_type, error_message) VALUES (?, ?)',
+                     ('VALIDATION_FAILED', 'Global data invalid'))
+    before = test_db.get_data_quality_metrics(hours=1)
+    with test_db.pool.writer() as conn:
+        conn.execute('DROP TABLE quality_counters')
+        conn.execute('PRAGMA user_version = 7')
+    
+    test_db.create_tables()
+    
+    after = test_db.get_data_quality_metrics(hours=1)
+    for key in ('actual_data_points', 'missing_data_points', 'error_count', 'failures'):
+        assert after[key] == before[key]
+    assert test_db.get_country_quality(hours=1) == {'USA': {'inserted': 1}}
+
+def test_repeated_errors_share_a_fingerprint(test_db, sample_country_data):
+    """Test repeats of an error are counted on one fingerprint with one stored payload"""
+    payload = json.dumps(sample_country_data)
+    test_db.log_errors_batch([('VALIDATION_FAILED', 'Country data invalid', payload, 'USA'),
+                              ('VALIDATION_FAILED', 'Country data invalid',
+                               json.dumps(dict(sample_country_data, country='UK', cases=5)), 'UK')])
+    test_db.log_error('VALIDATION_FAILED', 'Country data invalid',
+                      json.dumps(dict(sample_country_data, updated=1)), country='USA')
+    # A schema change is a different error
+    test_db.log_error('VALIDATION_FAILED', 'Country data invalid',
+                      json.dumps(dict(sample_country_data, todayCases='n/a')), country='USA')
+    test_db.log_error('API_FETCH_FAILED', 'Request failed after 3 retries')
+    test_db.log_error('API_FETCH_FAILED', 'Request failed after 5 retries')
+    
+    errors = {(error['error_type'], error['occurrences']): error for error in test_db.get_error_fingerprints()}
+    assert set(errors) == {('VALIDATION_FAILED', 3), ('VALIDATION_FAILED', 1), ('API_FETCH_FAILED', 2)}
+    assert errors[('API_FETCH_FAILED', 2)]['message'] == 'Request failed after <n> retries'
+    assert errors[('API_FETCH_FAILED', 2)]['last_message'] == 'Request failed after 5 retries'
+    assert errors[('API_FETCH_FAILED', 2)]['sample_payload'] is None
+    assert test_db.get_error_payload(errors[('VALIDATION_FAILED', 3)]['sample_payload']) == payload
+    with test_db.pool.reader() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM error_payloads').fetchone()[0] == 2
+        assert conn.execute('SELECT COUNT(*) FROM error_log').fetchone()[0] == 0
+    assert test_db.get_data_quality_metrics(hours=1)['error_count'] == 6
+
+def test_error_fingerprint_migration_folds_error_log(test_db):
+    """Test upgrading a database turns existing error_log rows into fingerprints"""
+    with test_db.pool.writer() as conn:
+        conn.executemany('INSERT INTO error_log (error_type, error_message, raw_response) VALUES (?, ?, ?)',
+                         [('VALIDATION_FAILED', 'Country data invalid', "{'country': 'USA'}")] * 3 +
+                         [('API_FETCH_FAILED', 'Could not retrieve global data', None)])
+        conn.execute('DROP TABLE error_fingerprints')
+        conn.execute('DROP TABLE error_payloads')
+        conn.execute('PRAGMA user_version = 8')
+    
+    test_db.create_tables()
+    
+    counts = {error['error_type']: error['occurrences'] for error in test_db.get_error_fingerprints()}
+    assert counts == {'VALIDATION_FAILED': 3, 'API_FETCH_FAILED': 1}
+
+def test_iter_country_history_buckets(test_db, sample_country_data):
+    """Test history is downsampled to the last values per bucket, from raw rows and rollups"""
+    base = datetime(2024, 1, 1, 9)  # a Monday
+    rows = []
+    for country, offset in (('USA', 0), ('UK', 1000)):
+        for minutes in range(0, 48 * 60, 10):
+            when = base + timedelta(minutes=minutes)
+            rows.append(dict(sample_country_data, country=country, updated=int(when.timestamp() * 1000),
+                             cases=offset + minutes, todayCases=minutes % 60))
+    test_db.insert_country_stats_batch(rows)
+    end = base + timedelta(days=2)
+    
+    ten_minutes = list(test_db.iter_country_history(['USA'], ['total_cases'], base, base + timedelta(minutes=30),
+                                                    bucket='10m'))
+    assert [(p['bucket'], p['total_cases'], p['samples']) for p in ten_minutes] == [
+        ('2024-01-01 09:00:00', 0, 1), ('2024-01-01 09:10:00', 10, 1), ('2024-01-01 09:20:00', 20, 1)]
+    
+    # Small windows give the same points as one large one
+    hourly = list(test_db.iter_country_history(['UK', 'USA'], ['total_cases', 'today_cases'], base, end, '1h'))
+    assert hourly == list(test_db.iter_country_history(['UK', 'USA'], ['total_cases', 'today_cases'], base, end,
+                                                       '1h', window_buckets=7))
+    assert len(hourly) == 96 and hourly[0]['country'] == 'UK' and hourly[-1]['country'] == 'USA'
+    assert hourly[0] == {'country': 'UK', 'bucket': '2024-01-01 09:00:00', 'samples': 6,
+                         'total_cases': 1050, 'today_cases': 50}
+    assert [p['total_cases'] for p in test_db.iter_country_history(['USA'], ['total_cases'], base, end,
+                                                                   bucket='10m', window_buckets=5)][5::6] == \
+        [p['total_cases'] for p in hourly[48:]]
+    
+    daily = list(test_db.iter_country_history(['USA'], ['total_cases'], base, end, '1d'))
+    assert [(p['bucket'], p['samples'], p['total_cases']) for p in daily] == [
+        ('2024-01-01 00:00:00', 90, 890), ('2024-01-02 00:00:00', 144, 2330), ('2024-01-03 00:00:00', 54, 2870)]
+    weekly = list(test_db.iter_country_history(['USA'], ['total_cases'], base, end, '1w'))
+    assert weekly == [{'country': 'USA', 'bucket': '2024-01-01 00:00:00', 'samples': 288, 'total_cases': 2870}]
+
+def test_iter_country_history_accepts_utc_and_offset_times(test_db, sample_country_data):
+    """Test aware start/end (as /history parses '...Z' or '+02:00') are read as local time, and bad ranges fail early"""
+    base = datetime(2024, 1, 1, 9)
+    test_db.insert_country_stats_batch([
+        dict(sample_country_data, updated=int((base + timedelta(hours=hour)).timestamp() * 1000), cases=hour)
+        for hour in range(4)])
+    naive = list(test_db.iter_country_history(['USA'], ['total_cases'], base, base + timedelta(hours=4)))
+    
+    utc_start = datetime.fromisoformat(base.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'))
+    offset_end = (base + timedelta(hours=4)).astimezone(timezone(timedelta(hours=2)))
+    assert naive_local(utc_start) == base
+    assert list(test_db.iter_country_history(['USA'], ['total_cases'], utc_start, offset_end)) == naive
+    assert list(test_db.iter_country_history(['USA'], ['total_cases'], base, offset_end)) == naive
+    
+    with pytest.raises(ValueError):
+        test_db.iter_country_history(['USA'], ['total_cases'], offset_end, base)
+    with pytest.raises(ValueError):
+        test_db.iter_country_history(['USA'], ['total_cases'], base, bucket='5m')
@@ -0,0 +1,32 @@
+import json
+from src.error_fingerprints import (fingerprint_error, normalize_message, payload_schema_hash,
+                                    compress_payload, decompress_payload)
+
+def test_normalize_message_drops_literals():
+    """Test numbers and quoted values don't split otherwise identical messages"""
+    assert normalize_message("Field 'todayCases' got -12.5  (limit 100)") == 'Field <str> got <n> (limit <n>)'
+    assert normalize_message('Could not retrieve data for UK') == 'Could not retrieve data for UK'
+
+def test_schema_hash_ignores_values_but_not_shape(sample_country_data):
+    """Test payloads with the same keys and types share a schema hash"""
+    schema = payload_schema_hash(json.dumps(sample_country_data))
+    
+    assert payload_schema_hash(json.dumps(dict(sample_country_data, cases=1.5, country='UK'))) == schema
+    assert payload_schema_hash(json.dumps(dict(sample_country_data, cases=None))) != schema
+    assert payload_schema_hash(json.dumps({'extra': 1, **sample_country_data})) != schema
+    assert payload_schema_hash('not json') == payload_schema_hash('<html>also not json</html>')
+    assert payload_schema_hash(None) is None
+
+def test_fingerprint_and_payload_round_trip(sample_global_data):
+    """Test the fingerprint combines type, message and schema, and payloads decompress intact"""
+    raw = json.dumps(sample_global_data)
+    first = fingerprint_error('VALIDATION_FAILED', 'Global data invalid', raw)
+    
+    assert first['fingerprint'] == fingerprint_error('VALIDATION_FAILED', 'Global data invalid',
+                                                     json.dumps(dict(sample_global_data, cases=1)))['fingerprint']
+    assert first['fingerprint'] != fingerprint_error('API_FETCH_FAILED', 'Global data invalid', raw)['fingerprint']
+    assert first['fingerprint'] != fingerprint_error('VALIDATION_FAILED', 'Global data invalid')['fingerprint']
+    
+    size, compressed = compress_payload(raw)
+    assert size == len(raw.encode('utf-8'))
+    assert decompress_payload(compressed) == raw
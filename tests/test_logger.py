@@ -0,0 +1,75 @@
+import pytest
+import json
+import logging
+import os
+import src.logger
+from src.logger import JsonFormatter, build_handlers, start_queue_listener
+
+def _logger(name: str, handler: logging.Handler) -> logging.Logger:
+    logger = logging.getLogger(name)
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    logger.handlers = [handler]
+    return logger
+
+def test_json_formatter_includes_extra_fields():
+    """Test records become one JSON object with message, level and extra= fields"""
+    record = logging.LogRecord('main', logging.WARNING, __file__, 1, 'Surge in %s', ('USA',), None)
+    record.country = 'USA'
+    
+    entry = json.loads(JsonFormatter().format(record))
+    
+    assert entry['message'] == 'Surge in USA'
+    assert entry['level'] == 'WARNING'
+    assert entry['country'] == 'USA'
+
+def test_queued_logging_writes_json_lines(tmp_path):
+    """Test records logged through the queue reach the file once the listener flushes"""
+    handlers = build_handlers(str(tmp_path), json_format=True, rotation='size')
+    queue_handler, listener = start_queue_listener(handlers)
+    logger = _logger('test_queued_logging', queue_handler)
+    
+    for i in range(100):
+        logger.debug(f"row {i}")
+    listener.stop()
+    for handler in handlers:
+        handler.close()
+    
+    lines = (tmp_path / 'health_monitor.jsonl').read_text().splitlines()
+    assert [json.loads(line)['message'] for line in lines] == [f"row {i}" for i in range(100)]
+
+def test_size_rotation(tmp_path, monkeypatch):
+    """Test the log file rolls over by size"""
+    monkeypatch.setattr('src.logger.LOG_MAX_BYTES', 1000)
+    handlers = build_handlers(str(tmp_path), json_format=False, rotation='size')
+    logger = _logger('test_size_rotation', handlers[0])
+    
+    for i in range(100):
+        logger.debug('x' * 50)
+    handlers[0].close()
+    
+    assert (tmp_path / 'health_monitor.log.1').exists()
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs fork')
+def test_queued_logging_survives_fork(tmp_path, monkeypatch):
+    """Test a forked child (like a server worker) gets its own listener thread and log file"""
+    handlers = build_handlers(str(tmp_path), json_format=True, rotation='size')
+    queue_handler, listener = start_queue_listener(handlers)
+    monkeypatch.setattr(src.logger, '_listener', listener)
+    logger = _logger('test_forked_logging', queue_handler)
+    
+    pid = os.fork()
+    if pid == 0:
+        logger.info("from child")
+        src.logger.shutdown_logging()
+        os._exit(0)
+    os.waitpid(pid, 0)
+    logger.info("from parent")
+    listener.stop()
+    for handler in handlers:
+        handler.close()
+    
+    child_lines = (tmp_path / f'health_monitor.{pid}.jsonl').read_text().splitlines()
+    assert [json.loads(line)['message'] for line in child_lines] == ["from child"]
+    parent_lines = (tmp_path / 'health_monitor.jsonl').read_text().splitlines()
+    assert [json.loads(line)['message'] for line in parent_lines] == ["from parent"]
@@ -0,0 +1,57 @@
+import pytest
+from src.metrics import MetricsRegistry, render_prometheus, timed
+from src.api_client import HealthDataAPIClient
+from config import BASE_URL
+
+def test_histogram_renders_cumulative_buckets():
+    """Test histogram observations render as cumulative Prometheus buckets"""
+    registry = MetricsRegistry()
+    histogram = registry.histogram('latency_seconds', 'Latency', ['endpoint'], buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, endpoint='/all')
+    
+    text = render_prometheus([({'process': 'collector'}, registry.snapshot())])
+    
+    assert '# TYPE latency_seconds histogram' in text
+    assert 'latency_seconds_bucket{process="collector",endpoint="/all",le="0.1"} 2' in text
+    assert 'latency_seconds_bucket{process="collector",endpoint="/all",le="1"} 3' in text
+    assert 'latency_seconds_bucket{process="collector",endpoint="/all",le="+Inf"} 4' in text
+    assert 'latency_seconds_count{process="collector",endpoint="/all"} 4' in text
+
+def test_counters_and_timed_decorator():
+    """Test counters add up per label set and @timed records every call"""
+    registry = MetricsRegistry()
+    counter = registry.counter('responses_total', 'Responses', ['status'])
+    histogram = registry.histogram('method_seconds', 'Method latency', ['method'])
+    
+    @timed(histogram)
+    def query():
+        counter.inc(status=200)
+    
+    query()
+    query()
+    counter.inc(status=500)
+    text = render_prometheus([({}, registry.snapshot())])
+    
+    assert 'responses_total{status="200"} 2' in text
+    assert 'responses_total{status="500"} 1' in text
+    assert 'method_seconds_count{method="query"} 2' in text
+
+def test_metrics_snapshot_round_trip(test_db):
+    """Test the collector's snapshot can be read back by the API process"""
+    registry = MetricsRegistry()
+    registry.counter('cycles_total', 'Cycles').inc()
+    
+    test_db.save_metrics_snapshot('collector', registry.snapshot())
+    published = test_db.load_metrics_snapshots()
+    
+    text = render_prometheus([({'process': 'collector'}, published['collector']['snapshot'])])
+    assert 'cycles_total{process="collector"} 1' in text
+
+def test_endpoint_labels_hide_country_names():
+    """Test per-country URLs share one metrics label"""
+    client = HealthDataAPIClient()
+    
+    assert client._endpoint_label(f"{BASE_URL}/all") == '/all'
+    assert client._endpoint_label(f"{BASE_URL}/countries/USA") == '/countries/{country}'
+    assert client._endpoint_label(f"{BASE_URL}/historical/UK?lastdays=all") == '/historical/{country}'
@@ -0,0 +1,64 @@
+import pytest
+import threading
+import time
+from src.pipeline import IngestPipeline
+
+def _validate_even(batch):
+    """Keep even numbers, report multiples of 5 as errors, drop the rest"""
+    valid = [n for n in batch if n % 2 == 0]
+    errors = [n for n in batch if n % 2 and n % 5 == 0]
+    return valid, errors
+
+def test_pipeline_delivers_everything_in_write_batches():
+    """Test every payload reaches the writer and stats add up"""
+    written, logged, batch_sizes = [], [], []
+    
+    def write(valid, errors):
+        written.extend(valid)
+        logged.extend(errors)
+        batch_sizes.append(len(valid) + len(errors))
+    
+    tasks = [lambda start=start: range(start, start + 10) for start in range(0, 100, 10)]
+    pipeline = IngestPipeline(fetch_workers=4, validate_workers=2, queue_size=5,
+                              validate_batch_size=3, write_batch_size=8)
+    stats = pipeline.run(tasks, _validate_even, write)
+    
+    assert sorted(written) == list(range(0, 100, 2))
+    assert sorted(logged) == [n for n in range(100) if n % 2 and n % 5 == 0]
+    assert max(batch_sizes) <= 8 + 3  # one validation batch may top up a full write batch
+    assert stats['fetch']['items_out'] == stats['validate']['items_in'] == 100
+    assert stats['write']['items_out'] == 50
+
+def test_slow_writer_applies_backpressure():
+    """Test bounded queues stop fetching from racing ahead of a slow writer"""
+    produced = []
+    lock = threading.Lock()
+    
+    def fetch(n):
+        with lock:
+            produced.append(n)
+        return [n]
+    
+    max_ahead = []
+    
+    def write(valid, errors):
+        time.sleep(0.01)
+        with lock:
+            max_ahead.append(len(produced))
+    
+    pipeline = IngestPipeline(fetch_workers=1, validate_workers=1, queue_size=2,
+                              validate_batch_size=1, write_batch_size=1)
+    pipeline.run([lambda n=n: fetch(n) for n in range(20)], lambda batch: (batch, []), write)
+    
+    # When the first write finishes, only a queue's worth of payloads can be in flight
+    assert max_ahead[0] < 10
+
+def test_stage_failure_is_raised_after_draining():
+    """Test a failing writer doesn't deadlock the pipeline and the error surfaces"""
+    def write(valid, errors):
+        raise RuntimeError('disk full')
+    
+    pipeline = IngestPipeline(fetch_workers=2, validate_workers=2, queue_size=1,
+                              validate_batch_size=1, write_batch_size=1)
+    with pytest.raises(RuntimeError, match='disk full'):
+        pipeline.run([lambda: range(50)], lambda batch: (batch, []), write)
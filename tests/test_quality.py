@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta
+from src.quality import (missed_intervals, overdue_intervals, summarize, window_start,
+                         INSERTED, MISSED_INTERVAL, VALIDATION_FAILED, FETCH_FAILED, GLOBAL, COUNTRY)
+
+def test_missed_intervals():
+    """Test gaps are measured against the fetch interval, with half an interval of slack"""
+    start = datetime(2024, 1, 1, 12, 0)
+    assert missed_intervals(start, start + timedelta(minutes=10), interval_minutes=10) == 0
+    assert missed_intervals(start, start + timedelta(minutes=14), interval_minutes=10) == 0
+    assert missed_intervals(start, start + timedelta(minutes=20), interval_minutes=10) == 1
+    assert missed_intervals(start, start + timedelta(minutes=35), interval_minutes=10) == 3
+    assert missed_intervals(start, start + timedelta(minutes=60), interval_minutes=30) == 1
+    assert missed_intervals(start, start - timedelta(minutes=60), interval_minutes=10) == 0
+
+def test_overdue_intervals():
+    """Test an open gap allows one interval of data age before counting"""
+    now = datetime(2024, 1, 1, 12, 0)
+    assert overdue_intervals(None, now) == 0
+    assert overdue_intervals(now - timedelta(minutes=19), now, interval_minutes=10) == 0
+    assert overdue_intervals(now - timedelta(minutes=45), now, interval_minutes=10) == 3
+
+def test_window_start_is_bucket_aligned():
+    assert window_start(datetime(2024, 1, 1, 12, 25, 7), hours=1) == datetime(2024, 1, 1, 11, 0)
+    assert window_start(datetime(2024, 1, 1, 0, 5), hours=24) == datetime(2023, 12, 31, 0, 0)
+
+def test_summarize():
+    """Test expected points come from inserts plus gaps, and failures are split by source"""
+    now = datetime(2024, 1, 1, 12, 30)
+    totals = {
+        (INSERTED, GLOBAL): 6,
+        (MISSED_INTERVAL, GLOBAL): 2,
+        (VALIDATION_FAILED, COUNTRY): 3,
+        (FETCH_FAILED, GLOBAL): 1,
+    }
+    metrics = summarize(totals, now - timedelta(minutes=5), now, hours=1, interval_minutes=10)
+    
+    assert metrics['expected_data_points'] == 8
+    assert metrics['actual_data_points'] == 6
+    assert metrics['missing_data_points'] == 2
+    assert metrics['success_rate_percent'] == 75.0
+    assert metrics['error_count'] == 4
+    assert metrics['failures'][VALIDATION_FAILED] == {COUNTRY: 3}
+    assert metrics['gaps']['overdue_intervals'] == 0
+
+def test_summarize_counts_open_gap_up_to_window():
+    """Test a collector that stopped shows up as missing points, capped at the window size"""
+    now = datetime(2024, 1, 1, 12, 30)
+    metrics = summarize({}, now - timedelta(days=2), now, hours=1, interval_minutes=10)
+    
+    assert metrics['actual_data_points'] == 0
+    assert metrics['missing_data_points'] == 9  # 11:00-12:30
+    assert metrics['success_rate_percent'] == 0
+    assert metrics['gaps']['minutes_since_last_data'] == 2880.0
@@ -0,0 +1,72 @@
+import numpy as np
+from datetime import datetime, timedelta
+from src.database import HealthDatabase
+from src.recent_store import RecentStore, SeriesBuffer, RECENT_COLUMNS
+
+def _ago(data, minutes, **overrides):
+    when = datetime.fromtimestamp(data['updated'] / 1000) - timedelta(minutes=minutes)
+    return dict(data, updated=int(when.timestamp() * 1000), **overrides)
+
+def _row(total_cases):
+    return {'total_cases': total_cases, 'total_deaths': 0, 'today_cases': None, 'today_deaths': None,
+            'cases_per_million': None}
+
+def test_series_buffer_wraps_and_tracks_coverage():
+    """Test a full buffer overwrites its oldest rows and only claims what it still holds"""
+    base = np.datetime64('2024-01-01T00:00', 'ms')
+    buffer = SeriesBuffer(RECENT_COLUMNS['country_stats'], capacity=3, covered_from=base)
+    for minutes in (0, 10, 20, 30, 40):
+        buffer.append(base + np.timedelta64(minutes, 'm'), _row(minutes))
+    
+    window = buffer.window(base)
+    assert window['total_cases'].tolist() == [20, 30, 40]
+    assert np.isnan(window['today_cases']).all()
+    assert buffer.covered_from == base + np.timedelta64(10, 'm') + np.timedelta64(1, 'ms')
+    assert buffer.latest('total_cases', 2).tolist() == [40, 30]
+    
+    # A late row lands in timestamp order
+    buffer.append(base + np.timedelta64(35, 'm'), _row(35))
+    assert buffer.window(base)['total_cases'].tolist() == [30, 35, 40]
+
+def test_recent_store_matches_sqlite_reads(test_db, sample_country_data, sample_global_data):
+    """Test reads served from the store return exactly what SQLite returns"""
+    test_db.insert_country_stats_batch([_ago(sample_country_data, 30, todayCases=400),
+                                        _ago(sample_country_data, 20, todayCases=None),
+                                        sample_country_data,
+                                        _ago(sample_country_data, 5, country='UK', todayCases=900,
+                                             casesPerOneMillion=12.5)])
+    test_db.insert_global_stats(_ago(sample_global_data, 10))
+    test_db.insert_global_stats(sample_global_data)
+    
+    stored = HealthDatabase(test_db.db_path, recent=RecentStore())
+    try:
+        assert stored.get_country_trend('USA', days=1) == test_db.get_country_trend('USA', days=1)
+        assert stored.get_country_trend('France', days=1) == []
+        assert stored.get_recent_global_data(hours=24) == test_db.get_recent_global_data(hours=24)
+        assert stored.get_top_countries_by_today_cases(5) == test_db.get_top_countries_by_today_cases(5)
+        assert stored.detect_case_surge('USA') == test_db.detect_case_surge('USA')
+        assert stored.detect_case_surges(['USA', 'UK', 'France']) == \
+            test_db.detect_case_surges(['USA', 'UK', 'France'])
+    finally:
+        stored.close()
+
+def test_recent_store_follows_inserts(test_db, sample_country_data):
+    """Test rows written by this or another connection reach the store"""
+    test_db.recent = RecentStore(sync_interval=0)
+    test_db.recent.load(test_db.pool)
+    assert test_db.get_country_trend('USA', days=1) == []
+    
+    test_db.insert_country_stats(_ago(sample_country_data, 10, todayCases=100))
+    assert test_db.recent.latest_values(['USA'], 'today_cases', 2) == {'USA': [100]}
+    
+    # A writer in another process (here another HealthDatabase) is picked up on read
+    writer = HealthDatabase(test_db.db_path)
+    try:
+        writer.insert_country_stats(dict(sample_country_data, todayCases=250))
+    finally:
+        writer.close()
+    assert [row['today_cases'] for row in test_db.get_country_trend('USA', days=1)] == [250, 100]
+    assert test_db.detect_case_surge('USA')['percent_change'] == 150.0
+    
+    # Windows older than the store fall back to SQLite
+    assert test_db.recent.window('country_stats', 'USA', datetime.now() - timedelta(days=30)) is None
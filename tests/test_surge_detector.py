@@ -0,0 +1,67 @@
+import pytest
+from datetime import datetime, timedelta
+from src.surge_detector import StreamingSurgeDetector
+
+START = datetime(2026, 1, 1)
+
+def feed(detector, values, country='USA', step=timedelta(minutes=10)):
+    """Feed a series of today_cases values and collect all alerts"""
+    alerts = []
+    for i, value in enumerate(values):
+        alerts.extend(detector.update(country, START + step * i, value))
+    return alerts
+
+def test_case_surge_matches_two_point_rule():
+    """Test case_surge uses the same rule as detect_case_surge"""
+    detector = StreamingSurgeDetector(threshold_percent=5.0, min_points=1000)
+    
+    alerts = feed(detector, [1000, 1040, 1200])
+    
+    assert [a['alert_type'] for a in alerts] == ['case_surge']
+    assert alerts[0]['details'] == {
+        'surge_detected': True,
+        'percent_change': 15.38,
+        'current_cases': 1200,
+        'previous_cases': 1040,
+        'threshold': 5.0
+    }
+
+def test_anomaly_detected_against_rolling_window():
+    """Test a spike far above the rolling mean raises an anomaly"""
+    detector = StreamingSurgeDetector(threshold_percent=1000, window=20, min_points=10,
+                                      zscore_threshold=3.0)
+    
+    alerts = feed(detector, [100, 102, 98, 101, 99] * 4 + [400])
+    
+    assert [a['alert_type'] for a in alerts] == ['anomaly']
+    assert alerts[0]['details']['zscore'] > 3.0
+
+def test_week_over_week_checked_once_per_day():
+    """Test week-over-week compares the last two weeks when a new day starts"""
+    detector = StreamingSurgeDetector(threshold_percent=1000, min_points=1000,
+                                      wow_threshold_percent=25)
+    
+    alerts = feed(detector, [100] * 7 + [200] * 7 + [200], step=timedelta(days=1))
+    
+    assert [a['alert_type'] for a in alerts] == ['week_over_week']
+    assert alerts[0]['details']['ratio'] == 2.0
+
+def test_out_of_order_points_ignored():
+    """Test replayed points don't change state or raise alerts"""
+    detector = StreamingSurgeDetector(threshold_percent=5.0)
+    feed(detector, [1000, 1000])
+    
+    assert detector.update('USA', START, 5000) == []
+    assert detector.states['USA'].last_today_cases == 1000
+
+def test_state_round_trip_resumes_detection():
+    """Test persisted state lets a new detector continue without replaying history"""
+    detector = StreamingSurgeDetector(threshold_percent=5.0, window=20, min_points=10)
+    feed(detector, [100, 102, 98, 101, 99] * 3)
+    
+    restored = StreamingSurgeDetector(threshold_percent=5.0, window=20, min_points=10)
+    restored.load_states(detector.dump_states())
+    
+    next_time = START + timedelta(minutes=10) * 15
+    assert restored.update('USA', next_time, 400) == detector.update('USA', next_time, 400)
+    assert restored.states['USA'].window_sum == detector.states['USA'].window_sum